@@ -8,33 +8,78 @@
 * USDT bazlı PnL trailing stop (peak PnL'e göre SL güncelleme)
 * Aynı yönde açık pozisyonu tekrar açmayı engelleme, zıt yönü otomatik kapatma
 * Günlük realized PnL limiti (DAILY_MAX_LOSS)
+* TEST_MODE: emirler yerel paper borsaya gider (slippage/fee, yerel stop tetikleme, simüle cüzdan)
+* Portföy risk limitleri (RISK_LIMITS: pozisyon sayısı, margin, yön notional'ı, SL'deki en kötü zarar)
+* SIGTERM'de emir işleri boşaltılır, trailing state checkpoint'e yazılır; yeni süreç watcher'ları oradan sürdürür
+
+Çalıştırma
+----------
+* Tek süreç: ``python bot.py`` (veya ``gunicorn -w 1 bot:app``; gunicorn.conf.py servisleri
+  worker açılır açılmaz başlatır, checkpoint'teki pozisyonlar ilk isteği beklemez)
+* Çok worker: ``python bot.py --engine`` + ``BOT_ENGINE_MODE=client gunicorn -w 4 bot:app``
+* Kesintisiz restart: systemd socket activation (``LISTEN_FDS``) ile ``python bot.py`` dinleyen
+  soketi devralır; eski süreç kapanırken gelen bağlantılar kernel kuyruğunda yeni süreci bekler
 
 NOT: Gerçek hesapta kullanmadan önce ortam değişkenlerinizi ayarlayın ve test edin.
 """
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import bisect
+import copy
+import math
 import hashlib
+import heapq
 import hmac
 import json
 import logging
 import os
 import secrets
+import signal
+import socket
+import struct
+import tempfile
 import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, wait as wait_futures
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime
 from decimal import Decimal, ROUND_DOWN, getcontext
 from functools import wraps
+from multiprocessing.connection import AuthenticationError, Client, Connection, Listener
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
 from urllib.parse import urlencode
 
+try:  # POSIX dosya kilidi; Windows'ta süreç içi kilit ile yetinilir
+    import fcntl
+except ImportError:  # pragma: no cover - platform dependent
+    fcntl = None  # type: ignore[assignment]
+
 import requests
 from dotenv import load_dotenv
 from flask import Flask, jsonify, render_template, request, session, make_response
 from flask_cors import CORS
 from werkzeug.security import check_password_hash, generate_password_hash
 
+try:  # opsiyonel: BOT_EXECUTION_BACKEND=asyncio için gerekli
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None  # type: ignore[assignment]
+
+from exchange_filters import (
+    SYMBOL_ALIASES,
+    fallback_precision,
+    floor_quantity,
+    format_price,
+    format_quantity,
+    parse_symbol_info,
+)
+
 # ------------------------------------------------------------------------------
 # Global init & configuration
 # ------------------------------------------------------------------------------
@@ -55,10 +100,45 @@ DAILY_MAX_LOSS = Decimal(os.getenv("BOT_DAILY_MAX_LOSS", "-100"))
 INITIAL_SL_ROE = Decimal(os.getenv("BOT_INITIAL_SL_ROE", "-20"))  # ilk SL ROI (%)
 USE_DYNAMIC_PRECISION = os.getenv("DYNAMIC_PRECISION", "1").strip().lower() in ("1", "true", "yes", "on")
 WATCH_INTERVAL_SECONDS = float(os.getenv("BOT_WATCH_INTERVAL_SECONDS", "3"))
-
-SYMBOL_ALIASES: Dict[str, str] = {
-    "BONKUSDT": "1000BONKUSDT",
+CONFIG_POLL_SECONDS = float(os.getenv("BOT_CONFIG_POLL_SECONDS", "1"))
+SYMBOL_OVERRIDES: Dict[str, Dict[str, Any]] = {}  # sembol bazlı margin/leverage/SL override'ları
+FANOUT_ACCOUNTS = os.getenv("BOT_FANOUT_ACCOUNTS", "0").strip().lower() in ("1", "true", "yes", "on")
+# Emir işleyen worker sayısı (global eşzamanlılık limiti) ve bekleyen giriş kuyruğu sınırı
+SCHEDULER_WORKERS = int(os.getenv("BOT_SCHEDULER_WORKERS", os.getenv("BOT_FANOUT_MAX_WORKERS", "16")))
+SCHEDULER_QUEUE_SIZE = int(os.getenv("BOT_SCHEDULER_QUEUE_SIZE", "256"))
+SCHEDULER_WAIT_SECONDS = float(os.getenv("BOT_SCHEDULER_WAIT_SECONDS", "60"))
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("BOT_RECONCILE_INTERVAL_SECONDS", "30"))  # 0 = kapalı
+TEST_MODE = False  # bot_config.json TEST_MODE ile dolar; True iken imzalı istekler PaperExchange'e gider
+PAPER_START_BALANCE = Decimal(os.getenv("BOT_PAPER_BALANCE", "1000"))
+PAPER_SLIPPAGE_BPS = Decimal(os.getenv("BOT_PAPER_SLIPPAGE_BPS", "2"))
+PAPER_FEE_RATE = Decimal(os.getenv("BOT_PAPER_FEE_RATE", "0.0004"))  # taker
+SIGNAL_DEDUP_TTL_SECONDS = float(os.getenv("BOT_SIGNAL_DEDUP_TTL_SECONDS", "60"))
+POSITION_BATCH_WINDOW_SECONDS = float(os.getenv("BOT_POSITION_BATCH_WINDOW_MS", "10")) / 1000.0
+# Kapanışta kuyruktaki/çalışan emir işleri için beklenecek en uzun süre
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("BOT_SHUTDOWN_DRAIN_SECONDS", "20"))
+POSITION_CACHE_MAX_AGE_SECONDS = float(os.getenv("BOT_POSITION_CACHE_MAX_AGE_SECONDS", "2"))
+RECV_WINDOW_MS = int(os.getenv("BOT_RECV_WINDOW_MS", "5000"))  # 0 = Binance varsayılanı
+ORDER_TIMEOUT_SECONDS = float(os.getenv("BOT_ORDER_TIMEOUT_SECONDS", "3"))
+ORDER_RECV_WINDOW_MS = int(os.getenv("BOT_ORDER_RECV_WINDOW_MS", "2000"))  # geç kalan emir kopyası bu süreden sonra reddedilir
+ORDER_RETRIES = int(os.getenv("BOT_ORDER_RETRIES", "2"))
+TIME_SYNC_INTERVAL_SECONDS = float(os.getenv("BOT_TIME_SYNC_INTERVAL_SECONDS", "30"))
+EXECUTION_BACKEND = os.getenv("BOT_EXECUTION_BACKEND", "threads").strip().lower()  # threads | asyncio
+BAR_CAPACITY = {
+    "1s": int(os.getenv("BOT_BARS_1S_CAPACITY", "900")),  # 15 dk
+    "1m": int(os.getenv("BOT_BARS_1M_CAPACITY", "1440")),  # 1 gün
 }
+ATR_PERIOD = int(os.getenv("BOT_ATR_PERIOD", "14"))
+STRATEGY_SYMBOL = os.getenv("BOT_STRATEGY_SYMBOL", "BTCUSDT")
+STRATEGY_INTERVAL = os.getenv("BOT_STRATEGY_INTERVAL", "1h")
+STRATEGY_BARS = int(os.getenv("BOT_STRATEGY_BARS", "500"))
+STRATEGY_RETRY_SECONDS = float(os.getenv("BOT_STRATEGY_RETRY_SECONDS", "5"))  # klines hatası sonrası ilk bekleme (katlanır)
+STRATEGY_PRICE_TTL_SECONDS = float(os.getenv("BOT_STRATEGY_PRICE_TTL_SECONDS", "5"))  # canlı fiyat okuma aralığı
+
+RISK_LIMITS: Dict[str, Any] = {}  # bot_config.json "RISK_LIMITS" ile dolar
+SIZING: Dict[str, Any] = {}  # bot_config.json "SIZING" ile dolar; profiller SIZING_TABLE'a derlenir
+TP_LADDER: List[Dict[str, float]] = []  # [{"ROE": 30, "PCT": 50}, ...]; boş = TP yok, çıkış yalnızca trailing SL
+SL_DEBOUNCE: Dict[str, Any] = {}  # bot_config.json "SL_DEBOUNCE"; trailing SL taşıma sıklığı sınırları
+WATCH_ADAPTIVE: Dict[str, Any] = {}  # bot_config.json "WATCH_ADAPTIVE"; pozisyon başına değişken watcher aralığı
 
 http_session = requests.Session()
 if API_KEY:
@@ -106,9 +186,357 @@ def cors_preflight(_unused):
 def debug_cors():
     return jsonify({"status": "ok"})
 
+
+# ------------------------------------------------------------------------------
+# Metrics (Prometheus text format, in-process)
+# ------------------------------------------------------------------------------
+
+# Saniye cinsinden gecikme kovaları: borsa çağrıları ms..sn, lock beklemeleri µs.
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.counts):
+            self.counts[idx] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Düşük maliyetli sayaç/gauge/histogram deposu; ``render()`` /metrics çıktısıdır.
+
+    Her gözlem tek bir lock altında birkaç aritmetik işlemdir, bu yüzden
+    enstrümantasyon production'da açık kalabilir. ``add_collector`` ile kayıtlı
+    fonksiyonlar scrape anında güncel gauge (ya da ``kind="counter"`` ile sayaç) değerlerini üretir.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, float] = {}
+        self._gauges: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, _Histogram] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Tuple[Callable[[], List[tuple]], str]] = []
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS, **labels: Any) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector: Callable[[], List[tuple]], kind: str = "gauge") -> None:
+        """collector() -> [(name, value, labels_dict), ...] evaluated at scrape time.
+
+        ``kind="counter"`` is for monotonic totals kept elsewhere (e.g. cache hit counts).
+        """
+        if kind not in ("gauge", "counter"):
+            raise ValueError(f"unknown collector kind: {kind}")
+        self._collectors.append((collector, kind))
+
+    @staticmethod
+    def _fmt_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+        items = list(labels) + ([extra] if extra else [])
+        if not items:
+            return ""
+        body = ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in items
+        )
+        return "{" + body + "}"
+
+    def render(self) -> str:
+        gauges: Dict[tuple, float] = {}
+        collected: Dict[tuple, float] = {}
+        for collector, kind in self._collectors:
+            target = collected if kind == "counter" else gauges
+            try:
+                for name, value, labels in collector():
+                    target[self._key(name, labels)] = float(value)
+            except Exception as exc:
+                gauges[self._key("bot_metrics_collector_errors", {"error": type(exc).__name__})] = 1.0
+        with self._lock:
+            counters = dict(self._counters)
+            counters.update(collected)
+            gauges.update(self._gauges)
+            hists = {k: (h.buckets, list(h.counts), h.sum, h.count) for k, h in self._histograms.items()}
+
+        lines: List[str] = []
+        seen: set = set()
+
+        def _header(name: str, kind: str) -> None:
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            _header(name, "counter")
+            lines.append(f"{name}{self._fmt_labels(labels)} {value:g}")
+        for (name, labels), value in sorted(gauges.items()):
+            _header(name, "gauge")
+            lines.append(f"{name}{self._fmt_labels(labels)} {value:g}")
+        for (name, labels), (buckets, counts, total, count) in sorted(hists.items()):
+            _header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{self._fmt_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            lines.append(f"{name}_bucket{self._fmt_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{self._fmt_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{self._fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("bot_exchange_request_seconds", "Latency of Binance REST calls by endpoint")
+metrics.describe("bot_exchange_requests_total", "Binance REST calls by endpoint and HTTP status")
+metrics.describe("bot_webhook_stage_seconds", "Time spent in each webhook stage")
+metrics.describe("bot_signals_total", "Processed alerts by result status")
+metrics.describe("bot_watcher_tick_seconds", "Duration of one watcher iteration")
+metrics.describe("bot_watcher_lag_seconds", "Extra delay between watcher ticks beyond the planned interval")
+metrics.describe("bot_sl_moves_total", "Stop-loss orders moved by watchers")
+metrics.describe("bot_sl_failures_total", "Stop-loss placements that failed")
+metrics.describe("bot_sl_debounced_total", "Stop-loss moves held back by SL_DEBOUNCE, by reason")
+metrics.describe("bot_lock_wait_seconds", "Time spent waiting to acquire shared state locks")
+
+
+class InstrumentedLock:
+    """threading.Lock drop-in that records acquire wait time."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        started = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        metrics.observe("bot_lock_wait_seconds", time.perf_counter() - started, lock=self.name)
+        return acquired
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+# ------------------------------------------------------------------------------
+# Tracing (per-alert spans, ring buffer)
+# ------------------------------------------------------------------------------
+
+
+class Tracer:
+    """Her webhook çağrısına trace ID verip iç içe span'leri bellekte tutar.
+
+    Aktif trace thread-local'dır; trace yokken ``span()`` hiçbir şey kaydetmez,
+    böylece watcher gibi arka plan yolları ek maliyet ödemez. Biten trace'ler
+    sabit kapasiteli bir ring buffer'da saklanır ve istenirse OTLP uyumlu JSON
+    satırı olarak ``BOT_TRACE_EXPORT_FILE`` dosyasına eklenir.
+    """
+
+    def __init__(self, capacity: int, export_file: str = "") -> None:
+        self.capacity = capacity
+        self.export_file = export_file
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._local = threading.local()
+
+    def _stack(self) -> List[tuple]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_context(self) -> Optional[tuple]:
+        """(trace, span_id) of the innermost open span, for handing to another thread."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def attach(self, context: Optional[tuple]) -> Iterator[None]:
+        """Continue a trace from another thread (e.g. a fan-out worker)."""
+        if context is None:
+            yield
+            return
+        stack = self._stack()
+        stack.append(context)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[str]:
+        trace = {"trace_id": secrets.token_hex(16), "name": name, "spans": [], "started_at": time.time(), "status": "ok"}
+        try:
+            with self.attach((trace, None)):
+                with self.span(name, **attrs):
+                    yield trace["trace_id"]
+        except BaseException as exc:
+            # Hata veren istekler de saklanır; asıl aranan trace'ler bunlar.
+            trace["status"] = "error"
+            trace["error"] = str(exc) or type(exc).__name__
+            raise
+        finally:
+            self._finish(trace)
+
+    def _finish(self, trace: Dict[str, Any]) -> None:
+        trace["duration_ms"] = round((time.time() - trace["started_at"]) * 1000, 3)
+        with self._lock:
+            self._traces[trace["trace_id"]] = trace
+            while len(self._traces) > self.capacity:
+                self._traces.popitem(last=False)
+        if self.export_file:
+            try:
+                with open(self.export_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(self.to_otlp(trace), default=str) + "\n")
+            except OSError as exc:
+                logger.warning(f"Trace export error: {exc}")
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+        parent = self.current_context()
+        if parent is None:
+            yield None
+            return
+        trace, parent_id = parent
+        record = {
+            "span_id": secrets.token_hex(8),
+            "parent_id": parent_id,
+            "name": name,
+            "start_ns": time.time_ns(),
+            "attrs": dict(attrs),
+            "status": "ok",
+        }
+        stack = self._stack()
+        stack.append((trace, record["span_id"]))
+        try:
+            yield record
+        except BaseException as exc:
+            record["status"] = "error"
+            record["attrs"]["error"] = str(exc)
+            raise
+        finally:
+            stack.pop()
+            record["end_ns"] = time.time_ns()
+            record["duration_ms"] = round((record["end_ns"] - record["start_ns"]) / 1e6, 3)
+            with self._lock:
+                trace["spans"].append(record)
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            return dict(trace, spans=sorted(trace["spans"], key=lambda sp: sp["start_ns"])) if trace else None
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        with self._lock:
+            traces = list(self._traces.values())[-limit:]
+        return [
+            {"trace_id": t["trace_id"], "name": t["name"], "started_at": t["started_at"],
+             "duration_ms": t.get("duration_ms"), "spans": len(t["spans"]), "status": t.get("status", "ok")}
+            for t in reversed(traces)
+        ]
+
+    @staticmethod
+    def to_otlp(trace: Dict[str, Any]) -> Dict[str, Any]:
+        def _attr(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return {"key": key, "value": {"doubleValue": float(value)}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = [
+            {
+                "traceId": trace["trace_id"],
+                "spanId": sp["span_id"],
+                "parentSpanId": sp["parent_id"] or "",
+                "name": sp["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(sp["start_ns"]),
+                "endTimeUnixNano": str(sp.get("end_ns", sp["start_ns"])),
+                "attributes": [_attr(k, v) for k, v in sp["attrs"].items()],
+                "status": {"code": 2 if sp["status"] == "error" else 1},
+            }
+            for sp in trace["spans"]
+        ]
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_attr("service.name", "futures-bot")]},
+                    "scopeSpans": [{"scope": {"name": "bot", "version": BOT_VERSION}, "spans": spans}],
+                }
+            ]
+        }
+
+
+tracer = Tracer(int(os.getenv("BOT_TRACE_BUFFER_SIZE", "500")), os.getenv("BOT_TRACE_EXPORT_FILE", ""))
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator: record a span around the call when a trace is active."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 open_positions: Dict[str, Dict[str, Any]] = {}
-watcher_threads: Dict[str, threading.Thread] = {}
-state_lock = threading.Lock()
+watcher_threads: Dict[str, Any] = {}  # threading.Thread veya asyncio watcher Future
+state_lock = InstrumentedLock("state")
 
 # Paths
 BASE_DIR = Path(__file__).parent
@@ -116,6 +544,7 @@ USERS_FILE = BASE_DIR / "users.json"
 CONFIG_FILE = BASE_DIR / "bot_config.json"
 LOGS_DIR = BASE_DIR / "logs"
 LOGS_DIR.mkdir(exist_ok=True)
+CHECKPOINT_FILE = Path(os.getenv("BOT_CHECKPOINT_FILE", str(BASE_DIR / "state_checkpoint.json")))
 
 
 # ------------------------------------------------------------------------------
@@ -133,60 +562,823 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# ------------------------------------------------------------------------------
+# File helpers (atomic JSON write, cross-process lock)
+# ------------------------------------------------------------------------------
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Exclusive lock on ``<path>.lock`` shared by every gunicorn worker."""
+    lock_path = path.with_name(path.name + ".lock")
+    with open(lock_path, "a+", encoding="utf-8") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write_json(path: Path, data: Any) -> None:
+    """Write JSON to a temp file in the same directory, then rename over ``path``."""
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+# ------------------------------------------------------------------------------
+# Background services
+# ------------------------------------------------------------------------------
+
+# Import sırasında thread başlatmamak için servisler __main__'de, gunicorn'da
+# post_worker_init hook'unda (gunicorn.conf.py) ya da en geç ilk istekte başlar.
+BACKGROUND_SERVICES: List[Callable[[], None]] = []
+_background_started = False
+_background_lock = threading.Lock()
+
+
+def start_background_services() -> None:
+    """Start every registered background service once per process."""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    for starter in BACKGROUND_SERVICES:
+        try:
+            starter()
+        except Exception as exc:
+            logger.error(f"Background service {getattr(starter, '__name__', starter)} failed: {exc}")
+
+
+@app.before_request
+def _ensure_background_services() -> None:
+    if not _background_started:
+        start_background_services()
+
+
+# ------------------------------------------------------------------------------
+# Event log (karar çekirdeği girdileri, günlük ikili dosya)
+# ------------------------------------------------------------------------------
+
+EVENT_LOG_DIR = os.getenv("BOT_EVENT_LOG_DIR", str(LOGS_DIR / "events")).strip()  # "" = kapalı
+
+# Kayıt biçimi: <tür u8><ts f64><uzunluk u32><payload>. En sık olay olan "mark"
+# kendi ikili payload'ını kullanır (pozisyon anahtarı dosya başına numaralanır),
+# diğerleri kompakt JSON. Ondalıklar metin olarak yazılır; replay aynı Decimal
+# değerleriyle birebir aynı kararı üretir. Mark bayrakları: 1 = SL komutu,
+# 2 = SL_DEBOUNCE ayarları (karar zamanı kaydın ts'idir).
+EVENT_KINDS = {"key": 0, "config": 1, "alert": 2, "fill": 3, "stop": 4, "mark": 5, "closed": 6, "adopt": 7, "resize": 8}
+EVENT_NAMES = {code: name for name, code in EVENT_KINDS.items()}
+_EVENT_HEADER = struct.Struct("<BdI")
+_EVENT_KEY = struct.Struct("<H")
+_MARK_HEAD = struct.Struct("<HB")
+_MARK_STOP, _MARK_DEBOUNCE = 1, 2
+
+
+def _pack_texts(values: List[Any]) -> bytes:
+    out = bytearray()
+    for value in values:
+        raw = str(value).encode("ascii")
+        out.append(len(raw))
+        out += raw
+    return bytes(out)
+
+
+def _unpack_texts(body: bytes, offset: int, count: int) -> List[str]:
+    values = []
+    for _ in range(count):
+        size = body[offset]
+        values.append(body[offset + 1 : offset + 1 + size].decode("ascii"))
+        offset += 1 + size
+    return values
+
+
+class EventLog:
+    """Append-only binary log of decision-core inputs and the commands they produced.
+
+    Only the trading engine writes (see ``_start_event_log``); ``replay.py``
+    reads the files back with ``read_events``.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory) if directory else None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._file: Optional[Any] = None
+        self._day: Optional[str] = None
+        self._keys: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}
+        self._bytes = 0
+        self._errors = 0
+
+    def path_for(self, day: str) -> Path:
+        return self.directory / f"{day}.evt"
+
+    def _rotate(self, ts: float) -> None:
+        day = time.strftime("%Y%m%d", time.gmtime(ts))
+        if day == self._day:
+            return
+        if self._file is not None:
+            self._file.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path_for(day), "ab")
+        self._day = day
+        self._keys = {}  # anahtar numaraları dosya başına; okuyucu "key" kayıtlarıyla eşler
+
+    def _write(self, kind: str, ts: float, body: bytes) -> None:
+        self._file.write(_EVENT_HEADER.pack(EVENT_KINDS[kind], ts, len(body)) + body)
+        self._bytes += _EVENT_HEADER.size + len(body)
+
+    def _key_id(self, state_key: str, ts: float) -> int:
+        key_id = self._keys.get(state_key)
+        if key_id is None:
+            key_id = self._keys[state_key] = len(self._keys)
+            self._write("key", ts, _EVENT_KEY.pack(key_id) + state_key.encode("utf-8"))
+        return key_id
+
+    def _encode_mark(self, event: Dict[str, Any], out: List[Dict[str, Any]], ts: float) -> bytes:
+        stop = out[0] if out else None
+        debounce = event.get("debounce")
+        texts = [event["amt"], event["mark"], event["initial_sl_roe"]]
+        flags = 0
+        if stop:
+            flags |= _MARK_STOP
+            texts += [stop["price"], stop["roe"]]
+        if debounce:
+            flags |= _MARK_DEBOUNCE
+            texts += [repr(float(debounce["MIN_INTERVAL_SECONDS"])), debounce["MIN_TICKS"], int(debounce["SKIP_RUNGS"])]
+            texts.append(repr(float(debounce["MAX_HOLD_SECONDS"])))
+        return _MARK_HEAD.pack(self._key_id(event["state_key"], ts), flags) + _pack_texts(texts)
+
+    def record(
+        self, kind: str, event: Dict[str, Any], out: Optional[List[Dict[str, Any]]] = None, ts: Optional[float] = None
+    ) -> None:
+        if not self.enabled:
+            return
+        ts = ts if ts is not None else time.time()
+        try:
+            with self._lock:
+                self._rotate(ts)
+                if kind == "mark":
+                    body = self._encode_mark(event, out or [], ts)
+                else:
+                    if out is not None:
+                        event = {**event, "out": out}
+                    body = json.dumps(event, separators=(",", ":"), default=str).encode("utf-8")
+                self._write(kind, ts, body)
+                self._file.flush()
+                self._counts[kind] = self._counts.get(kind, 0) + 1
+        except (OSError, ValueError, struct.error) as exc:
+            self._errors += 1
+            metrics.inc("bot_event_log_errors_total")
+            if self._errors == 1:
+                logger.error(f"Event log write failed: {exc}")
+
+    def close(self) -> None:
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._day = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "file": str(self.path_for(self._day)) if self._day else None,
+                "records": dict(self._counts),
+                "bytes": self._bytes,
+                "errors": self._errors,
+            }
+
+
+def read_events(path: str) -> Iterator[Tuple[str, float, Dict[str, Any]]]:
+    """Yield ``(kind, ts, event)`` from one event log file; every event carries ``out``."""
+    keys: Dict[int, str] = {}
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(_EVENT_HEADER.size)
+            if len(head) < _EVENT_HEADER.size:
+                return
+            code, ts, length = _EVENT_HEADER.unpack(head)
+            body = f.read(length)
+            if len(body) < length:
+                return  # yarım yazılmış son kayıt (çökme)
+            kind = EVENT_NAMES.get(code)
+            if kind == "key":
+                keys[_EVENT_KEY.unpack_from(body)[0]] = body[_EVENT_KEY.size :].decode("utf-8")
+                continue
+            if kind == "mark":
+                key_id, flags = _MARK_HEAD.unpack_from(body)
+                count = 3 + (2 if flags & _MARK_STOP else 0) + (4 if flags & _MARK_DEBOUNCE else 0)
+                values = _unpack_texts(body, _MARK_HEAD.size, count)
+                state_key = keys[key_id]
+                event = {"state_key": state_key, "amt": values[0], "mark": values[1], "initial_sl_roe": values[2], "ts": ts, "out": []}
+                if flags & _MARK_STOP:
+                    event["out"].append({"cmd": "stop", "state_key": state_key, "price": values[3], "roe": values[4]})
+                if flags & _MARK_DEBOUNCE:
+                    interval, ticks, skip, hold = values[-4:]
+                    event["debounce"] = {
+                        "MIN_INTERVAL_SECONDS": float(interval),
+                        "MIN_TICKS": int(ticks),
+                        "SKIP_RUNGS": skip == "1",
+                        "MAX_HOLD_SECONDS": float(hold),
+                    }
+            elif kind is None:
+                continue
+            else:
+                event = json.loads(body)
+                event.setdefault("out", [])
+            yield kind, ts, event
+
+
+event_log = EventLog(EVENT_LOG_DIR)
+
+
+def _start_event_log() -> None:
+    if _runs_trading_engine() and event_log.directory is not None:
+        event_log.enabled = True
+        event_log.record("config", {"config": config_store.load()})
+
+
+BACKGROUND_SERVICES.append(_start_event_log)
+
+
 # ------------------------------------------------------------------------------
 # Config management (bot_config.json)
 # ------------------------------------------------------------------------------
 
+# Tek kaynak: dosya yokken yazılan, dosyada eksik anahtarlar için kullanılan ve
+# /api/config/reset'in döndüğü değerler. Ortam değişkenleri import anında okunur.
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "BOT_MARGIN_USDT": float(BOT_MARGIN_USDT),
+    "BOT_LEVERAGE": DEFAULT_LEVERAGE,
+    "BOT_DAILY_MAX_LOSS": float(DAILY_MAX_LOSS),
+    "BOT_INITIAL_SL_ROE": float(INITIAL_SL_ROE),
+    "BOT_WATCH_INTERVAL_SECONDS": WATCH_INTERVAL_SECONDS,
+    "USE_DYNAMIC_PRECISION": USE_DYNAMIC_PRECISION,
+    "TEST_MODE": TEST_MODE,
+    "AUTO_LOGOUT_MINUTES": 30,
+    "SYMBOL_OVERRIDES": {},
+    "FANOUT_ACCOUNTS": FANOUT_ACCOUNTS,
+    "SIGNAL_DEDUP_TTL_SECONDS": SIGNAL_DEDUP_TTL_SECONDS,
+    "RISK_LIMITS": {},
+    "SIZING": {},
+    "TP_LADDER": [],
+    "SL_DEBOUNCE": {},
+    "WATCH_ADAPTIVE": {},
+}
 
-def load_config() -> Dict[str, Any]:
-    """Load bot config from bot_config.json, create default if missing."""
-    default_config = {
-        "BOT_MARGIN_USDT": float(BOT_MARGIN_USDT),
-        "BOT_LEVERAGE": DEFAULT_LEVERAGE,
-        "BOT_DAILY_MAX_LOSS": float(DAILY_MAX_LOSS),
-        "BOT_INITIAL_SL_ROE": float(INITIAL_SL_ROE),
-        "BOT_WATCH_INTERVAL_SECONDS": WATCH_INTERVAL_SECONDS,
-        "USE_DYNAMIC_PRECISION": USE_DYNAMIC_PRECISION,
-        "TEST_MODE": False,
-        "AUTO_LOGOUT_MINUTES": 30,
-    }
-    if CONFIG_FILE.exists():
+
+def _validate_tp_ladder(raw: Any) -> List[Dict[str, float]]:
+    """TP merdiveni: ROE'ye göre sıralı en fazla 10 basamak, PCT toplamı <= 100 (giriş miktarının yüzdesi)."""
+    if not raw:
+        return []
+    if not isinstance(raw, list) or len(raw) > 10:
+        raise ValueError("TP_LADDER must be a list of at most 10 {ROE, PCT} rungs")
+    rungs: List[Dict[str, float]] = []
+    for rung in raw:
+        try:
+            roe, pct = float(rung["ROE"]), float(rung["PCT"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"invalid TP_LADDER rung {rung!r}") from exc
+        if roe <= 0 or not 0 < pct <= 100:
+            raise ValueError(f"TP_LADDER rung needs ROE > 0 and 0 < PCT <= 100: {rung!r}")
+        rungs.append({"ROE": roe, "PCT": pct})
+    if sum(r["PCT"] for r in rungs) > 100:
+        raise ValueError("TP_LADDER PCT total must be <= 100")
+    return sorted(rungs, key=lambda r: r["ROE"])
+
+
+# SYMBOL_OVERRIDES içinde izin verilen alanlar ve tipleri
+SYMBOL_OVERRIDE_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "BOT_MARGIN_USDT": float,
+    "BOT_LEVERAGE": int,
+    "BOT_INITIAL_SL_ROE": float,
+    "MAX_NOTIONAL": float,
+    "VOL_TARGET_PCT": float,
+    "TP_LADDER": _validate_tp_ladder,
+}
+
+
+def _validate_symbol_overrides(raw: Any) -> Dict[str, Dict[str, Any]]:
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError("SYMBOL_OVERRIDES must be an object keyed by symbol")
+    result: Dict[str, Dict[str, Any]] = {}
+    for symbol, fields in raw.items():
+        sym = str(symbol).replace("/", "").upper()
+        if not sym or not isinstance(fields, dict):
+            raise ValueError(f"invalid override for {symbol!r}")
+        clean: Dict[str, Any] = {}
+        for key, value in fields.items():
+            caster = SYMBOL_OVERRIDE_FIELDS.get(key)
+            if caster is None:
+                raise ValueError(f"unsupported override field {key} for {sym}")
+            try:
+                clean[key] = caster(value)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"{sym}.{key}: {exc}") from exc
+        if clean.get("BOT_MARGIN_USDT", 1) <= 0:
+            raise ValueError(f"{sym}: BOT_MARGIN_USDT must be > 0")
+        if not 1 <= clean.get("BOT_LEVERAGE", 1) <= 125:
+            raise ValueError(f"{sym}: BOT_LEVERAGE must be between 1 and 125")
+        if clean.get("BOT_INITIAL_SL_ROE", -1) >= 0:
+            raise ValueError(f"{sym}: BOT_INITIAL_SL_ROE must be negative")
+        if clean.get("MAX_NOTIONAL", 0) < 0 or clean.get("VOL_TARGET_PCT", 0) < 0:
+            raise ValueError(f"{sym}: MAX_NOTIONAL / VOL_TARGET_PCT must be >= 0")
+        result[sym] = clean
+    return result
+
+
+# RISK_LIMITS alanları; 0 veya eksik = limit kapalı
+RISK_LIMIT_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "MAX_OPEN_POSITIONS": int,
+    "MAX_POSITIONS_PER_SYMBOL": int,
+    "MAX_TOTAL_MARGIN": float,
+    "MAX_SIDE_NOTIONAL": float,
+    "MAX_WORST_CASE_LOSS": float,
+}
+
+
+def _validate_risk_limits(raw: Any) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError("RISK_LIMITS must be an object")
+    result: Dict[str, Any] = {}
+    for key, value in raw.items():
+        caster = RISK_LIMIT_FIELDS.get(key)
+        if caster is None:
+            raise ValueError(f"unsupported risk limit {key}")
+        try:
+            result[key] = caster(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"RISK_LIMITS.{key}: {exc}") from exc
+        if result[key] < 0:
+            raise ValueError(f"RISK_LIMITS.{key} must be >= 0")
+    return result
+
+
+def _parse_bool(value: Any) -> bool:
+    """Config bayrağı: true/false, 0/1 ya da "true"/"false"/"0"/"1"; ``bool("false")`` tuzağı yok."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("true", "false", "0", "1"):
+        return value.strip().lower() in ("true", "1")
+    raise ValueError(f"expected true/false, got {value!r}")
+
+
+# SIZING alanları. MAX_NOTIONAL / VOL_TARGET_PCT sembol override'ı yoksa geçerli
+# varsayılanlardır (0 = kapalı); VOL_TARGET_PCT 1m ATR'ın fiyata oranı (%) hedefidir.
+# Alarm ipuçları webhook'u gönderebilen herkese açık olduğundan varsayılan kapalıdır;
+# açıkken notional profilinkinin HINT_MAX_MULT katını, kaldıraç HINT_MAX_LEVERAGE'ı
+# (0 = profil kaldıracı) geçemez.
+SIZING_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "MAX_NOTIONAL": float,
+    "VOL_TARGET_PCT": float,
+    "VOL_SCALE_MIN": float,
+    "VOL_SCALE_MAX": float,
+    "ALLOW_HINTS": _parse_bool,
+    "HINT_MAX_MULT": float,
+    "HINT_MAX_LEVERAGE": int,
+}
+SIZING_DEFAULTS: Dict[str, Any] = {
+    "MAX_NOTIONAL": 0.0,
+    "VOL_TARGET_PCT": 0.0,
+    "VOL_SCALE_MIN": 0.25,
+    "VOL_SCALE_MAX": 2.0,
+    "ALLOW_HINTS": False,
+    "HINT_MAX_MULT": 3.0,
+    "HINT_MAX_LEVERAGE": 0,
+}
+
+
+def _validate_sizing(raw: Any) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError("SIZING must be an object")
+    result: Dict[str, Any] = {}
+    for key, value in raw.items():
+        caster = SIZING_FIELDS.get(key)
+        if caster is None:
+            raise ValueError(f"unsupported sizing field {key}")
+        try:
+            result[key] = caster(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"SIZING.{key}: {exc}") from exc
+        if caster is float and result[key] < 0:
+            raise ValueError(f"SIZING.{key} must be >= 0")
+    merged = {**SIZING_DEFAULTS, **result}
+    if not 0 < merged["VOL_SCALE_MIN"] <= 1 <= merged["VOL_SCALE_MAX"]:
+        raise ValueError("SIZING: need 0 < VOL_SCALE_MIN <= 1 <= VOL_SCALE_MAX")
+    if merged["HINT_MAX_MULT"] < 1:
+        raise ValueError("SIZING.HINT_MAX_MULT must be >= 1")
+    if not 0 <= merged["HINT_MAX_LEVERAGE"] <= 125:
+        raise ValueError("SIZING.HINT_MAX_LEVERAGE must be between 0 and 125")
+    return result
+
+
+# SL_DEBOUNCE alanları; varsayılanlar eski davranıştır (her iyileşmede SL taşınır).
+# MIN_INTERVAL_SECONDS: pozisyon başına iki SL emri arası en az süre; MIN_TICKS: en az
+# kaç tickSize iyileşme; SKIP_RUNGS: fiyat her tick'te yeni peak yaparken SL'i en çok
+# MAX_HOLD_SECONDS bekletip aradaki basamakları atlayarak tek seferde taşı.
+SL_DEBOUNCE_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "MIN_INTERVAL_SECONDS": float,
+    "MIN_TICKS": int,
+    "SKIP_RUNGS": _parse_bool,
+    "MAX_HOLD_SECONDS": float,
+}
+SL_DEBOUNCE_DEFAULTS: Dict[str, Any] = {
+    "MIN_INTERVAL_SECONDS": 0.0,
+    "MIN_TICKS": 1,
+    "SKIP_RUNGS": False,
+    "MAX_HOLD_SECONDS": 10.0,
+}
+
+
+def _validate_sl_debounce(raw: Any) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError("SL_DEBOUNCE must be an object")
+    result: Dict[str, Any] = {}
+    for key, value in raw.items():
+        caster = SL_DEBOUNCE_FIELDS.get(key)
+        if caster is None:
+            raise ValueError(f"unsupported SL_DEBOUNCE field {key}")
+        try:
+            result[key] = caster(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"SL_DEBOUNCE.{key}: {exc}") from exc
+        if caster is not _parse_bool and result[key] < 0:
+            raise ValueError(f"SL_DEBOUNCE.{key} must be >= 0")
+    if result.get("MIN_TICKS", 1) < 1:
+        raise ValueError("SL_DEBOUNCE.MIN_TICKS must be >= 1")
+    return result
+
+
+# WATCH_ADAPTIVE alanları. ENABLED iken watcher aralığı en yakın tetiğe (SL, sonraki
+# trailing basamağı, açık TP) uzaklığın 1m ATR'a oranından hesaplanır ve
+# [MIN, MAX] içinde kalır; SAMPLES, fiyatın tetiğe beklenen varış süresinde kaç kez
+# bakılacağıdır. Kapalıyken herkes BOT_WATCH_INTERVAL_SECONDS ile döner.
+WATCH_ADAPTIVE_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "ENABLED": _parse_bool,
+    "MIN_INTERVAL_SECONDS": float,
+    "MAX_INTERVAL_SECONDS": float,
+    "SAMPLES": float,
+}
+WATCH_ADAPTIVE_DEFAULTS: Dict[str, Any] = {
+    "ENABLED": False,
+    "MIN_INTERVAL_SECONDS": 0.5,
+    "MAX_INTERVAL_SECONDS": 15.0,
+    "SAMPLES": 20.0,
+}
+
+
+def _validate_watch_adaptive(raw: Any) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError("WATCH_ADAPTIVE must be an object")
+    result: Dict[str, Any] = {}
+    for key, value in raw.items():
+        caster = WATCH_ADAPTIVE_FIELDS.get(key)
+        if caster is None:
+            raise ValueError(f"unsupported WATCH_ADAPTIVE field {key}")
+        try:
+            result[key] = caster(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"WATCH_ADAPTIVE.{key}: {exc}") from exc
+    merged = {**WATCH_ADAPTIVE_DEFAULTS, **result}
+    if not 0 < merged["MIN_INTERVAL_SECONDS"] <= merged["MAX_INTERVAL_SECONDS"]:
+        raise ValueError("WATCH_ADAPTIVE: need 0 < MIN_INTERVAL_SECONDS <= MAX_INTERVAL_SECONDS")
+    if merged["SAMPLES"] < 1:
+        raise ValueError("WATCH_ADAPTIVE.SAMPLES must be >= 1")
+    return result
+
+
+def validate_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalise config value types; raises ValueError on invalid values."""
+    current = dict(config)
+    try:
+        current["BOT_MARGIN_USDT"] = float(current.get("BOT_MARGIN_USDT", 5))
+        current["BOT_LEVERAGE"] = int(current.get("BOT_LEVERAGE", 20))
+        current["BOT_DAILY_MAX_LOSS"] = float(current.get("BOT_DAILY_MAX_LOSS", -100))
+        current["BOT_INITIAL_SL_ROE"] = float(current.get("BOT_INITIAL_SL_ROE", -20))
+        current["BOT_WATCH_INTERVAL_SECONDS"] = float(current.get("BOT_WATCH_INTERVAL_SECONDS", 3))
+        current["USE_DYNAMIC_PRECISION"] = bool(current.get("USE_DYNAMIC_PRECISION", True))
+        current["TEST_MODE"] = _parse_bool(current.get("TEST_MODE", False))
+        current["AUTO_LOGOUT_MINUTES"] = int(current.get("AUTO_LOGOUT_MINUTES", 30))
+        current["FANOUT_ACCOUNTS"] = _parse_bool(current.get("FANOUT_ACCOUNTS", False))
+        current["SIGNAL_DEDUP_TTL_SECONDS"] = float(current.get("SIGNAL_DEDUP_TTL_SECONDS", 60))
+    except (TypeError, ValueError) as exc:
+        raise ValueError(str(exc)) from exc
+    current["SYMBOL_OVERRIDES"] = _validate_symbol_overrides(current.get("SYMBOL_OVERRIDES"))
+    current["RISK_LIMITS"] = _validate_risk_limits(current.get("RISK_LIMITS"))
+    current["SIZING"] = _validate_sizing(current.get("SIZING"))
+    current["TP_LADDER"] = _validate_tp_ladder(current.get("TP_LADDER"))
+    current["SL_DEBOUNCE"] = _validate_sl_debounce(current.get("SL_DEBOUNCE"))
+    current["WATCH_ADAPTIVE"] = _validate_watch_adaptive(current.get("WATCH_ADAPTIVE"))
+    return current
+
+
+class ConfigConflict(ValueError):
+    """Geçerli ama şu an uygulanamayan config (pozisyon açıkken TEST_MODE değişimi)."""
+
+
+def apply_config(config: Dict[str, Any]) -> None:
+    """Apply config values to global variables."""
+    global DEFAULT_LEVERAGE, BOT_MARGIN_USDT, DAILY_MAX_LOSS, INITIAL_SL_ROE
+    global USE_DYNAMIC_PRECISION, WATCH_INTERVAL_SECONDS, SYMBOL_OVERRIDES, FANOUT_ACCOUNTS
+    global SIGNAL_DEDUP_TTL_SECONDS, RISK_LIMITS, TEST_MODE, SIZING, SIZING_TABLE, SIZING_DEFAULT, TP_LADDER
+    global SL_DEBOUNCE, WATCH_ADAPTIVE
+    # Önce hepsini parse et, sonra tek blokta ata: hatalı bir değer yarım uygulanmaz.
+    leverage = int(config.get("BOT_LEVERAGE", DEFAULT_LEVERAGE))
+    margin = Decimal(str(config.get("BOT_MARGIN_USDT", BOT_MARGIN_USDT)))
+    daily_max_loss = Decimal(str(config.get("BOT_DAILY_MAX_LOSS", DAILY_MAX_LOSS)))
+    initial_sl_roe = Decimal(str(config.get("BOT_INITIAL_SL_ROE", INITIAL_SL_ROE)))
+    dynamic_precision = bool(config.get("USE_DYNAMIC_PRECISION", USE_DYNAMIC_PRECISION))
+    watch_interval = float(config.get("BOT_WATCH_INTERVAL_SECONDS", WATCH_INTERVAL_SECONDS))
+    overrides = _validate_symbol_overrides(config.get("SYMBOL_OVERRIDES"))
+    fanout = _parse_bool(config.get("FANOUT_ACCOUNTS", FANOUT_ACCOUNTS))
+    dedup_ttl = float(config.get("SIGNAL_DEDUP_TTL_SECONDS", SIGNAL_DEDUP_TTL_SECONDS))
+    risk_limits = _validate_risk_limits(config.get("RISK_LIMITS"))
+    test_mode = _parse_bool(config.get("TEST_MODE", TEST_MODE))
+    sizing = _validate_sizing(config.get("SIZING"))
+    tp_ladder = _validate_tp_ladder(config.get("TP_LADDER"))
+    sl_debounce = _validate_sl_debounce(config.get("SL_DEBOUNCE"))
+    watch_adaptive = _validate_watch_adaptive(config.get("WATCH_ADAPTIVE"))
+    table, default_profile = compile_sizing(margin, leverage, initial_sl_roe, overrides, sizing, tp_ladder)
+    if test_mode != TEST_MODE:
+        with state_lock:
+            held = len(open_positions)
+        if held:
+            # Watcher'lar/reconciler diğer backend'i sorgulayıp pozisyonları kapanmış sayardı.
+            raise ConfigConflict(f"TEST_MODE cannot change while {held} position(s) are open")
+        logger.warning(f"TEST_MODE {'enabled: orders go to the paper exchange' if test_mode else 'disabled: orders are LIVE'}")
+    DEFAULT_LEVERAGE = leverage
+    BOT_MARGIN_USDT = margin
+    DAILY_MAX_LOSS = daily_max_loss
+    INITIAL_SL_ROE = initial_sl_roe
+    USE_DYNAMIC_PRECISION = dynamic_precision
+    WATCH_INTERVAL_SECONDS = watch_interval
+    SYMBOL_OVERRIDES = overrides
+    FANOUT_ACCOUNTS = fanout
+    SIGNAL_DEDUP_TTL_SECONDS = dedup_ttl
+    RISK_LIMITS = risk_limits
+    TEST_MODE = test_mode
+    SIZING = sizing
+    SIZING_TABLE, SIZING_DEFAULT = table, default_profile
+    TP_LADDER = tp_ladder
+    SL_DEBOUNCE = sl_debounce
+    WATCH_ADAPTIVE = watch_adaptive
+    event_log.record("config", {"config": config})
+
+
+class ConfigStore:
+    """bot_config.json için bellek içi önbellek.
+
+    ``get()`` hiç disk I/O yapmaz. Değişiklikler ``CONFIG_VERSION`` sayacı ve
+    dosya mtime'ı ile algılanır; arka plan poller'ı her worker'da dosyayı
+    izleyip yeni sürümü ``apply_config`` ile uygular, watcher'lar da global
+    değerleri her tick'te okuduğu için güncellemeyi otomatik görür.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.RLock()
+        self._config: Dict[str, Any] = {}
+        self._mtime_ns: Optional[int] = None
+        self.version = 0
+
+    @staticmethod
+    def _defaults() -> Dict[str, Any]:
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+    def _stat_mtime(self) -> Optional[int]:
         try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                loaded = json.load(f)
-                default_config.update(loaded)
+            return self._path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_locked(self) -> Dict[str, Any]:
+        config = self._defaults()
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                config.update(json.load(f))
         except Exception as exc:
             logger.warning(f"Config load error: {exc}, using defaults")
-    else:
-        save_config(default_config)
-    return default_config
+        return config
+
+    def _activate_locked(self, config: Dict[str, Any], mtime: Optional[int]) -> None:
+        try:
+            config = validate_config(config)
+            apply_config(config)
+        except ConfigConflict as exc:
+            # Başka bir süreç TEST_MODE'u pozisyonlar açıkken değiştirdi: çalışan modu dosyaya
+            # geri yaz, yoksa GET /api/config ve bir sonraki restart başka modu kullanır.
+            logger.error(f"Config rejected: {exc}; keeping TEST_MODE={TEST_MODE}")
+            config = dict(config, TEST_MODE=TEST_MODE)
+            apply_config(config)
+            mtime = self._pin_test_mode_locked(config)
+        except ValueError as exc:
+            logger.error(f"Config rejected: {exc}")
+            self._mtime_ns = mtime
+            return
+        self._config = config
+        self._mtime_ns = mtime
+        self.version = int(config.get("CONFIG_VERSION", 0))
+
+    def _pin_test_mode_locked(self, config: Dict[str, Any]) -> Optional[int]:
+        with _file_lock(self._path):
+            on_disk = self._read_locked()
+            if int(on_disk.get("CONFIG_VERSION", 0)) == int(config.get("CONFIG_VERSION", 0)):
+                _atomic_write_json(self._path, config)
+            return self._stat_mtime()
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._stat_mtime() is None:
+                _atomic_write_json(self._path, self._defaults())
+            self._activate_locked(self._read_locked(), self._stat_mtime())
+            return dict(self._config)
+
+    def get(self) -> Dict[str, Any]:
+        """Return the cached config without touching the disk."""
+        with self._lock:
+            return dict(self._config)
+
+    def refresh(self) -> bool:
+        """Reload if another worker rewrote the file. Returns True if reloaded."""
+        with self._lock:
+            mtime = self._stat_mtime()
+            if mtime is None or mtime == self._mtime_ns:
+                return False
+            previous = self.version
+            self._activate_locked(self._read_locked(), mtime)
+            if self.version != previous:
+                logger.info(f"Config reloaded (version {previous} -> {self.version})")
+            return True
+
+    def _write(self, build: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock, _file_lock(self._path):
+            on_disk = self._read_locked()
+            config = validate_config(build(on_disk))
+            config["CONFIG_VERSION"] = int(on_disk.get("CONFIG_VERSION", 0)) + 1
+            apply_config(config)  # ConfigConflict -> çağırana 400, dosyaya hiçbir şey yazılmaz
+            _atomic_write_json(self._path, config)
+            self._config = config
+            self._mtime_ns = self._stat_mtime()
+            self.version = config["CONFIG_VERSION"]
+            return dict(self._config)
+
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge ``changes`` into the latest on-disk config, validate and publish."""
+        return self._write(lambda current: {**current, **changes})
+
+    def replace(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return self._write(lambda _current: dict(config))
+
+
+config_store = ConfigStore(CONFIG_FILE)
+
+
+def load_config() -> Dict[str, Any]:
+    """Return the cached bot config (bot_config.json)."""
+    return config_store.get()
 
 
 def save_config(config: Dict[str, Any]) -> None:
     """Save bot config to bot_config.json."""
     try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        config_store.replace(config)
         logger.info("Config saved")
     except Exception as exc:
         logger.error(f"Config save error: {exc}")
 
 
-def apply_config(config: Dict[str, Any]) -> None:
-    """Apply config values to global variables."""
-    global DEFAULT_LEVERAGE, BOT_MARGIN_USDT, DAILY_MAX_LOSS, INITIAL_SL_ROE
-    global USE_DYNAMIC_PRECISION, WATCH_INTERVAL_SECONDS
-    DEFAULT_LEVERAGE = int(config.get("BOT_LEVERAGE", DEFAULT_LEVERAGE))
-    BOT_MARGIN_USDT = Decimal(str(config.get("BOT_MARGIN_USDT", BOT_MARGIN_USDT)))
-    DAILY_MAX_LOSS = Decimal(str(config.get("BOT_DAILY_MAX_LOSS", DAILY_MAX_LOSS)))
-    INITIAL_SL_ROE = Decimal(str(config.get("BOT_INITIAL_SL_ROE", INITIAL_SL_ROE)))
-    USE_DYNAMIC_PRECISION = bool(config.get("USE_DYNAMIC_PRECISION", USE_DYNAMIC_PRECISION))
-    WATCH_INTERVAL_SECONDS = float(config.get("BOT_WATCH_INTERVAL_SECONDS", WATCH_INTERVAL_SECONDS))
+def _config_watch_loop() -> None:
+    while True:
+        time.sleep(CONFIG_POLL_SECONDS)
+        try:
+            config_store.refresh()
+        except Exception as exc:
+            logger.warning(f"Config refresh error: {exc}")
+
+
+def _start_config_watcher() -> None:
+    threading.Thread(target=_config_watch_loop, name="config-watcher", daemon=True).start()
+
+
+BACKGROUND_SERVICES.append(_start_config_watcher)
+
+
+# ------------------------------------------------------------------------------
+# Sizing profiles (config yüklenirken derlenen sembol -> profil tablosu)
+# ------------------------------------------------------------------------------
+
+
+class SizingProfile:
+    """Bir sembolün hazır boyutlandırma parametreleri; webhook yolunda tek dict okuması."""
+
+    __slots__ = ("margin", "leverage", "notional", "max_notional", "initial_sl_roe", "vol_target_pct", "tp_ladder")
+
+    def __init__(
+        self,
+        margin: Decimal,
+        leverage: int,
+        max_notional: Decimal,
+        initial_sl_roe: Decimal,
+        vol_target_pct: Decimal,
+        tp_ladder: Tuple[Tuple[Decimal, Decimal], ...] = (),
+    ) -> None:
+        self.margin = margin
+        self.leverage = leverage
+        self.notional = margin * Decimal(leverage)
+        self.max_notional = max_notional
+        self.initial_sl_roe = initial_sl_roe
+        self.vol_target_pct = vol_target_pct
+        self.tp_ladder = tp_ladder  # ((ROE, PCT), ...) ROE'ye göre sıralı
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def compile_sizing(
+    margin: Decimal,
+    leverage: int,
+    initial_sl_roe: Decimal,
+    overrides: Dict[str, Dict[str, Any]],
+    sizing: Dict[str, Any],
+    tp_ladder: Optional[List[Dict[str, float]]] = None,
+) -> Tuple[Dict[str, SizingProfile], SizingProfile]:
+    """Global değerler + SYMBOL_OVERRIDES -> (sembol tablosu, varsayılan profil)."""
+    settings = {**SIZING_DEFAULTS, **sizing}
+
+    def ladder(rungs: List[Dict[str, float]]) -> Tuple[Tuple[Decimal, Decimal], ...]:
+        return tuple((Decimal(str(r["ROE"])), Decimal(str(r["PCT"]))) for r in rungs)
+
+    default = SizingProfile(
+        margin,
+        leverage,
+        Decimal(str(settings["MAX_NOTIONAL"])),
+        initial_sl_roe,
+        Decimal(str(settings["VOL_TARGET_PCT"])),
+        ladder(tp_ladder or []),
+    )
+    table: Dict[str, SizingProfile] = {}
+    for symbol, fields in overrides.items():
+        table[symbol] = SizingProfile(
+            Decimal(str(fields["BOT_MARGIN_USDT"])) if "BOT_MARGIN_USDT" in fields else default.margin,
+            int(fields.get("BOT_LEVERAGE", default.leverage)),
+            Decimal(str(fields["MAX_NOTIONAL"])) if "MAX_NOTIONAL" in fields else default.max_notional,
+            Decimal(str(fields["BOT_INITIAL_SL_ROE"])) if "BOT_INITIAL_SL_ROE" in fields else default.initial_sl_roe,
+            Decimal(str(fields["VOL_TARGET_PCT"])) if "VOL_TARGET_PCT" in fields else default.vol_target_pct,
+            ladder(fields["TP_LADDER"]) if "TP_LADDER" in fields else default.tp_ladder,
+        )
+    return table, default
+
+
+SIZING_TABLE, SIZING_DEFAULT = compile_sizing(BOT_MARGIN_USDT, DEFAULT_LEVERAGE, INITIAL_SL_ROE, {}, {})
+
+
+def sizing_profile(symbol: str) -> SizingProfile:
+    return SIZING_TABLE.get(symbol.upper(), SIZING_DEFAULT)
+
+
+def symbol_margin(symbol: str) -> Decimal:
+    return sizing_profile(symbol).margin
+
+
+def symbol_leverage(symbol: str) -> int:
+    return sizing_profile(symbol).leverage
+
+
+def symbol_initial_sl_roe(symbol: str) -> Decimal:
+    return sizing_profile(symbol).initial_sl_roe
 
 
 # Load and apply config on startup
-_config_data = load_config()
-apply_config(_config_data)
+_config_data = config_store.load()
 
 
 # ------------------------------------------------------------------------------
@@ -194,9 +1386,8 @@ apply_config(_config_data)
 # ------------------------------------------------------------------------------
 
 
-def load_users() -> List[Dict[str, Any]]:
-    """Load users from users.json, create default admin if missing."""
-    default_users = [
+def _default_users() -> List[Dict[str, Any]]:
+    return [
         {
             "username": "admin",
             "password_hash": generate_password_hash("admin"),
@@ -206,44 +1397,146 @@ def load_users() -> List[Dict[str, Any]]:
             "theme_preference": "dark",
         }
     ]
-    if USERS_FILE.exists():
+
+
+class UserStore:
+    """users.json için bellek içi, kullanıcı adına göre indeksli depo.
+
+    Okumalar dosyayı yalnızca mtime değiştiğinde yeniden ayrıştırır; yazmalar
+    dosya kilidi altında diskteki son hali okuyup atomik olarak (temp + rename)
+    yazar, böylece birden çok gunicorn worker'ı birbirinin değişikliğini ezmez.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.RLock()
+        self._users: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._mtime_ns: Optional[int] = None
+
+    def _stat_mtime(self) -> Optional[int]:
         try:
-            with open(USERS_FILE, "r", encoding="utf-8") as f:
-                loaded = json.load(f)
-                if loaded:
-                    return loaded
-        except Exception as exc:
-            logger.warning(f"Users load error: {exc}, creating default")
-    else:
-        save_users(default_users)
-        logger.info("Created default users.json with admin/admin")
-    return default_users
+            return self._path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_locked(self, file_locked: bool = False) -> None:
+        mtime = self._stat_mtime()
+        if mtime is None and not file_locked:
+            # Varsayılan dosyayı da _mutate ile aynı kilit altında yaz; kilidi alınca tekrar
+            # bak, bu arada başka bir worker dosyayı oluşturmuş (ya da bir kullanıcı eklemiş) olabilir.
+            with _file_lock(self._path):
+                self._load_locked(file_locked=True)
+            return
+        if mtime is None:
+            users = _default_users()
+            _atomic_write_json(self._path, users)
+            logger.info("Created default users.json with admin/admin")
+            mtime = self._stat_mtime()
+        else:
+            users = []
+            try:
+                with open(self._path, "r", encoding="utf-8") as f:
+                    users = json.load(f) or []
+            except Exception as exc:
+                logger.warning(f"Users load error: {exc}, creating default")
+            if not users:
+                users = _default_users()
+        self._set_locked(users, mtime)
+
+    def _set_locked(self, users: List[Dict[str, Any]], mtime: Optional[int]) -> None:
+        self._users = users
+        self._index = {str(u.get("username")): u for u in users}
+        self._mtime_ns = mtime
+
+    def _refresh_locked(self, file_locked: bool = False) -> None:
+        if self._mtime_ns is None or self._stat_mtime() != self._mtime_ns:
+            self._load_locked(file_locked)
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh_locked()
+            return [dict(u) for u in self._users]
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh_locked()
+            user = self._index.get(username)
+            return dict(user) if user is not None else None
+
+    def _mutate(self, fn) -> Any:
+        """Run ``fn(users)`` on the on-disk state under the file lock and persist it."""
+        with self._lock, _file_lock(self._path):
+            self._mtime_ns = None
+            self._refresh_locked(file_locked=True)
+            users = [dict(u) for u in self._users]
+            result = fn(users)
+            if result is not False:
+                _atomic_write_json(self._path, users)
+                self._set_locked(users, self._stat_mtime())
+            return result
+
+    def replace_all(self, users: List[Dict[str, Any]]) -> None:
+        def _apply(current: List[Dict[str, Any]]) -> bool:
+            current[:] = [dict(u) for u in users]
+            return True
+
+        self._mutate(_apply)
+
+    def create(self, user: Dict[str, Any]) -> bool:
+        def _apply(current: List[Dict[str, Any]]) -> bool:
+            if any(u.get("username") == user["username"] for u in current):
+                return False
+            current.append(dict(user))
+            return True
+
+        return bool(self._mutate(_apply))
+
+    def update(self, username: str, changes: Dict[str, Any]) -> bool:
+        def _apply(current: List[Dict[str, Any]]) -> bool:
+            for u in current:
+                if u.get("username") == username:
+                    u.update(changes)
+                    return True
+            return False
+
+        return bool(self._mutate(_apply))
+
+    def delete(self, username: str) -> bool:
+        def _apply(current: List[Dict[str, Any]]) -> bool:
+            remaining = [u for u in current if u.get("username") != username]
+            if len(remaining) == len(current):
+                return False
+            current[:] = remaining
+            return True
+
+        return bool(self._mutate(_apply))
+
+
+user_store = UserStore(USERS_FILE)
+
+
+def load_users() -> List[Dict[str, Any]]:
+    """Load users from users.json, create default admin if missing."""
+    return user_store.all()
 
 
 def save_users(users: List[Dict[str, Any]]) -> None:
     """Save users to users.json."""
     try:
-        with open(USERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(users, f, indent=2, ensure_ascii=False)
+        user_store.replace_all(users)
     except Exception as exc:
         logger.error(f"Users save error: {exc}")
 
 
 def find_user(username: str) -> Optional[Dict[str, Any]]:
     """Find user by username."""
-    users = load_users()
-    for user in users:
-        if user.get("username") == username:
-            return user
-    return None
+    return user_store.get(username)
 
 
 def create_user(username: str, password: str, role: str, api_key: str = "", api_secret: str = "") -> bool:
     """Create new user. Returns True if created, False if username exists."""
-    users = load_users()
-    if find_user(username):
-        return False
-    users.append(
+    created = user_store.create(
         {
             "username": username,
             "password_hash": generate_password_hash(password),
@@ -253,9 +1546,9 @@ def create_user(username: str, password: str, role: str, api_key: str = "", api_
             "theme_preference": "dark",
         }
     )
-    save_users(users)
-    logger.info(f"User created: {username} ({role})")
-    return True
+    if created:
+        logger.info(f"User created: {username} ({role})")
+    return created
 
 
 def mask_api_key(key: str) -> str:
@@ -328,173 +1621,375 @@ class PrecisionCache:
     _cache: Dict[str, Dict[str, Any]] = {}
     _lock = threading.Lock()
 
-    @staticmethod
-    def _count_decimals(text: str) -> int:
-        if "." not in text:
-            return 0
-        return len(text.split(".")[1].rstrip("0"))
+    # Filtre ayrıştırma exchange_filters'ta (scanner.py bot'u import etmeden kullanır).
+    _fallback = staticmethod(fallback_precision)
+    parse_symbol_info = staticmethod(parse_symbol_info)
 
     @classmethod
     def get(cls, symbol: str) -> Dict[str, Any]:
         sym = symbol.upper()
-        with cls._lock:
-            cached = cls._cache.get(sym)
+        with tracer.span("PrecisionCache.get", symbol=sym) as span:
+            with cls._lock:
+                cached = cls._cache.get(sym)
+            if span is not None:
+                span["attrs"]["cached"] = bool(cached)
             if cached:
                 return cached
+            return cls._load(sym)
 
-        if not USE_DYNAMIC_PRECISION:
-            data = {
-                "stepSize": Decimal("0"),
-                "marketStepSize": Decimal("0"),
-                "tickSize": Decimal("0.0001"),
-                "qty_decimals": 3,
-                "market_qty_decimals": 3,
-                "price_decimals": 4,
-            }
-            with cls._lock:
-                cls._cache[sym] = data
-            return data
+    @classmethod
+    def from_exchange_info(cls, sym: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        symbols = payload.get("symbols") or []
+        if not symbols:
+            raise RuntimeError(f"exchangeInfo empty for {sym}")
+        for item in symbols:
+            if str(item.get("symbol")).upper() == sym:
+                return cls.parse_symbol_info(item)
+        raise RuntimeError(f"symbol {sym} not present in exchangeInfo response")
 
+    @classmethod
+    def store(cls, sym: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        with cls._lock:
+            cls._cache[sym.upper()] = data
+        return data
+
+    @classmethod
+    def _load(cls, sym: str) -> Dict[str, Any]:
+        if not USE_DYNAMIC_PRECISION:
+            return cls.store(sym, cls._fallback())
         try:
-            resp = http_session.get(f"{BASE_URL}/fapi/v1/exchangeInfo", params={"symbol": sym}, timeout=10)
+            resp = _public_get("/fapi/v1/exchangeInfo", {"symbol": sym}, timeout=10)
             resp.raise_for_status()
-            payload = resp.json()
-            symbols = payload.get("symbols") or []
-            if not symbols:
-                raise RuntimeError(f"exchangeInfo empty for {sym}")
-            info = None
-            for item in symbols:
-                if str(item.get("symbol")).upper() == sym:
-                    info = item
-                    break
-            if info is None:
-                raise RuntimeError(f"symbol {sym} not present in exchangeInfo response")
-            step_size = None
-            market_step_size = None
-            tick_size = None
-            for flt in info.get("filters", []):
-                if flt.get("filterType") == "LOT_SIZE":
-                    step_size = flt.get("stepSize")
-                elif flt.get("filterType") == "MARKET_LOT_SIZE":
-                    market_step_size = flt.get("stepSize")
-                elif flt.get("filterType") == "PRICE_FILTER":
-                    tick_size = flt.get("tickSize")
-            if (step_size is None and market_step_size is None) or tick_size is None:
-                raise RuntimeError(
-                    f"missing filters for {sym}: step={step_size} market_step={market_step_size} tick={tick_size}"
-                )
-            qty_decimals = cls._count_decimals(str(step_size))
-            market_qty_decimals = cls._count_decimals(str(market_step_size)) if market_step_size else qty_decimals
-            price_decimals = cls._count_decimals(str(tick_size))
-            data = {
-                "stepSize": Decimal(str(step_size)) if step_size else Decimal("0"),
-                "marketStepSize": Decimal(str(market_step_size)) if market_step_size else Decimal("0"),
-                "tickSize": Decimal(str(tick_size)),
-                "qty_decimals": qty_decimals,
-                "market_qty_decimals": market_qty_decimals,
-                "price_decimals": price_decimals,
-            }
-            with cls._lock:
-                cls._cache[sym] = data
-            return data
+            return cls.store(sym, cls.from_exchange_info(sym, resp.json()))
         except Exception as exc:
             print(f"[PRECISION] exchangeInfo error for {sym}: {exc}")
-            data = {
-                "stepSize": Decimal("0"),
-                "marketStepSize": Decimal("0"),
-                "tickSize": Decimal("0.0001"),
-                "qty_decimals": 3,
-                "market_qty_decimals": 3,
-                "price_decimals": 4,
-            }
-            with cls._lock:
-                cls._cache[sym] = data
-            return data
+            return cls.store(sym, cls._fallback())
 
 
-def _format_decimal(value: Decimal, decimals: int) -> str:
-    quant = Decimal("1") if decimals == 0 else Decimal(f"1e-{decimals}")
-    return f"{value.quantize(quant, rounding=ROUND_DOWN):.{decimals}f}"
+def _floor_quantity(symbol: str, qty: Decimal, precision: Optional[Dict[str, Any]] = None) -> Decimal:
+    return floor_quantity(qty, precision or PrecisionCache.get(symbol))
 
 
-def _floor_to_step(value: Decimal, step: Decimal) -> Decimal:
-    if step <= 0:
-        return value
-    units = (value / step).to_integral_value(rounding=ROUND_DOWN)
-    return units * step
+def _format_quantity(symbol: str, qty: Decimal, precision: Optional[Dict[str, Any]] = None) -> str:
+    return format_quantity(qty, precision or PrecisionCache.get(symbol))
 
 
-def _ceil_to_step(value: Decimal, step: Decimal) -> Decimal:
-    if step <= 0:
-        return value
-    units = (value / step)
-    integral = units.to_integral_value(rounding=ROUND_DOWN)
-    if units == integral:
-        return value
-    return (integral + 1) * step
+def _format_price(symbol: str, price: Decimal, position_side: str, precision: Optional[Dict[str, Any]] = None) -> str:
+    return format_price(price, position_side, precision or PrecisionCache.get(symbol))
+
+
+def validate_order_quantity(
+    symbol: str,
+    qty: Decimal,
+    price: Optional[Decimal],
+    precision: Dict[str, Any],
+    mark_price: Optional[Decimal] = None,
+    order_type: str = "MARKET",
+) -> Decimal:
+    """Yerel ön-işlem kontrolü; borsaya hiçbir istek gitmeden çalışır.
+
+    maxQty üstü miktar kırpılır; minQty ya da MIN_NOTIONAL (``price`` ile)
+    ihlalinde ValueError atılır. PERCENT_PRICE bandı yalnızca fiyatlı emirlerde
+    (LIMIT/STOP; ``price`` emrin fiyatı) ve mark fiyatı biliniyorsa uygulanır;
+    market emri fiyat taşımaz, alarmın entry'si bantla karşılaştırılmaz.
+    """
+    max_qty = precision.get("maxQty") or Decimal("0")
+    if max_qty > 0 and qty > max_qty:
+        clamped = _floor_quantity(symbol, max_qty, precision)
+        print(f"[VALIDATE] {symbol} qty={qty} > maxQty={max_qty}, clamped to {clamped}")
+        metrics.inc("bot_order_validation_total", result="clamped", reason="max_qty")
+        qty = clamped
+
+    min_qty = precision.get("minQty") or Decimal("0")
+    min_notional = precision.get("minNotional") or Decimal("0")
+    up = precision.get("multiplierUp") or Decimal("0")
+    down = precision.get("multiplierDown") or Decimal("0")
+    failure = None
+    if qty <= 0:
+        failure = ("zero_qty", "quantity<=0")
+    elif qty < min_qty:
+        failure = ("min_qty", f"qty {qty} < minQty {min_qty}")
+    elif price and min_notional > 0 and qty * price < min_notional:
+        failure = ("min_notional", f"notional {qty * price} < MIN_NOTIONAL {min_notional}")
+    elif (
+        order_type != "MARKET"
+        and price
+        and mark_price
+        and up > 0
+        and down > 0
+        and not (mark_price * down <= price <= mark_price * up)
+    ):
+        failure = ("percent_price", f"price {price} outside PERCENT_PRICE band {down}-{up} of mark {mark_price}")
+    if failure:
+        metrics.inc("bot_order_validation_total", result="rejected", reason=failure[0])
+        raise ValueError(f"{symbol} pre-trade check failed: {failure[1]}")
+    return qty
 
 
-def _floor_quantity(symbol: str, qty: Decimal, precision: Optional[Dict[str, Any]] = None) -> Decimal:
-    precision = precision or PrecisionCache.get(symbol)
-    step = precision["marketStepSize"] if precision["marketStepSize"] > 0 else precision["stepSize"]
-    if step > 0:
-        return _floor_to_step(qty, step)
-    return qty.quantize(Decimal("0.001"), rounding=ROUND_DOWN)
+# ------------------------------------------------------------------------------
+# Binance HTTP helpers
+# ------------------------------------------------------------------------------
 
+class AccountContext:
+    """Tek bir Binance hesabı: kendi anahtarları, HTTP session'ı ve limitleri.
 
-def _format_quantity(symbol: str, qty: Decimal, precision: Optional[Dict[str, Any]] = None) -> str:
-    precision = precision or PrecisionCache.get(symbol)
-    decimals = precision["market_qty_decimals"] if precision["marketStepSize"] > 0 else precision["qty_decimals"]
-    decimals = decimals if decimals is not None else 3
-    return _format_decimal(qty, decimals)
+    ``default`` hesabı ortam değişkenlerindeki BINANCE_API_KEY/SECRET'tır; diğerleri
+    users.json'da api_key/api_secret'ı dolu kullanıcılardır. Kullanıcı kaydındaki
+    opsiyonel ``margin_usdt`` ve ``max_open_positions`` alanları hesap limitidir.
+    """
 
+    def __init__(
+        self,
+        name: str,
+        api_key: str,
+        api_secret: str,
+        session: Optional[requests.Session] = None,
+        margin_usdt: Optional[Decimal] = None,
+        max_open_positions: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.margin_usdt = margin_usdt
+        self.max_open_positions = max_open_positions
+        if session is None:
+            session = requests.Session()
+            if api_key:
+                session.headers.update({"X-MBX-APIKEY": api_key})
+        self.session = session
+
+    @property
+    def is_primary(self) -> bool:
+        return self.name == PRIMARY_ACCOUNT_NAME
+
+    def sign(self, query: str) -> str:
+        if not self.api_secret:
+            raise RuntimeError(f"API secret not configured for account {self.name}")
+        return hmac.new(self.api_secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+
+
+PRIMARY_ACCOUNT_NAME = "default"
+PRIMARY_ACCOUNT = AccountContext(PRIMARY_ACCOUNT_NAME, API_KEY, API_SECRET, session=http_session)
+
+_account_local = threading.local()
+_account_cache: Dict[str, AccountContext] = {}
+_account_cache_lock = threading.Lock()
+
+
+def current_account() -> AccountContext:
+    """Account used by signed requests on this thread (default: env account)."""
+    return getattr(_account_local, "account", None) or PRIMARY_ACCOUNT
+
+
+@contextmanager
+def account_scope(account: AccountContext) -> Iterator[AccountContext]:
+    previous = getattr(_account_local, "account", None)
+    _account_local.account = account
+    try:
+        yield account
+    finally:
+        _account_local.account = previous
+
+
+def _account_from_user(user: Dict[str, Any]) -> AccountContext:
+    name = str(user["username"])
+    with _account_cache_lock:
+        cached = _account_cache.get(name)
+        # Anahtarlar değişmediyse session'ı (ve keep-alive bağlantılarını) koru.
+        if cached and cached.api_key == user["api_key"] and cached.api_secret == user["api_secret"]:
+            session = cached.session
+        else:
+            session = None
+        margin = user.get("margin_usdt")
+        max_positions = user.get("max_open_positions")
+        account = AccountContext(
+            name,
+            user["api_key"],
+            user["api_secret"],
+            session=session,
+            margin_usdt=Decimal(str(margin)) if margin not in (None, "") else None,
+            max_open_positions=int(max_positions) if max_positions not in (None, "") else None,
+        )
+        _account_cache[name] = account
+        return account
 
-def _format_price(symbol: str, price: Decimal, position_side: str, precision: Optional[Dict[str, Any]] = None) -> str:
-    precision = precision or PrecisionCache.get(symbol)
-    tick = precision["tickSize"] if precision["tickSize"] > 0 else Decimal("0.0001")
-    decimals = precision["price_decimals"] if precision["price_decimals"] is not None else 4
-    if position_side.upper() == "LONG":
-        adj = _floor_to_step(price, tick)
-    else:
-        adj = _ceil_to_step(price, tick)
-    return _format_decimal(adj, decimals)
 
+def get_accounts() -> List[AccountContext]:
+    """Default account (if configured) plus every user with API keys."""
+    accounts = [PRIMARY_ACCOUNT] if API_KEY and API_SECRET else []
+    for user in user_store.all():
+        if user.get("api_key") and user.get("api_secret") and user.get("username") != PRIMARY_ACCOUNT_NAME:
+            accounts.append(_account_from_user(user))
+    return accounts
+
+
+def get_account(name: Optional[str]) -> Optional[AccountContext]:
+    if not name or name == PRIMARY_ACCOUNT_NAME:
+        return PRIMARY_ACCOUNT
+    user = user_store.get(name)
+    if not user or not user.get("api_key") or not user.get("api_secret"):
+        return None
+    return _account_from_user(user)
 
-# ------------------------------------------------------------------------------
-# Binance HTTP helpers
-# ------------------------------------------------------------------------------
 
 def _ensure_secret() -> None:
-    if not API_SECRET:
+    if not current_account().api_secret:
         raise RuntimeError("BINANCE_API_SECRET not configured")
 
 
 def _sign(query: str) -> str:
     _ensure_secret()
-    return hmac.new(API_SECRET.encode(), query.encode(), hashlib.sha256).hexdigest()
+    return current_account().sign(query)
+
+
+class TimeSync:
+    """Yerel saat ile Binance sunucu saati arasındaki ofseti ölçer.
+
+    Her ölçümde birkaç ``/fapi/v1/time`` örneği alınır ve en düşük RTT'li örnek
+    kullanılır (ofset = serverTime - istek ortası). İmzalı isteklerin timestamp'i
+    bu ofsetle düzeltilir; -1021 reddinde hemen yeniden senkronize edilir.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.offset_ms = 0.0
+        self.rtt_ms: Optional[float] = None
+        self.last_sync: Optional[float] = None
+        self.syncs = 0
+        self.failures = 0
+        self.rejects = 0
+
+    def sync(self, samples: int = 3) -> bool:
+        best: Optional[tuple] = None
+        for _ in range(samples):
+            try:
+                t0 = time.time() * 1000
+                resp = _public_get("/fapi/v1/time", {}, timeout=5)
+                t1 = time.time() * 1000
+                server_time = float(resp.json()["serverTime"])
+            except Exception as exc:
+                logger.warning(f"Time sync sample failed: {exc}")
+                continue
+            rtt = t1 - t0
+            if best is None or rtt < best[0]:
+                best = (rtt, server_time - (t0 + t1) / 2)
+        with self._lock:
+            if best is None:
+                self.failures += 1
+                return False
+            self.rtt_ms, self.offset_ms = best
+            self.last_sync = time.time()
+            self.syncs += 1
+        metrics.set_gauge("bot_time_offset_ms", self.offset_ms)
+        metrics.set_gauge("bot_time_rtt_ms", self.rtt_ms)
+        return True
+
+    def timestamp(self) -> int:
+        return int(time.time() * 1000 + self.offset_ms)
+
+    def note_reject(self) -> None:
+        with self._lock:
+            self.rejects += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "offset_ms": round(self.offset_ms, 3),
+                "rtt_ms": round(self.rtt_ms, 3) if self.rtt_ms is not None else None,
+                "last_sync": self.last_sync,
+                "syncs": self.syncs,
+                "failures": self.failures,
+                "timestamp_rejects": self.rejects,
+                "recv_window_ms": RECV_WINDOW_MS,
+            }
 
 
-def _signed_request(method: str, path: str, params: Dict[str, Any]) -> requests.Response:
-    payload: Dict[str, Any] = {}
+time_sync = TimeSync()
+
+
+def _time_sync_loop() -> None:
+    while True:
+        time_sync.sync()
+        time.sleep(TIME_SYNC_INTERVAL_SECONDS)
+
+
+def _start_time_sync() -> None:
+    if _runs_trading_engine() and TIME_SYNC_INTERVAL_SECONDS > 0:
+        threading.Thread(target=_time_sync_loop, name="time-sync", daemon=True).start()
+
+
+BACKGROUND_SERVICES.append(_start_time_sync)
+
+
+def _is_timestamp_reject(resp: requests.Response) -> bool:
+    if resp.status_code != 400:
+        return False
+    try:
+        data = resp.json()
+    except Exception:
+        return False
+    return isinstance(data, dict) and data.get("code") == -1021
+
+
+def _signed_request(method: str, path: str, params: Dict[str, Any], timeout: float = 10) -> requests.Response:
+    if TEST_MODE:
+        status, data = paper_exchange.handle(current_account().name, method, path, params)
+        return _paper_response(status, data)
+    base: Dict[str, Any] = {}
     for key, value in params.items():
         if value is None:
             continue
         if isinstance(value, Decimal):
-            payload[key] = str(value)
+            base[key] = str(value)
         else:
-            payload[key] = value
-    payload["timestamp"] = int(time.time() * 1000)
-    query = urlencode(payload, doseq=True)
-    payload["signature"] = _sign(query)
+            base[key] = value
+    if RECV_WINDOW_MS > 0:
+        base.setdefault("recvWindow", RECV_WINDOW_MS)
     url = BASE_URL + path
     method = method.upper()
+    account_session = current_account().session
     if method == "GET":
-        return http_session.get(url, params=payload, timeout=10)
-    if method == "POST":
-        return http_session.post(url, params=payload, timeout=10)
-    if method == "DELETE":
-        return http_session.delete(url, params=payload, timeout=10)
-    raise ValueError(f"Unsupported method {method}")
+        send = account_session.get
+    elif method == "POST":
+        send = account_session.post
+    elif method == "DELETE":
+        send = account_session.delete
+    else:
+        raise ValueError(f"Unsupported method {method}")
+    for attempt in range(2):
+        payload = dict(base)
+        payload["timestamp"] = time_sync.timestamp()
+        query = urlencode(payload, doseq=True)
+        payload["signature"] = _sign(query)
+        resp = _timed_http(send, method, path, url, payload, timeout)
+        if attempt or not _is_timestamp_reject(resp):
+            return resp
+        # -1021: istek borsaya hiç işlenmeden reddedildi, saat düzeltilip güvenle tekrar denenir.
+        time_sync.note_reject()
+        metrics.inc("bot_timestamp_rejects_total", endpoint=path)
+        print(f"[TIME SYNC] -1021 on {method} {path}, resyncing (offset={time_sync.offset_ms:.1f}ms)")
+        time_sync.sync(samples=1)
+    return resp
+
+
+def _timed_http(send: Callable[..., requests.Response], method: str, path: str, url: str, params: Dict[str, Any], timeout: float) -> requests.Response:
+    started = time.perf_counter()
+    status = "error"
+    try:
+        with tracer.span(f"{method} {path}", endpoint=path) as span:
+            resp = send(url, params=params, timeout=timeout)
+            status = str(resp.status_code)
+            if span is not None:
+                span["attrs"]["http.status_code"] = resp.status_code
+        return resp
+    finally:
+        metrics.observe("bot_exchange_request_seconds", time.perf_counter() - started, endpoint=path, method=method)
+        metrics.inc("bot_exchange_requests_total", endpoint=path, method=method, status=status)
+
+
+def _public_get(path: str, params: Dict[str, Any], timeout: float = 10) -> requests.Response:
+    """Unsigned GET on the shared session (exchangeInfo, ticker, klines ...)."""
+    return _timed_http(http_session.get, "GET", path, BASE_URL + path, params, timeout)
 
 
 def _signed_get(path: str, params: Dict[str, Any]) -> requests.Response:
@@ -509,17 +2004,481 @@ def _signed_delete(path: str, params: Dict[str, Any]) -> requests.Response:
     return _signed_request("DELETE", path, params)
 
 
+# ------------------------------------------------------------------------------
+# Paper trading (TEST_MODE)
+# ------------------------------------------------------------------------------
+
+
+def _paper_response(status: int, data: Any) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps(data, default=str).encode("utf-8")
+    resp.headers["Content-Type"] = "application/json"
+    return resp
+
+
+def _paper_flag(value: Any) -> bool:
+    return str(value).lower() == "true"
+
+
+class PaperExchange:
+    """Binance Futures imzalı uç noktalarının yerel simülasyonu.
+
+    ``_signed_request`` TEST_MODE'da buraya yönlenir; böylece emir, SL,
+    positionRisk, openOrders ve hesap çağrıları aynı fonksiyonlardan geçer.
+    Market emirleri mark fiyatından slippage ile dolar, taker fee düşülür;
+    STOP_MARKET / TAKE_PROFIT_MARKET emirleri ve kapanış yönlü LIMIT (TP)
+    emirleri her fiyat güncellemesinde yerel olarak tetiklenir. Fiyat kaynağı canlı ticker ya da ``set_price`` ile
+    verilen kayıtlı fiyatlardır (replay'de ``clock`` da kayıt zamanıdır).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.replaying = False
+        self.reset()
+
+    def reset(self, balance: Optional[Decimal] = None) -> None:
+        with self._lock:
+            self.start_balance = _decimal(balance) if balance is not None else PAPER_START_BALANCE
+            self.balance = self.start_balance
+            self.fees = Decimal("0")
+            self.realized_by_day: Dict[str, Decimal] = {}
+            self.positions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+            self.orders: Dict[int, Dict[str, Any]] = {}
+            # Dolan/iptal olan emirler de Binance'teki gibi clientOrderId ile sorgulanabilir.
+            self.done_orders: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+            self.trades: List[Dict[str, Any]] = []
+            self.leverage: Dict[Tuple[str, str], int] = {}
+            self._prices: Dict[str, Tuple[Decimal, float]] = {}
+            self._next_id = 1
+            self.clock: Optional[float] = None
+            self.equity_peak = self.balance
+            self.max_drawdown = Decimal("0")
+
+    def now(self) -> float:
+        return self.clock if self.clock is not None else time.time()
+
+    def _archive(self, account: str, order: Dict[str, Any], status: str) -> Dict[str, Any]:
+        done = dict(self._public_order(order), status=status)
+        self.done_orders[(account, done["clientOrderId"])] = done
+        while len(self.done_orders) > 5000:
+            self.done_orders.popitem(last=False)
+        return done
+
+    # --- prices ----------------------------------------------------------------
+
+    def set_price(self, symbol: str, price: Any, ts: Optional[float] = None) -> None:
+        """Feed a mark price (live or recorded) and trigger resting stops."""
+        sym = symbol.upper()
+        value = _decimal(price)
+        with self._lock:
+            if ts is not None:
+                self.clock = ts
+            self._prices[sym] = (value, time.monotonic())
+            self._trigger_stops(sym, value)
+        price_history.record(sym, value, ts)
+
+    def has_price(self, symbol: str) -> bool:
+        with self._lock:
+            return symbol.upper() in self._prices
+
+    def mark(self, symbol: str) -> Decimal:
+        sym = symbol.upper()
+        with self._lock:
+            cached = self._prices.get(sym)
+            if cached is not None and (self.clock is not None or time.monotonic() - cached[1] < 1.0):
+                return cached[0]
+            if self.replaying:
+                # Kayıtta fiyatı olmayan sembol için canlı ticker replay sonucunu bozar.
+                raise RuntimeError(f"no recorded price for {sym}")
+        resp = _public_get("/fapi/v1/ticker/price", {"symbol": sym}, timeout=5)
+        resp.raise_for_status()
+        price = _decimal(resp.json()["price"])
+        self.set_price(sym, price)
+        return price
+
+    # --- fills -----------------------------------------------------------------
+
+    def _day(self) -> str:
+        return datetime.fromtimestamp(self.now()).strftime("%Y-%m-%d")
+
+    def _book(self, amount: Decimal) -> None:
+        self.balance += amount
+        day = self._day()
+        self.realized_by_day[day] = self.realized_by_day.get(day, Decimal("0")) + amount
+        self.equity_peak = max(self.equity_peak, self.balance)
+        self.max_drawdown = max(self.max_drawdown, self.equity_peak - self.balance)
+
+    def _fill(self, account: str, symbol: str, side: str, position_side: str, qty: Decimal, ref_price: Decimal, reason: str) -> Dict[str, Any]:
+        # LIMIT emri kendi fiyatından dolar, slippage yok.
+        slip = Decimal("0") if reason == "LIMIT" else ref_price * PAPER_SLIPPAGE_BPS / Decimal("10000")
+        price = ref_price + slip if side == "BUY" else ref_price - slip
+        key = (account, symbol, position_side)
+        pos = self.positions.get(key)
+        opening = (side == "BUY") == (position_side == "LONG")
+        if not opening:
+            if pos is None:
+                raise ValueError("ReduceOnly Order is rejected.")
+            qty = min(qty, pos["amt"])
+        fee = price * qty * PAPER_FEE_RATE
+        self.fees += fee
+        self._book(-fee)
+        if opening:
+            if pos is None:
+                pos = {"amt": Decimal("0"), "entry": Decimal("0"), "opened_at": self.now(), "fees": Decimal("0")}
+                self.positions[key] = pos
+            total = pos["amt"] + qty
+            pos["entry"] = (pos["entry"] * pos["amt"] + price * qty) / total
+            pos["amt"] = total
+            pos["fees"] += fee
+        else:
+            move = price - pos["entry"] if position_side == "LONG" else pos["entry"] - price
+            pnl = move * qty
+            self._book(pnl)
+            pos["amt"] -= qty
+            self.trades.append(
+                {
+                    "account": account,
+                    "symbol": symbol,
+                    "position_side": position_side,
+                    "qty": float(qty),
+                    "entry": float(pos["entry"]),
+                    "exit": float(price),
+                    "pnl": float(pnl),
+                    "fees": float(pos["fees"] + fee),
+                    "reason": reason,
+                    "opened_at": pos["opened_at"],
+                    "closed_at": self.now(),
+                }
+            )
+            pos["fees"] = Decimal("0")
+            if pos["amt"] <= 0:
+                del self.positions[key]
+                # Pozisyon kapanınca closePosition emirleri de düşer.
+                for oid in [o for o, order in self.orders.items() if order["_key"] == key and order["closePosition"]]:
+                    self._archive(account, self.orders.pop(oid), "EXPIRED")
+        return {"price": price, "qty": qty}
+
+    def _stop_triggered(self, order: Dict[str, Any], mark: Decimal) -> bool:
+        if order["type"] == "LIMIT":
+            return mark >= order["_stop"] if order["side"] == "SELL" else mark <= order["_stop"]
+        stop = order["_stop"]
+        falling = (order["side"] == "SELL") == (order["type"] == "STOP_MARKET")
+        return mark <= stop if falling else mark >= stop
+
+    def _trigger_stops(self, symbol: str, mark: Decimal) -> None:
+        for oid, order in list(self.orders.items()):
+            if order["symbol"] != symbol or oid not in self.orders or not self._stop_triggered(order, mark):
+                continue
+            del self.orders[oid]
+            self._archive(order["_key"][0], order, "FILLED")
+            pos = self.positions.get(order["_key"])
+            if pos is None:
+                continue
+            qty = pos["amt"] if order["closePosition"] else min(_decimal(order["origQty"]), pos["amt"])
+            self._fill(order["_key"][0], symbol, order["side"], order["positionSide"], qty, order["_stop"], order["type"])
+            if order["type"] == "LIMIT":
+                self.done_orders[(order["_key"][0], order["clientOrderId"])].update(executedQty=str(qty), avgPrice=str(order["_stop"]))
+
+    # --- endpoints -------------------------------------------------------------
+
+    def _position_row(self, account: str, symbol: str, side: str, mark: Decimal) -> Dict[str, Any]:
+        pos = self.positions.get((account, symbol, side))
+        amt = pos["amt"] if pos else Decimal("0")
+        entry = pos["entry"] if pos else Decimal("0")
+        leverage = self.leverage.get((account, symbol), DEFAULT_LEVERAGE)
+        upnl = (mark - entry) * amt if side == "LONG" else (entry - mark) * amt
+        return {
+            "symbol": symbol,
+            "positionSide": side,
+            "positionAmt": str(amt if side == "LONG" else -amt),
+            "entryPrice": str(entry),
+            "markPrice": str(mark),
+            "unRealizedProfit": str(upnl if pos else 0),
+            "leverage": str(leverage),
+            "isolatedMargin": str(entry * amt / Decimal(leverage) + upnl if pos else 0),
+            "marginType": "isolated",
+        }
+
+    def _public_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in order.items() if not k.startswith("_")}
+
+    def handle(self, account: str, method: str, path: str, params: Dict[str, Any]) -> Tuple[int, Any]:
+        method = method.upper()
+        p = {k: v for k, v in params.items() if v is not None}
+        symbol = str(p.get("symbol", "")).upper()
+        try:
+            # Canlı fiyat gerekiyorsa ağ çağrısı lock dışında yapılır.
+            if symbol and (path == "/fapi/v2/positionRisk" or (path == "/fapi/v1/order" and method == "POST")):
+                mark = self.mark(symbol)
+            elif path == "/fapi/v1/batchOrders":
+                batch = json.loads(p.get("batchOrders") or "[]")
+                marks = {sym: self.mark(sym) for sym in {str(item.get("symbol", "")).upper() for item in batch}}
+            elif path == "/fapi/v2/positionRisk":
+                with self._lock:
+                    held = {sym for (acc, sym, _side) in self.positions if acc == account}
+                marks = {sym: self.mark(sym) for sym in held}
+            with self._lock:
+                if path == "/fapi/v2/positionRisk":
+                    if symbol:
+                        return 200, [self._position_row(account, symbol, side, mark) for side in ("LONG", "SHORT")]
+                    return 200, [
+                        self._position_row(acc, sym, side, marks[sym])
+                        for (acc, sym, side) in list(self.positions)
+                        if acc == account
+                    ]
+                if path == "/fapi/v1/openOrders":
+                    return 200, [
+                        self._public_order(o)
+                        for o in self.orders.values()
+                        if o["_key"][0] == account and (not symbol or o["symbol"] == symbol)
+                    ]
+                if path == "/fapi/v1/order" and method == "POST":
+                    return self._new_order(account, symbol, p, mark)
+                if path == "/fapi/v1/batchOrders" and method == "POST":
+                    # Binance gibi: HTTP 200, her emir için ya emir ya da {"code", "msg"}.
+                    results = []
+                    for item in batch:
+                        sym = str(item.get("symbol", "")).upper()
+                        try:
+                            _status, data = self._new_order(account, sym, item, marks[sym])
+                        except ValueError as exc:
+                            data = {"code": -2022, "msg": str(exc)}
+                        results.append(data)
+                    return 200, results
+                if path == "/fapi/v1/order" and method == "GET":
+                    for o in self.orders.values():
+                        if o["_key"][0] == account and (
+                            str(o["orderId"]) == str(p.get("orderId")) or o["clientOrderId"] == p.get("origClientOrderId")
+                        ):
+                            return 200, self._public_order(o)
+                    done = self.done_orders.get((account, str(p.get("origClientOrderId"))))
+                    if done is None and p.get("orderId") is not None:
+                        done = next(
+                            (d for (acc, _cid), d in self.done_orders.items() if acc == account and str(d["orderId"]) == str(p["orderId"])),
+                            None,
+                        )
+                    if done is not None:
+                        return 200, done
+                    return 400, {"code": -2013, "msg": "Order does not exist."}
+                if path == "/fapi/v1/order" and method == "DELETE":
+                    for oid, o in list(self.orders.items()):
+                        if o["_key"][0] == account and (
+                            str(oid) == str(p.get("orderId")) or o["clientOrderId"] == p.get("origClientOrderId")
+                        ):
+                            del self.orders[oid]
+                            return 200, self._archive(account, o, "CANCELED")
+                    return 400, {"code": -2011, "msg": "Unknown order sent."}
+                if path == "/fapi/v1/leverage":
+                    self.leverage[(account, symbol)] = int(p["leverage"])
+                    return 200, {"symbol": symbol, "leverage": int(p["leverage"])}
+                if path == "/fapi/v1/marginType":
+                    return 200, {"code": 200, "msg": "success"}
+                if path == "/fapi/v2/account":
+                    return 200, {
+                        "totalWalletBalance": str(self.balance),
+                        "availableBalance": str(self.balance),
+                        "totalRealizedProfit": str(self.realized_by_day.get(self._day(), Decimal("0"))),
+                    }
+        except ValueError as exc:
+            return 400, {"code": -2022, "msg": str(exc)}
+        return 400, {"code": -1000, "msg": f"paper exchange does not support {method} {path}"}
+
+    def _new_order(self, account: str, symbol: str, p: Dict[str, Any], mark: Decimal) -> Tuple[int, Any]:
+        order_type = str(p.get("type", "")).upper()
+        side = str(p.get("side", "")).upper()
+        position_side = str(p.get("positionSide", "BOTH")).upper()
+        client_id = str(p.get("newClientOrderId") or f"paper_{self._next_id}")
+        if any(o["clientOrderId"] == client_id and o["_key"][0] == account for o in self.orders.values()):
+            return 400, {"code": -4116, "msg": "ClientOrderId is duplicated."}
+        order_id = self._next_id
+        self._next_id += 1
+        base = {
+            "orderId": order_id,
+            "clientOrderId": client_id,
+            "symbol": symbol,
+            "side": side,
+            "positionSide": position_side,
+            "type": order_type,
+            "updateTime": int(self.now() * 1000),
+        }
+        if order_type == "MARKET":
+            fill = self._fill(account, symbol, side, position_side, _decimal(p["quantity"]), mark, "MARKET")
+            filled = dict(base, avgPrice=str(fill["price"]), executedQty=str(fill["qty"]), origQty=str(p["quantity"]))
+            return 200, self._archive(account, filled, "FILLED")
+        if order_type in ("STOP_MARKET", "TAKE_PROFIT_MARKET"):
+            order = dict(
+                base,
+                status="NEW",
+                stopPrice=str(p["stopPrice"]),
+                closePosition=_paper_flag(p.get("closePosition")),
+                reduceOnly=_paper_flag(p.get("reduceOnly")),
+                origQty=str(p.get("quantity", "0")),
+                workingType=p.get("workingType", "CONTRACT_PRICE"),
+                _key=(account, symbol, position_side),
+                _stop=_decimal(p["stopPrice"]),
+            )
+            if self._stop_triggered(order, mark):
+                return 400, {"code": -2021, "msg": "Order would immediately trigger."}
+            self.orders[order_id] = order
+            return 200, self._public_order(order)
+        if order_type == "LIMIT":
+            qty = _decimal(p["quantity"])
+            limit = _decimal(p["price"])
+            key = (account, symbol, position_side)
+            if (side == "BUY") != (position_side == "LONG") and key not in self.positions:
+                raise ValueError("ReduceOnly Order is rejected.")
+            order = dict(
+                base,
+                status="NEW",
+                price=str(p["price"]),
+                origQty=str(qty),
+                executedQty="0",
+                timeInForce=p.get("timeInForce", "GTC"),
+                closePosition=False,
+                reduceOnly=_paper_flag(p.get("reduceOnly")),
+                _key=key,
+                _stop=limit,
+            )
+            if self._stop_triggered(order, mark):  # marketable: hemen limit fiyatından dolar
+                fill = self._fill(account, symbol, side, position_side, qty, limit, "LIMIT")
+                return 200, self._archive(account, dict(order, avgPrice=str(fill["price"]), executedQty=str(fill["qty"])), "FILLED")
+            self.orders[order_id] = order
+            return 200, self._public_order(order)
+        return 400, {"code": -1116, "msg": f"paper exchange does not support order type {order_type}"}
+
+    def recent_trades(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.trades[-limit:]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            wins = [t for t in self.trades if t["pnl"] - t["fees"] > 0]
+            return {
+                "test_mode": TEST_MODE,
+                "start_balance": float(self.start_balance),
+                "balance": float(self.balance),
+                "pnl": float(self.balance - self.start_balance),
+                "fees": float(self.fees),
+                "trades": len(self.trades),
+                "wins": len(wins),
+                "win_rate": round(len(wins) / len(self.trades), 4) if self.trades else 0.0,
+                "max_drawdown": float(self.max_drawdown),
+                "open_positions": len(self.positions),
+                "open_orders": len(self.orders),
+                "slippage_bps": float(PAPER_SLIPPAGE_BPS),
+                "fee_rate": float(PAPER_FEE_RATE),
+            }
+
+
+paper_exchange = PaperExchange()
+
+
+def engine_time() -> float:
+    """Karar saati: TEST_MODE'da paper saati (replay'de kayıt zamanı), canlıda duvar saati."""
+    return paper_exchange.now() if TEST_MODE else time.time()
+
+
 # ------------------------------------------------------------------------------
 # Binance API wrappers
 # ------------------------------------------------------------------------------
 
+class PositionCache:
+    """(hesap, sembol, positionSide) -> son positionRisk satırı.
+
+    Watcher'lar ve toplu positionRisk çağrıları besler; webhook ön kontrolü
+    ``POSITION_CACHE_MAX_AGE_SECONDS``'tan taze kayıtları ağa çıkmadan kullanır.
+    Bot kendi emrini gönderdiğinde ilgili sembol emirden önce ve sonra geçersiz
+    kılınır; satırlar sorgunun başladığı anla damgalanır ve son geçersiz kılmadan
+    önce başlamış bir sorgunun sonucu (emirden önceki düz satır) saklanmaz.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rows: Dict[tuple, tuple] = {}
+        self._invalidated: Dict[Tuple[str, str], float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def store(
+        self,
+        rows: List[Dict[str, Any]],
+        fetched_at: float,
+        symbols: Optional[List[str]] = None,
+        account: Optional[AccountContext] = None,
+    ) -> None:
+        """Cache rows for the account; sides absent for ``symbols`` are cached as flat.
+
+        ``fetched_at`` is ``time.monotonic()`` taken before the request was sent.
+        """
+        account_name = (account or current_account()).name
+        with self._lock:
+
+            def current(sym: str) -> bool:
+                return fetched_at > self._invalidated.get((account_name, sym), float("-inf"))
+
+            for sym in symbols or []:
+                if current(sym.upper()):
+                    for side in ("LONG", "SHORT"):
+                        self._rows[(account_name, sym.upper(), side)] = (fetched_at, {})
+            for item in rows:
+                sym = str(item.get("symbol")).upper()
+                if current(sym):
+                    self._rows[(account_name, sym, str(item.get("positionSide")).upper())] = (fetched_at, item)
+
+    def get(self, symbol: str, position_side: str, account: Optional[AccountContext] = None) -> Optional[Dict[str, Any]]:
+        """Fresh cached row, ``{}`` for a cached flat side, or None on miss/stale."""
+        key = ((account or current_account()).name, symbol.upper(), position_side.upper())
+        with self._lock:
+            entry = self._rows.get(key)
+        if entry is None or time.monotonic() - entry[0] > POSITION_CACHE_MAX_AGE_SECONDS:
+            return None
+        return entry[1]
+
+    def invalidate(self, symbol: str, account: Optional[AccountContext] = None) -> None:
+        account_name = (account or current_account()).name
+        with self._lock:
+            self._invalidated[(account_name, symbol.upper())] = time.monotonic()
+            for side in ("LONG", "SHORT", "BOTH"):
+                self._rows.pop((account_name, symbol.upper(), side), None)
+
+    def count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._rows)}
+
+
+position_cache = PositionCache()
+
+
+def _reference_mark_price(symbol: str, account: Optional[AccountContext] = None) -> Optional[Decimal]:
+    """Mark price from a fresh cached positionRisk row (flat sides included), no request."""
+    for side in ("LONG", "SHORT", "BOTH"):
+        row = position_cache.get(symbol, side, account=account)
+        if row and row.get("markPrice"):
+            mark = _decimal(row["markPrice"])
+            if mark > 0:
+                return mark
+    return None
+
+
 def get_position_risk(symbol: str, position_side: str) -> Dict[str, Any]:
+    started = time.monotonic()
     res = _signed_get("/fapi/v2/positionRisk", {"symbol": symbol})
     data = res.json()
     if isinstance(data, dict):
         data = [data]
-    for item in data:
-        if str(item.get("symbol")).upper() == symbol.upper() and str(item.get("positionSide")).upper() == position_side.upper():
+    elif isinstance(data, list):
+        position_cache.store(data, started, [symbol])
+    rows = [item for item in data if str(item.get("symbol")).upper() == symbol.upper()]
+    for item in rows:
+        if str(item.get("positionSide")).upper() == position_side.upper():
             return item
     return {}
 
@@ -538,15 +2497,19 @@ def cancel_order(symbol: str, order_id: int) -> Dict[str, Any]:
         return {"error": str(exc)}
 
 
+def _is_close_position_stop(order: Dict[str, Any], position_side: str) -> bool:
+    return (
+        str(order.get("type")) == "STOP_MARKET"
+        and bool(order.get("closePosition")) is True
+        and str(order.get("positionSide", "")).upper() == position_side.upper()
+    )
+
+
 def cancel_existing_sl_orders(symbol: str, position_side: str) -> None:
     orders = get_open_orders(symbol) or []
     for order in orders:
         try:
-            if (
-                str(order.get("type")) == "STOP_MARKET"
-                and bool(order.get("closePosition")) is True
-                and str(order.get("positionSide", "")).upper() == position_side.upper()
-            ):
+            if _is_close_position_stop(order, position_side):
                 oid = order.get("orderId")
                 resp = cancel_order(symbol, oid)
                 print(f"[SL CANCEL] {symbol}:{position_side} orderId={oid} -> {resp}")
@@ -568,9 +2531,13 @@ def set_leverage_and_margin(symbol: str, leverage: int) -> None:
 
 
 def get_price(symbol: str) -> Decimal:
-    resp = http_session.get(f"{BASE_URL}/fapi/v1/ticker/price", params={"symbol": symbol}, timeout=5)
+    if TEST_MODE:
+        return paper_exchange.mark(symbol)
+    resp = _public_get("/fapi/v1/ticker/price", {"symbol": symbol}, timeout=5)
     resp.raise_for_status()
-    return _decimal(resp.json()["price"])
+    price = _decimal(resp.json()["price"])
+    price_history.record(symbol, price)
+    return price
 
 
 def get_daily_realized_pnl() -> Decimal:
@@ -585,39 +2552,850 @@ def get_daily_realized_pnl() -> Decimal:
         return Decimal("0")
 
 
+class _PositionBatch:
+    __slots__ = ("symbols", "done", "result", "error")
+
+    def __init__(self) -> None:
+        self.symbols: set = set()
+        self.done = threading.Event()
+        self.result: List[Dict[str, Any]] = []
+        self.error: Optional[BaseException] = None
+
+
+class PositionBatcher:
+    """Aynı anda gelen positionRisk ihtiyaçlarını hesap başına tek çağrıda birleştirir.
+
+    İlk gelen istek (lider) kısa bir pencere bekler; bu sürede başka semboller için
+    gelen istekler aynı partiye katılır. Scheduler'da başka iş yoksa (tek alarm)
+    beklenmez, çağrı hemen yapılır. Tek sembol toplandıysa ``symbol=`` filtreli,
+    birden fazlaysa filtresiz tek bir positionRisk çağrısı yapılır.
+    """
+
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _PositionBatch] = {}
+        self.requests = 0
+        self.fetches = 0
+
+    def fetch(self, symbol: str) -> List[Dict[str, Any]]:
+        """Return every positionRisk row (both sides) for symbol on the current account."""
+        sym = symbol.upper()
+        account_name = current_account().name
+        with self._lock:
+            self.requests += 1
+            batch = self._pending.get(account_name)
+            leader = batch is None
+            if leader:
+                batch = _PositionBatch()
+                self._pending[account_name] = batch
+            batch.symbols.add(sym)
+        if leader:
+            if self.window_seconds > 0 and signal_scheduler.backlog() > 1:
+                time.sleep(self.window_seconds)
+            with self._lock:
+                self._pending.pop(account_name, None)
+                self.fetches += 1
+            try:
+                params = {"symbol": sym} if batch.symbols == {sym} else {}
+                started = time.monotonic()
+                data = _signed_get("/fapi/v2/positionRisk", params).json()
+                if isinstance(data, dict):
+                    if "code" in data:
+                        raise RuntimeError(f"positionRisk error {data}")
+                    data = [data]
+                batch.result = data
+                position_cache.store(data, started, sorted(batch.symbols))
+            except BaseException as exc:
+                batch.error = exc
+            finally:
+                batch.done.set()
+        elif not batch.done.wait(15):
+            raise TimeoutError(f"positionRisk batch timed out for {sym}")
+        if batch.error is not None:
+            raise batch.error
+        return [item for item in batch.result if str(item.get("symbol")).upper() == sym]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "fetches": self.fetches}
+
+
+position_batcher = PositionBatcher(POSITION_BATCH_WINDOW_SECONDS)
+
+
+def get_symbol_positions(symbol: str) -> Dict[str, Dict[str, Any]]:
+    """LONG/SHORT positionRisk rows for symbol: cache hit, else one batched fetch."""
+    cached = {side: position_cache.get(symbol, side) for side in ("LONG", "SHORT")}
+    if all(row is not None for row in cached.values()):
+        position_cache.count(hit=True)
+        return cached  # type: ignore[return-value]
+    position_cache.count(hit=False)
+    result: Dict[str, Dict[str, Any]] = {"LONG": {}, "SHORT": {}}
+    for item in position_batcher.fetch(symbol):
+        side = str(item.get("positionSide")).upper()
+        if side in result:
+            result[side] = item
+    return result
+
+
+# ------------------------------------------------------------------------------
+# Market data (rolling OHLC bars)
+# ------------------------------------------------------------------------------
+
+
+BAR_INTERVAL_SECONDS = {"1s": 1, "1m": 60}
+
+
+class BarSeries:
+    """Sabit kapasiteli OHLC ring buffer'ı; kolonlar ``array('d')``.
+
+    Fiyat ekleme O(1): açık bar güncellenir, bar aralığı dolunca halkaya
+    yazılır ve ATR (Wilder), log-getiri volatilitesi (EWMA) ile pencere
+    high/low (monoton kuyruk) artımlı güncellenir. Okuma ``views()`` ile
+    kopyasız memoryview dilimleri döner.
+    """
+
+    FIELDS = ("time", "open", "high", "low", "close")
+
+    def __init__(self, interval: int, capacity: int, atr_period: int = ATR_PERIOD) -> None:
+        self.interval = interval
+        self.capacity = max(capacity, 2)
+        self._cols = {name: array("d", bytes(8 * self.capacity)) for name in self.FIELDS}
+        self._head = 0  # sıradaki yazma indeksi
+        self._count = 0
+        self._seq = 0  # kapanan bar sayısı (monoton kuyruk indeksleri için)
+        self._bar: Optional[List[float]] = None  # [time, open, high, low, close]
+        self._max_q: deque = deque()
+        self._min_q: deque = deque()
+        self._alpha = 2.0 / (atr_period + 1)
+        self._atr_period = atr_period
+        self.atr = 0.0
+        self._var = 0.0
+        self._prev_close: Optional[float] = None
+
+    def update(self, ts: float, price: float) -> None:
+        start = float(int(ts // self.interval) * self.interval)
+        bar = self._bar
+        if bar is None or start > bar[0]:
+            if bar is not None:
+                self._close_bar(bar)
+            self._bar = [start, price, price, price, price]
+            return
+        if start < bar[0]:
+            return  # geç gelen fiyat; kapanmış bar'ı değiştirmeyiz
+        if price > bar[2]:
+            bar[2] = price
+        if price < bar[3]:
+            bar[3] = price
+        bar[4] = price
+
+    def _close_bar(self, bar: List[float]) -> None:
+        i = self._head
+        for name, value in zip(self.FIELDS, bar):
+            self._cols[name][i] = value
+        self._head = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+        _, _, high, low, close = bar
+        prev = self._prev_close
+        tr = high - low if prev is None else max(high - low, abs(high - prev), abs(low - prev))
+        n = min(self._seq + 1, self._atr_period)
+        self.atr += (tr - self.atr) / n
+        if prev and prev > 0 and close > 0:
+            ret = math.log(close / prev)
+            self._var += self._alpha * (ret * ret - self._var)
+        self._prev_close = close
+
+        seq = self._seq
+        self._seq += 1
+        while self._max_q and self._max_q[-1][1] <= high:
+            self._max_q.pop()
+        self._max_q.append((seq, high))
+        while self._min_q and self._min_q[-1][1] >= low:
+            self._min_q.pop()
+        self._min_q.append((seq, low))
+        oldest = self._seq - self.capacity
+        while self._max_q[0][0] < oldest:
+            self._max_q.popleft()
+        while self._min_q[0][0] < oldest:
+            self._min_q.popleft()
+
+    def views(self, field: str) -> Tuple[memoryview, ...]:
+        """Closed bars of ``field`` oldest first, as one or two zero-copy slices."""
+        col = memoryview(self._cols[field])
+        if self._count < self.capacity:
+            return (col[: self._count],)
+        return (col[self._head :], col[: self._head])
+
+    def bars(self, limit: int) -> List[Dict[str, float]]:
+        columns = {name: [v for part in self.views(name) for v in part] for name in self.FIELDS}
+        rows = [dict(zip(self.FIELDS, values)) for values in zip(*(columns[n] for n in self.FIELDS))]
+        if self._bar is not None:
+            rows.append(dict(zip(self.FIELDS, self._bar), partial=True))
+        return rows[-limit:] if limit > 0 else rows
+
+    def stats(self) -> Dict[str, Any]:
+        bar = self._bar
+        high = self._max_q[0][1] if self._max_q else None
+        low = self._min_q[0][1] if self._min_q else None
+        if bar is not None:
+            high = bar[2] if high is None else max(high, bar[2])
+            low = bar[3] if low is None else min(low, bar[3])
+        return {
+            "bars": self._count,
+            "last": bar[4] if bar is not None else self._prev_close,
+            "high": high,
+            "low": low,
+            "atr": self.atr,
+            "volatility": math.sqrt(self._var),
+        }
+
+
+class PriceHistory:
+    """Sembol başına 1s/1m bar serileri; watcher ve ticker fiyatlarıyla beslenir."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._series: Dict[str, Dict[str, BarSeries]] = {}
+
+    def record(self, symbol: str, price: Any, ts: Optional[float] = None) -> None:
+        value = float(price)
+        if value <= 0:
+            return
+        now = time.time() if ts is None else ts
+        sym = symbol.upper()
+        with self._lock:
+            series = self._series.get(sym)
+            if series is None:
+                series = {
+                    name: BarSeries(BAR_INTERVAL_SECONDS[name], capacity) for name, capacity in BAR_CAPACITY.items()
+                }
+                self._series[sym] = series
+            for bars in series.values():
+                bars.update(now, value)
+
+    def series(self, symbol: str, interval: str) -> Optional[BarSeries]:
+        with self._lock:
+            return self._series.get(symbol.upper(), {}).get(interval)
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return sorted(self._series)
+
+    def atr_pct(self, symbol: str, interval: str = "1m") -> Optional[float]:
+        """ATR / son fiyat (%); ATR_PERIOD kadar kapanmış bar yoksa None."""
+        with self._lock:
+            bars = self._series.get(symbol.upper(), {}).get(interval)
+            if bars is None or bars._count < ATR_PERIOD or bars._prev_close is None or bars._prev_close <= 0:
+                return None
+            return bars.atr / bars._prev_close * 100.0
+
+    def snapshot(self, symbol: str, interval: str, limit: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            bars = self._series.get(symbol.upper(), {}).get(interval)
+            if bars is None:
+                return None
+            return {"interval": interval, **bars.stats(), "ohlc": bars.bars(limit)}
+
+
+price_history = PriceHistory()
+
+
+# ------------------------------------------------------------------------------
+# Strategy summary (incremental klines)
+# ------------------------------------------------------------------------------
+
+
+KLINE_INTERVAL_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+
+
+class KlineCache:
+    """Tek sembol/aralık için kolon bazlı kline önbelleği.
+
+    İlk çağrıda ``max_bars`` bar çekilir; sonrasında sadece son kayıtlı bar'dan
+    itibaren (``startTime``) yeni bar'lar istenir ve bir sonraki bar kapanana
+    kadar borsaya hiç gidilmez. Başarısız yenilemeden sonra istekler
+    STRATEGY_RETRY_SECONDS'tan başlayıp katlanan (en çok 300 sn) bir süre
+    boyunca tekrarlanmaz; bu sürede ``refresh`` son hatayı yeniden atar.
+    """
+
+    MAX_RETRY_SECONDS = 300.0
+
+    def __init__(self, symbol: str, interval: str, max_bars: int) -> None:
+        if interval not in KLINE_INTERVAL_MS:
+            raise ValueError(f"unsupported kline interval {interval}")
+        self.symbol = symbol.upper()
+        self.interval = interval
+        self.interval_ms = KLINE_INTERVAL_MS[interval]
+        self.max_bars = max_bars
+        self.open_time = array("q")
+        self.cols = {name: array("d") for name in ("open", "high", "low", "close", "volume")}
+        self.fetches = 0
+        self.failures = 0
+        self.retry_at_ms = 0
+        self.last_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def _next_close_ms(self) -> int:
+        return self.open_time[-1] + self.interval_ms if self.open_time else 0
+
+    def refresh(self, now_ms: Optional[int] = None) -> bool:
+        """Fetch new bars if the open bar has closed. Returns True if data changed."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._lock:
+            if self.open_time and now_ms < self._next_close_ms():
+                return False
+            if self.last_error is not None and now_ms < self.retry_at_ms:
+                raise RuntimeError(f"klines backoff ({self.failures} failures): {self.last_error}")
+            try:
+                return self._fetch(now_ms)
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = exc
+                wait = min(STRATEGY_RETRY_SECONDS * 2 ** (self.failures - 1), self.MAX_RETRY_SECONDS)
+                self.retry_at_ms = now_ms + int(wait * 1000)
+                raise
+
+    def _fetch(self, now_ms: int) -> bool:
+        """Caller holds ``_lock``."""
+        params: Dict[str, Any] = {"symbol": self.symbol, "interval": self.interval}
+        if self.open_time:
+            # Son bar hâlâ açıkken kaydedildi; onu da yeniden çekip üstüne yaz.
+            params["startTime"] = self.open_time[-1]
+            params["limit"] = min(1500, (now_ms - self.open_time[-1]) // self.interval_ms + 2)
+        else:
+            params["limit"] = min(1500, self.max_bars)
+        resp = _public_get("/fapi/v1/klines", params, timeout=10)
+        resp.raise_for_status()
+        self.fetches += 1
+        self.failures = 0
+        self.last_error = None
+        rows = resp.json()
+        if not rows:
+            return False
+        first = int(rows[0][0])
+        keep = bisect.bisect_left(self.open_time, first)
+        del self.open_time[keep:]
+        for col in self.cols.values():
+            del col[keep:]
+        for row in rows:
+            self.open_time.append(int(row[0]))
+            for i, name in enumerate(("open", "high", "low", "close", "volume"), start=1):
+                self.cols[name].append(float(row[i]))
+        excess = len(self.open_time) - self.max_bars
+        if excess > 0:
+            del self.open_time[:excess]
+            for col in self.cols.values():
+                del col[:excess]
+        return True
+
+    def closed_bars(self, now_ms: Optional[int] = None) -> int:
+        """Number of fully closed bars (the last bar may still be open)."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        n = len(self.open_time)
+        return n - 1 if n and now_ms < self._next_close_ms() else n
+
+
+def _ema_series(values: Any, period: int) -> List[float]:
+    alpha = 2.0 / (period + 1)
+    out: List[float] = []
+    ema = None
+    for v in values:
+        ema = v if ema is None else ema + alpha * (v - ema)
+        out.append(ema)
+    return out
+
+
+def compute_trend_summary(
+    close: Any, high: Any, low: Any, fast: int = 50, slow: int = 200, breakout_lookback: int = 20
+) -> Dict[str, Any]:
+    """Trend (EMA fast/slow), breakout seviyesi (Donchian) ve 0-100 güven skoru.
+
+    Girdiler kapanmış bar kolonlarıdır (eskiden yeniye).
+    """
+    n = len(close)
+    if n < max(breakout_lookback + 1, 2):
+        raise ValueError(f"not enough bars ({n})")
+    ema_fast = _ema_series(close, fast)
+    ema_slow = _ema_series(close, slow)
+    long_trend = ema_fast[-1] > ema_slow[-1]
+
+    # Trend'in başladığı bar: EMA'ların son kesişimi
+    start_idx = 0
+    for i in range(n - 1, 0, -1):
+        if (ema_fast[i] > ema_slow[i]) != (ema_fast[i - 1] > ema_slow[i - 1]):
+            start_idx = i
+            break
+
+    window_high = max(high[n - 1 - breakout_lookback : n - 1])
+    window_low = min(low[n - 1 - breakout_lookback : n - 1])
+    breakout = window_high if long_trend else window_low
+    last = close[-1]
+
+    # Skor: EMA ayrışması (trend gücü) ve fiyatın Donchian kanalındaki konumu, trend yönünde.
+    spread = (ema_fast[-1] - ema_slow[-1]) / ema_slow[-1] if ema_slow[-1] else 0.0
+    channel = window_high - window_low
+    position = (last - window_low) / channel if channel > 0 else 0.5
+    if not long_trend:
+        spread, position = -spread, 1.0 - position
+    strength = min(max(spread / 0.02, 0.0), 1.0)
+    score = 100 * (0.5 * strength + 0.5 * min(max(position, 0.0), 1.0))
+    return {
+        "long_trend": long_trend,
+        "trend_start_price": close[start_idx],
+        "breakout_price": breakout,
+        "ema_fast": ema_fast[-1],
+        "ema_slow": ema_slow[-1],
+        "confidence_score": int(round(score)),
+    }
+
+
+class StrategySummary:
+    """Kline önbelleği üzerinde özet; sonuç bir sonraki bar kapanana kadar saklanır.
+
+    ``current_price`` bar önbelleğinden değil canlı fiyattan gelir (en çok
+    STRATEGY_PRICE_TTL_SECONDS'ta bir okuma); okunamazsa son bar kapanışı döner.
+    """
+
+    def __init__(self, symbol: str, interval: str, max_bars: int) -> None:
+        self.klines = KlineCache(symbol, interval, max_bars)
+        self._memo: Optional[Dict[str, Any]] = None
+        self._memo_bar: Optional[int] = None
+        self._price: Optional[float] = None
+        self._price_read = 0.0  # son deneme (monotonic); hata da sayılır
+        self._lock = threading.Lock()
+
+    def _live_price(self) -> Optional[float]:
+        now = time.monotonic()
+        if now - self._price_read >= STRATEGY_PRICE_TTL_SECONDS:
+            self._price_read = now
+            try:
+                self._price = float(get_price(self.klines.symbol))
+            except Exception as exc:
+                print(f"[STRATEGY] price error {exc}")
+                self._price = None
+        return self._price
+
+    def get(self) -> Dict[str, Any]:
+        with self._lock:
+            stale = False
+            try:
+                self.klines.refresh()
+            except Exception as exc:
+                if self._memo is None:
+                    raise
+                print(f"[STRATEGY] klines refresh error {exc}")
+                stale = True
+            k = self.klines
+            closed = k.closed_bars()
+            if closed == 0:
+                raise ValueError("no closed bars yet")
+            last_closed = k.open_time[closed - 1]
+            if self._memo is None or self._memo_bar != last_closed:
+                summary = compute_trend_summary(
+                    memoryview(k.cols["close"])[:closed],
+                    memoryview(k.cols["high"])[:closed],
+                    memoryview(k.cols["low"])[:closed],
+                )
+                self._memo = {
+                    "symbol": k.symbol,
+                    "interval": k.interval,
+                    "long_trend": summary["long_trend"],
+                    "last_long_start_price": summary["trend_start_price"] if summary["long_trend"] else None,
+                    "trend_start_price": summary["trend_start_price"],
+                    "breakout_price": summary["breakout_price"],
+                    "ema_fast": summary["ema_fast"],
+                    "ema_slow": summary["ema_slow"],
+                    "confidence_score": summary["confidence_score"],
+                    "bar_time": last_closed,
+                    "bars": closed,
+                }
+                self._memo_bar = last_closed
+            live = self._live_price()
+            return dict(
+                self._memo,
+                current_price=live if live is not None else k.cols["close"][-1],
+                price_source="live" if live is not None else "bar",
+                next_refresh_ms=k.open_time[-1] + k.interval_ms,
+                stale=stale,
+                fetches=k.fetches,
+            )
+
+
+strategy_summary = StrategySummary(STRATEGY_SYMBOL, STRATEGY_INTERVAL, STRATEGY_BARS)
+
+
 # ------------------------------------------------------------------------------
 # Order utilities
 # ------------------------------------------------------------------------------
 
-def place_futures_market_order(symbol: str, side: str, quantity: Decimal, position_side: str, leverage: int) -> Dict[str, Any]:
-    precision = PrecisionCache.get(symbol)
+def _market_order_payload(
+    symbol: str,
+    side: str,
+    quantity: Decimal,
+    position_side: str,
+    precision: Dict[str, Any],
+    ref_price: Optional[Decimal] = None,
+    client_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """``ref_price`` MIN_NOTIONAL kontrolünün fiyatı: önbellekteki mark, yoksa alarmın entry'si."""
     adj_qty = _floor_quantity(symbol, quantity, precision)
     if adj_qty <= 0:
         raise RuntimeError(f"quantity<=0 for {symbol}")
-    qty_str = _format_quantity(symbol, adj_qty, precision)
-    set_leverage_and_margin(symbol, leverage)
-    payload = {
+    # Leverage/marginType çağrılarından önce: geçersiz emir hiç round trip harcamasın.
+    adj_qty = validate_order_quantity(symbol, adj_qty, ref_price, precision)
+    return {
         "symbol": symbol,
         "side": side,
         "type": "MARKET",
-        "quantity": qty_str,
+        "quantity": _format_quantity(symbol, adj_qty, precision),
+        "positionSide": position_side,
+        "newClientOrderId": client_id or _new_client_id(),
+    }
+
+
+def _stop_loss_payload(
+    symbol: str, stop_price: Decimal, position_side: str, precision: Dict[str, Any], client_id: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "symbol": symbol,
+        "side": "SELL" if position_side.upper() == "LONG" else "BUY",
+        "type": "STOP_MARKET",
+        "stopPrice": _format_price(symbol, stop_price, position_side, precision),
+        "closePosition": True,
+        "priceProtect": True,
+        "positionSide": position_side.upper(),
+        "workingType": "MARK_PRICE",
+        "newClientOrderId": client_id or _new_client_id(),
+    }
+
+
+def _tp_order_payload(
+    symbol: str, price: Decimal, qty: Decimal, position_side: str, precision: Dict[str, Any], client_id: Optional[str] = None
+) -> Dict[str, Any]:
+    position_side = position_side.upper()
+    # Hedge modda reduceOnly gönderilemez (-1106); karşı yönlü emir positionSide ile
+    # zaten yalnızca pozisyonu azaltır. Fiyat kâr yönüne yuvarlanır (zıt taraf).
+    return {
+        "symbol": symbol,
+        "side": "SELL" if position_side == "LONG" else "BUY",
+        "type": "LIMIT",
+        "timeInForce": "GTC",
+        "price": _format_price(symbol, price, "SHORT" if position_side == "LONG" else "LONG", precision),
+        "quantity": _format_quantity(symbol, qty, precision),
         "positionSide": position_side,
+        "newClientOrderId": client_id or _new_client_id(),
     }
-    print(f"[ORDER PREP] {symbol} qty={qty_str} precision={precision}")
-    resp = _signed_post("/fapi/v1/order", payload)
+
+
+def _check_order_response(status_code: int, data: Any, payload: Dict[str, Any], label: str) -> Dict[str, Any]:
+    """Raise on a rejected order; label is "order" or "stop order"."""
+    if status_code != 200:
+        if isinstance(data, dict) and data.get("code") == -1111:
+            print(f"[PRECISION ERROR] {label} {payload.get('symbol')} payload={payload} resp={data}")
+        raise RuntimeError(f"{label} failed: {status_code} {data}")
+    return data
+
+
+def _response_data(resp: requests.Response) -> Any:
     try:
-        data = resp.json()
+        return resp.json()
     except Exception:
-        data = {"raw": resp.text}
+        return {"raw": resp.text}
+
+
+def _client_order_id(scope: str, leg: str) -> str:
+    """Deterministic newClientOrderId for one leg of an alert/position (Binance: max 36 chars)."""
+    return "fb-" + hashlib.sha1(f"{scope}|{leg}".encode("utf-8")).hexdigest()[:32]
+
+
+def _new_client_id() -> str:
+    return "fb-" + secrets.token_hex(16)
+
+
+def _order_outcome(status_code: Optional[int], data: Any) -> str:
+    """ok / rejected: kesin sonuç; duplicate: aynı id açık emirde; unknown: borsaya ulaşıp ulaşmadığı belirsiz."""
+    code = data.get("code") if isinstance(data, dict) else None
+    if status_code is None or status_code >= 500 or code in (-1007, -1001):
+        return "unknown"
+    if code == -4116:
+        return "duplicate"
+    return "ok" if status_code == 200 else "rejected"
+
+
+def _recv_window_remaining(sent_at: float) -> float:
+    # recvWindow dolduktan sonra aynı isteğin geç gelen kopyası borsada reddedilir;
+    # bu andan sonra clientOrderId sorgusunun "yok" cevabı kesindir.
+    return ORDER_RECV_WINDOW_MS / 1000.0 + 0.25 - (time.monotonic() - sent_at)
+
+
+class OrderQueryUnknown(RuntimeError):
+    """clientOrderId sorgusu da belirsiz döndü (5xx, -1001, -1007): emir durumu hâlâ bilinmiyor."""
+
+
+def _query_result(status_code: int, data: Any, label: str) -> Optional[Dict[str, Any]]:
+    """GET /fapi/v1/order cevabı: emir dict'i, yoksa None; sonuçsuz emir ya da sorgu hatası RuntimeError.
+
+    Sorgunun kendisi belirsizse (``_order_outcome`` "unknown") OrderQueryUnknown atılır;
+    çağıran bunu ağ hatası gibi ele alıp yeniden sorar.
+    """
+    if status_code == 200 and isinstance(data, dict):
+        if data.get("status") in ("CANCELED", "EXPIRED", "REJECTED") and _decimal(data.get("executedQty", "0")) <= 0:
+            raise RuntimeError(f"{label} {data.get('status')}: {data}")
+        return data
+    if isinstance(data, dict) and data.get("code") == -2013:
+        return None
+    if _order_outcome(status_code, data) == "unknown":
+        raise OrderQueryUnknown(f"order query unknown: {status_code} {data}")
+    raise RuntimeError(f"order query failed: {status_code} {data}")
+
+
+class OrderTracker:
+    """newClientOrderId -> son bilinen emir durumu (sent / acked / unknown / rejected / failed)."""
+
+    MAX_ORDERS = 2000
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._orders: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.retries = 0
+        self.recovered = 0
+
+    def update(self, client_id: str, **fields: Any) -> None:
+        with self._lock:
+            entry = self._orders.pop(client_id, None) or {"client_id": client_id, "attempts": 0}
+            entry.update(fields, updated=time.time())
+            self._orders[client_id] = entry
+            while len(self._orders) > self.MAX_ORDERS:
+                self._orders.popitem(last=False)
+
+    def sent(self, client_id: str, symbol: str, label: str) -> None:
+        with self._lock:
+            attempts = self._orders.get(client_id, {}).get("attempts", 0)
+        self.update(client_id, symbol=symbol, label=label, state="sent", attempts=attempts + 1)
+
+    def retried(self, reason: str) -> None:
+        with self._lock:
+            self.retries += 1
+        metrics.inc("bot_order_retries_total", reason=reason)
+
+    def resolved(self, client_id: str, order: Dict[str, Any]) -> None:
+        with self._lock:
+            self.recovered += 1
+        metrics.inc("bot_order_recovered_total")
+        self.update(client_id, state="acked", order_id=order.get("orderId"), status=order.get("status"))
+
+    def get(self, client_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._orders.get(client_id)
+            return dict(entry) if entry else None
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in list(self._orders.values())[-limit:]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states: Dict[str, int] = {}
+            for entry in self._orders.values():
+                states[entry["state"]] = states.get(entry["state"], 0) + 1
+            return {"tracked": len(self._orders), "states": states, "retries": self.retries, "recovered": self.recovered}
+
+
+order_tracker = OrderTracker()
+
+
+def _query_order(symbol: str, client_id: str, label: str) -> Optional[Dict[str, Any]]:
+    resp = _signed_request(
+        "GET", "/fapi/v1/order", {"symbol": symbol, "origClientOrderId": client_id}, timeout=ORDER_TIMEOUT_SECONDS
+    )
+    return _query_result(resp.status_code, _response_data(resp), label)
+
+
+def _order_steps(payload: Dict[str, Any], label: str) -> Generator[Tuple[str, Any], Any, Dict[str, Any]]:
+    """Tekrarsız emir gönderiminin karar mantığı; I/O'yu sync ve async sürücüler yapar.
+
+    Yield edilen adımlar ve sürücünün geri gönderdiği değer:
+
+    * ``("send", payload)``  -> ``(status, data)``; ağ hatasında ``(None, {"error": ...})``
+    * ``("query", None)``    -> clientOrderId sorgusunun emri, yoksa None; ağ hatası ya da
+      belirsiz sorgu cevabında (OrderQueryUnknown) istisna nesnesi
+    * ``("sleep", seconds)`` -> None
+
+    Dönüş değeri emirdir; sonuç belirsiz kalırsa RuntimeError atılır.
+    """
+    symbol = payload["symbol"]
+    client_id = payload["newClientOrderId"]
+    payload = dict(payload, recvWindow=ORDER_RECV_WINDOW_MS)
+    for attempt in range(ORDER_RETRIES + 2):
+        if attempt:
+            found = yield "query", None
+            if isinstance(found, Exception):
+                print(f"[ORDER QUERY] {label} {symbol} {client_id} {found}")
+                continue  # hâlâ belirsiz: göndermeden tekrar sor
+            if found is not None:
+                order_tracker.resolved(client_id, found)
+                print(f"[ORDER RECOVERED] {label} {symbol} {client_id} status={found.get('status')}")
+                return found
+        if attempt > ORDER_RETRIES:
+            break  # son tur yalnızca sorgu
+        order_tracker.sent(client_id, symbol, label)
+        sent_at = time.monotonic()
+        status, data = yield "send", payload
+        outcome = _order_outcome(status, data)
+        if outcome in ("ok", "rejected"):
+            order_tracker.update(
+                client_id, state="acked" if outcome == "ok" else "rejected", order_id=data.get("orderId") if isinstance(data, dict) else None
+            )
+            return _check_order_response(status, data, payload, label)
+        order_tracker.update(client_id, state="unknown")
+        order_tracker.retried(outcome)
+        print(f"[ORDER UNKNOWN] {label} {symbol} {client_id} attempt={attempt + 1} {status} {data}")
+        if outcome == "unknown":
+            wait = _recv_window_remaining(sent_at)
+            if wait > 0:
+                yield "sleep", wait
+    order_tracker.update(client_id, state="failed")
+    raise RuntimeError(f"{label} failed: outcome unknown after {ORDER_RETRIES + 1} attempts ({client_id})")
+
+
+def _submit_order(payload: Dict[str, Any], label: str) -> Dict[str, Any]:
+    """POST /fapi/v1/order with retry that never duplicates.
+
+    Sonucu belirsiz bir denemeden (timeout, 5xx, -1007) sonra kör tekrar yok:
+    recvWindow kapanınca clientOrderId ile sorgulanır, emir varsa o döner,
+    yoksa aynı id ile yeniden gönderilir (karar mantığı ``_order_steps``). En kötü
+    süre kabaca (ORDER_RETRIES + 1) * (ORDER_TIMEOUT + ORDER_RECV_WINDOW) + sorgular ile sınırlı.
+    """
+    steps = _order_steps(payload, label)
+    reply: Any = None
+    while True:
+        try:
+            action, arg = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+        if action == "send":
+            try:
+                resp = _signed_request("POST", "/fapi/v1/order", arg, timeout=ORDER_TIMEOUT_SECONDS)
+                reply = resp.status_code, _response_data(resp)
+            except requests.RequestException as exc:
+                reply = None, {"error": str(exc)}
+        elif action == "query":
+            try:
+                reply = _query_order(payload["symbol"], payload["newClientOrderId"], label)
+            except (requests.RequestException, OrderQueryUnknown) as exc:
+                reply = exc
+        else:
+            time.sleep(arg)
+            reply = None
+
+
+def _batch_chunk_results(
+    chunk: List[Dict[str, Any]], status: Optional[int], data: Any, label: str
+) -> Optional[List[Optional[Dict[str, Any]]]]:
+    """Bir batchOrders yanıtının emir başına sonucu; belirsizse None (çağıran sorgulayıp tek tek gönderir)."""
+    outcome = _order_outcome(status, data)
+    if outcome == "ok" and isinstance(data, list):
+        results: List[Optional[Dict[str, Any]]] = []
+        for payload, item in zip(chunk, data):
+            client_id = payload["newClientOrderId"]
+            if isinstance(item, dict) and item.get("orderId") is not None:
+                order_tracker.update(client_id, state="acked", order_id=item["orderId"])
+                results.append(item)
+            else:
+                order_tracker.update(client_id, state="rejected")
+                print(f"[{label.upper()} REJECT] {payload['symbol']} {client_id} {item}")
+                results.append(None)
+        return results
+    if outcome == "rejected":
+        for payload in chunk:
+            order_tracker.update(payload["newClientOrderId"], state="rejected")
+        print(f"[{label.upper()} REJECT] batch {status} {data}")
+        return [None] * len(chunk)
+    order_tracker.retried(outcome)
+    print(f"[ORDER UNKNOWN] {label} batch of {len(chunk)} {status} {data}")
+    return None
+
+
+def _submit_batch(payloads: List[Dict[str, Any]], label: str) -> List[Optional[Dict[str, Any]]]:
+    """POST /fapi/v1/batchOrders (istek başına en fazla 5 emir); her payload için emir ya da None.
+
+    Sonuç belirsizse _submit_order'daki gibi recvWindow beklenir, her emir
+    clientOrderId ile sorgulanır ve yalnızca borsada olmayanlar tek tek gönderilir.
+    """
+    results: List[Optional[Dict[str, Any]]] = []
+    for start in range(0, len(payloads), 5):
+        chunk = payloads[start : start + 5]
+        for payload in chunk:
+            order_tracker.sent(payload["newClientOrderId"], payload["symbol"], label)
+        sent_at = time.monotonic()
+        try:
+            resp = _signed_request(
+                "POST",
+                "/fapi/v1/batchOrders",
+                {"batchOrders": json.dumps(chunk, separators=(",", ":")), "recvWindow": ORDER_RECV_WINDOW_MS},
+                timeout=ORDER_TIMEOUT_SECONDS,
+            )
+            status, data = resp.status_code, _response_data(resp)
+        except requests.RequestException as exc:
+            status, data = None, {"error": str(exc)}
+        settled = _batch_chunk_results(chunk, status, data, label)
+        if settled is not None:
+            results.extend(settled)
+            continue
+        wait = _recv_window_remaining(sent_at)
+        if wait > 0:
+            time.sleep(wait)
+        for payload in chunk:
+            try:
+                found = _query_order(payload["symbol"], payload["newClientOrderId"], label)
+                if found is None:
+                    found = _submit_order(payload, label)
+                else:
+                    order_tracker.resolved(payload["newClientOrderId"], found)
+            except Exception as exc:
+                print(f"[{label.upper()} ERROR] {payload['symbol']} {payload['newClientOrderId']} {exc}")
+                found = None
+            results.append(found)
+    return results
+
+
+@traced("place_futures_market_order")
+def place_futures_market_order(
+    symbol: str,
+    side: str,
+    quantity: Decimal,
+    position_side: str,
+    leverage: int,
+    client_id: Optional[str] = None,
+    entry: Optional[Decimal] = None,
+) -> Dict[str, Any]:
+    precision = PrecisionCache.get(symbol)
+    payload = _market_order_payload(
+        symbol, side, quantity, position_side, precision, _reference_mark_price(symbol) or entry, client_id
+    )
+    set_leverage_and_margin(symbol, leverage)
+    print(f"[ORDER PREP] {symbol} qty={payload['quantity']} precision={precision}")
+    position_cache.invalidate(symbol)
+    try:
+        data = _submit_order(payload, "order")
+    finally:
+        # Emir sürerken başlamış positionRisk sorguları düz satırı geri yazamasın.
+        position_cache.invalidate(symbol)
     print(f"[ORDER] {symbol} -> {data}")
-    if resp.status_code != 200:
-        if isinstance(data, dict) and data.get("code") == -1111:
-            print(f"[PRECISION ERROR] {symbol} payload={payload} resp={data}")
-        raise RuntimeError(f"order failed: {resp.status_code} {data}")
     return data
 
 
-def _close_position_market(symbol: str, position_side: str, qty: Decimal) -> None:
+def _close_position_market(symbol: str, position_side: str, qty: Decimal, client_id: Optional[str] = None) -> None:
     if qty <= 0:
         return
     precision = PrecisionCache.get(symbol)
@@ -633,42 +3411,84 @@ def _close_position_market(symbol: str, position_side: str, qty: Decimal) -> Non
         "quantity": qty_str,
         "positionSide": position_side.upper(),
         "reduceOnly": True,
+        "newClientOrderId": client_id or _new_client_id(),
     }
+    position_cache.invalidate(symbol)
     try:
-        resp = _signed_post("/fapi/v1/order", payload)
-        print(f"[CLOSE] {symbol}:{position_side} qty={qty_str} resp={resp.text}")
+        data = _submit_order(payload, "close order")
+        print(f"[CLOSE] {symbol}:{position_side} qty={qty_str} resp={data}")
     except Exception as exc:
         print(f"[CLOSE ERROR] {symbol}:{position_side} {exc}")
+    finally:
+        position_cache.invalidate(symbol)
 
 
-def place_stop_loss_close(symbol: str, stop_price: Decimal, position_side: str) -> Dict[str, Any]:
+@traced("place_stop_loss_close")
+def place_stop_loss_close(
+    symbol: str, stop_price: Decimal, position_side: str, client_id: Optional[str] = None
+) -> Dict[str, Any]:
     precision = PrecisionCache.get(symbol)
-    stop_str = _format_price(symbol, stop_price, position_side, precision)
+    payload = _stop_loss_payload(symbol, stop_price, position_side, precision, client_id)
     cancel_existing_sl_orders(symbol, position_side.upper())
-    payload = {
-        "symbol": symbol,
-        "side": "SELL" if position_side.upper() == "LONG" else "BUY",
-        "type": "STOP_MARKET",
-        "stopPrice": stop_str,
-        "closePosition": True,
-        "priceProtect": True,
-        "positionSide": position_side.upper(),
-        "workingType": "MARK_PRICE",
-    }
-    print(f"[SL PREP] {symbol}:{position_side} stop={stop_str}")
-    resp = _signed_post("/fapi/v1/order", payload)
-    try:
-        data = resp.json()
-    except Exception:
-        data = {"raw": resp.text}
+    print(f"[SL PREP] {symbol}:{position_side} stop={payload['stopPrice']}")
+    data = _submit_order(payload, "stop order")
     print(f"[SL] {symbol}:{position_side} -> {data}")
-    if resp.status_code != 200:
-        if isinstance(data, dict) and data.get("code") == -1111:
-            print(f"[PRECISION ERROR] SL {symbol} payload={payload} resp={data}")
-        raise RuntimeError(f"stop order failed: {resp.status_code} {data}")
     return data
 
 
+@traced("place_tp_ladder")
+def place_tp_ladder(
+    symbol: str, position_side: str, legs: List[Dict[str, Any]], client_ids: Optional[List[Optional[str]]] = None
+) -> List[Dict[str, Any]]:
+    """plan_tp_ladder bacaklarını tek batch ile yerleştir; open_positions[...]["tp"] kayıtlarını döndür."""
+    payloads = _tp_ladder_payloads(symbol, position_side, legs, PrecisionCache.get(symbol), client_ids)
+    return _tp_book(symbol, position_side, legs, payloads, _submit_batch(payloads, "tp order"))
+
+
+def _tp_ladder_payloads(
+    symbol: str,
+    position_side: str,
+    legs: List[Dict[str, Any]],
+    precision: Dict[str, Any],
+    client_ids: Optional[List[Optional[str]]] = None,
+) -> List[Dict[str, Any]]:
+    return [
+        _tp_order_payload(symbol, leg["price"], leg["qty"], position_side, precision, client_ids[i] if client_ids else None)
+        for i, leg in enumerate(legs)
+    ]
+
+
+def _tp_book(
+    symbol: str,
+    position_side: str,
+    legs: List[Dict[str, Any]],
+    payloads: List[Dict[str, Any]],
+    results: List[Optional[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    book: List[Dict[str, Any]] = []
+    for leg, payload, result in zip(legs, payloads, results):
+        if result is None:
+            status = "failed"
+        else:
+            status = "filled" if result.get("status") == "FILLED" else "open"
+        book.append({"cid": payload["newClientOrderId"], "price": leg["price"], "qty": leg["qty"], "roe": leg["roe"], "status": status})
+    print(f"[TP] {symbol}:{position_side} " + " ".join(f"{leg['roe']}%@{leg['price']}x{leg['qty']}:{leg['status']}" for leg in book))
+    return book
+
+
+def _cancel_tp_order(symbol: str, client_id: str) -> Dict[str, Any]:
+    try:
+        return _signed_delete("/fapi/v1/order", {"symbol": symbol, "origClientOrderId": client_id}).json()
+    except Exception as exc:
+        return {"error": str(exc)}
+
+
+def _cancel_tp_ladder(symbol: str, legs: List[Dict[str, Any]]) -> None:
+    for leg in legs:
+        resp = _cancel_tp_order(symbol, leg["cid"])
+        print(f"[TP CANCEL] {symbol} {leg['cid']} -> {resp}")
+
+
 # ------------------------------------------------------------------------------
 # PnL helpers & quantity
 # ------------------------------------------------------------------------------
@@ -706,15 +3526,19 @@ def _position_margin(state: Dict[str, Any]) -> Decimal:
         return BOT_MARGIN_USDT
 
 
-def _target_sl_roe_from_peak(peak_roe: Decimal) -> Decimal:
+TRAIL_STEP_ROE = Decimal("5")
+
+
+def _target_sl_roe_from_peak(peak_roe: Decimal, initial_sl_roe: Optional[Decimal] = None) -> Decimal:
     """
     Basit ROI merdiveni:
-    - Başlangıç SL: INITIAL_SL_ROE
+    - Başlangıç SL: INITIAL_SL_ROE (veya sembol override'ı)
     - Her +5% peak ROE artışı SL'yi +5 ROE yukarı taşır
     - Formül: floor(peak_roe / 5) * 5 + INITIAL_SL_ROE (alt sınır INITIAL_SL_ROE)
     """
-    step = Decimal("5")
-    initial_sl_roe = INITIAL_SL_ROE
+    step = TRAIL_STEP_ROE
+    if initial_sl_roe is None:
+        initial_sl_roe = INITIAL_SL_ROE
 
     if peak_roe <= Decimal("0"):
         return initial_sl_roe
@@ -745,17 +3569,16 @@ def _sl_price_from_target_pnl(entry: Decimal, qty: Decimal, side: str, target_pn
     return entry - (target_pnl / qty)
 
 
-def compute_quantity(symbol: str, entry_price: Decimal, leverage: int) -> Decimal:
-    entry = _decimal(entry_price)
-    if entry <= 0:
-        raise ValueError("entry must be > 0")
-    notional = BOT_MARGIN_USDT * Decimal(leverage)
-    raw_qty = notional / entry
-    precision = PrecisionCache.get(symbol)
-    qty = _floor_quantity(symbol, raw_qty, precision)
-    if qty <= 0:
-        raise RuntimeError("calculated quantity <= 0")
-    return qty
+@traced("compute_quantity")
+def compute_quantity(symbol: str, entry_price: Decimal, leverage: int, margin: Optional[Decimal] = None) -> Decimal:
+    return plan_quantity(
+        symbol,
+        _decimal(entry_price),
+        leverage,
+        margin if margin is not None else symbol_margin(symbol),
+        PrecisionCache.get(symbol),
+        _reference_mark_price(symbol),
+    )
 
 
 def simulate_roi_trailing(
@@ -824,145 +3647,2199 @@ def simulate_roi_trailing(
             }
         )
 
-    return results
+    return results
+
+
+# ------------------------------------------------------------------------------
+# Portfolio risk book (incremental aggregates)
+# ------------------------------------------------------------------------------
+
+
+class RiskBook:
+    """open_positions üzerinden artımlı tutulan portföy toplamları.
+
+    Her pozisyonun katkısı (margin, notional, SL'deki en kötü zarar) açılışta
+    eklenir, SL taşındığında farkıyla güncellenir, kapanışta çıkarılır. Böylece
+    ``check()`` pozisyonları taramadan ve borsaya gitmeden sabit sürede çalışır.
+
+    ``check(reserve=state_key)`` geçen girişin katkısını aynı kilit altında
+    rezerve eder; farklı sembollerdeki eşzamanlı alarmlar limiti birlikte
+    aşamaz. Rezervasyon ``on_open`` ile gerçek katkıya dönüşür, giriş
+    başarısız olursa ``release`` ile geri alınır.
+    """
+
+    RESERVED = "#reserved"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._positions: Dict[str, Dict[str, Any]] = {}
+            self.total_margin = Decimal("0")
+            self.worst_case_loss = Decimal("0")
+            self.side_notional: Dict[str, Decimal] = {"LONG": Decimal("0"), "SHORT": Decimal("0")}
+            self.symbol_counts: Dict[str, int] = {}
+            self.account_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def worst_loss(state: Dict[str, Any]) -> Decimal:
+        """Loss if the current SL fills; no SL means the isolated margin is at risk."""
+        sl = _decimal(state.get("sl", "0"))
+        if sl <= 0:
+            return _position_margin(state)
+        entry = _decimal(state["entry"])
+        qty = _decimal(state.get("qty", "0"))
+        move = entry - sl if state["position_side"] == "LONG" else sl - entry
+        return max(move * qty, Decimal("0"))
+
+    def _apply(self, contrib: Dict[str, Any], sign: int) -> None:
+        self.total_margin += sign * contrib["margin"]
+        self.worst_case_loss += sign * contrib["loss"]
+        self.side_notional[contrib["side"]] += sign * contrib["notional"]
+        for counts, key in ((self.symbol_counts, contrib["symbol"]), (self.account_counts, contrib["account"])):
+            counts[key] = counts.get(key, 0) + sign
+            if counts[key] <= 0:
+                counts.pop(key, None)
+
+    def on_open(self, state_key: str, state: Dict[str, Any]) -> None:
+        contrib = {
+            "account": state.get("account", PRIMARY_ACCOUNT_NAME),
+            "symbol": state["symbol"],
+            "side": state["position_side"],
+            "margin": _position_margin(state),
+            "notional": _decimal(state.get("qty", "0")) * _decimal(state["entry"]),
+            "loss": self.worst_loss(state),
+        }
+        with self._lock:
+            for key in (state_key, state_key + self.RESERVED):
+                previous = self._positions.pop(key, None)
+                if previous is not None:
+                    self._apply(previous, -1)
+            self._positions[state_key] = contrib
+            self._apply(contrib, 1)
+
+    def release(self, state_key: str) -> None:
+        """Drop the reservation made by ``check(reserve=state_key)``; no-op after ``on_open``."""
+        self.on_close(state_key + self.RESERVED)
+
+    def on_sl_move(self, state_key: str, state: Dict[str, Any]) -> None:
+        loss = self.worst_loss(state)
+        with self._lock:
+            contrib = self._positions.get(state_key)
+            if contrib is not None:
+                self.worst_case_loss += loss - contrib["loss"]
+                contrib["loss"] = loss
+
+    def on_close(self, state_key: str) -> None:
+        with self._lock:
+            contrib = self._positions.pop(state_key, None)
+            if contrib is not None:
+                self._apply(contrib, -1)
+
+    def account_open(self, account_name: str) -> int:
+        with self._lock:
+            return self.account_counts.get(account_name, 0)
+
+    def check(
+        self,
+        symbol: str,
+        position_side: str,
+        margin: Decimal,
+        notional: Decimal,
+        loss: Decimal,
+        releasing: Optional[str] = None,
+        reserve: Optional[str] = None,
+        account: str = PRIMARY_ACCOUNT_NAME,
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (limit, details) if opening this position breaks a RISK_LIMITS entry.
+
+        ``releasing`` is the state_key of an opposite position the alert will
+        close first; its contribution is not counted against the new one.
+        With ``reserve`` (the new position's state_key) a passing check books
+        the contribution under the same lock; pair it with ``on_open`` or
+        ``release``.
+        """
+        limits = RISK_LIMITS
+        if not limits:
+            return None
+        with self._lock:
+            freed = self._positions.get(releasing) if releasing else None
+            count = len(self._positions) - (1 if freed else 0)
+            symbol_count = self.symbol_counts.get(symbol, 0) - (1 if freed else 0)
+            total_margin = self.total_margin - (freed["margin"] if freed else 0) + margin
+            side_notional = self.side_notional[position_side] + notional
+            worst = self.worst_case_loss - (freed["loss"] if freed else 0) + loss
+            projected = {
+                "MAX_OPEN_POSITIONS": (count + 1, limits.get("MAX_OPEN_POSITIONS")),
+                "MAX_POSITIONS_PER_SYMBOL": (symbol_count + 1, limits.get("MAX_POSITIONS_PER_SYMBOL")),
+                "MAX_TOTAL_MARGIN": (total_margin, limits.get("MAX_TOTAL_MARGIN")),
+                "MAX_SIDE_NOTIONAL": (side_notional, limits.get("MAX_SIDE_NOTIONAL")),
+                "MAX_WORST_CASE_LOSS": (worst, limits.get("MAX_WORST_CASE_LOSS")),
+            }
+            for name, (value, limit) in projected.items():
+                if limit and Decimal(str(value)) > Decimal(str(limit)):
+                    return name, {"value": float(value), "limit": limit}
+            if reserve is not None:
+                contrib = {
+                    "account": account,
+                    "symbol": symbol,
+                    "side": position_side,
+                    "margin": margin,
+                    "notional": notional,
+                    "loss": loss,
+                }
+                previous = self._positions.pop(reserve + self.RESERVED, None)
+                if previous is not None:
+                    self._apply(previous, -1)
+                self._positions[reserve + self.RESERVED] = contrib
+                self._apply(contrib, 1)
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_positions": len(self._positions),
+                "total_margin": float(self.total_margin),
+                "notional": {side: float(v) for side, v in self.side_notional.items()},
+                "worst_case_loss": float(self.worst_case_loss),
+                "per_symbol": dict(self.symbol_counts),
+                "per_account": dict(self.account_counts),
+                "reserved": sum(1 for key in self._positions if key.endswith(self.RESERVED)),
+                "limits": dict(RISK_LIMITS),
+            }
+
+
+risk_book = RiskBook()
+
+
+# ------------------------------------------------------------------------------
+# Execution scheduler (priority queue, per-symbol serialization)
+# ------------------------------------------------------------------------------
+
+PRIORITY_EXIT = 0
+PRIORITY_STOP = 1
+PRIORITY_ENTRY = 2
+PRIORITY_NAMES = {PRIORITY_EXIT: "exit", PRIORITY_STOP: "stop", PRIORITY_ENTRY: "entry"}
+
+
+class SchedulerFull(RuntimeError):
+    pass
+
+
+class SchedulerClosed(SchedulerFull):
+    """Kapanış başladı: yeni girişler alınmıyor."""
+
+
+class SignalScheduler:
+    """Borsaya giden tüm işlemler için öncelikli, sınırlı iş kuyruğu.
+
+    * Aynı (hesap, sembol) anahtarı için aynı anda tek iş çalışır; pozisyon
+      kontrolü ile emir arasına başka bir alarm giremez. Bekleyen işler anahtar
+      başına kendi öncelik sırasıyla park edilir.
+    * Kapanışlar ve SL güncellemeleri yeni girişlerden önce çalışır ve kuyruk
+      sınırına takılmaz; sınır dolunca yeni girişler ``SchedulerFull`` alır.
+    * Worker sayısı global eşzamanlılık limitidir.
+    """
+
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._ready: List[tuple] = []
+        self._parked: Dict[Any, List[tuple]] = {}
+        self._reserved: set = set()
+        self._seq = 0
+        self._queued = 0
+        self._running = 0
+        self._threads: List[threading.Thread] = []
+        self.submitted = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.closed = False
+
+    def _ensure_workers_locked(self) -> None:
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"scheduler-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def submit(self, priority: int, key: Any, fn: Callable[..., Any], *args: Any) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if priority >= PRIORITY_ENTRY and self.closed:
+                self.rejected += 1
+                raise SchedulerClosed("engine is shutting down")
+            if priority >= PRIORITY_ENTRY and self._queued >= self.max_queue:
+                self.rejected += 1
+                metrics.inc("bot_scheduler_rejected_total")
+                raise SchedulerFull(f"signal queue full ({self._queued})")
+            self._ensure_workers_locked()
+            self._seq += 1
+            job = (priority, self._seq, key, fn, args, future, tracer.current_context(), time.perf_counter())
+            if key in self._reserved:
+                heapq.heappush(self._parked.setdefault(key, []), job)
+            else:
+                self._reserved.add(key)
+                heapq.heappush(self._ready, job)
+                self._cond.notify()
+            self._queued += 1
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._queued - self._running)
+        return future
+
+    def backlog(self) -> int:
+        """Jobs queued or running (the caller's own job included)."""
+        with self._cond:
+            return self._queued
+
+    def run(self, priority: int, key: Any, fn: Callable[..., Any], *args: Any) -> Any:
+        """Submit and wait; for callers that need the result inline."""
+        return self.submit(priority, key, fn, *args).result()
+
+    def close(self) -> None:
+        """Yeni girişleri reddet; kapanış ve SL işleri kabul edilmeye devam eder."""
+        with self._cond:
+            self.closed = True
+
+    def drain(self, timeout: float) -> bool:
+        """Kuyruktaki ve çalışan tüm işler bitene kadar bekle; süre dolarsa False."""
+        deadline = time.monotonic() + timeout
+        while True:
+            # _cond üzerinde beklenmez: notify() bir worker yerine buraya düşebilir.
+            with self._cond:
+                if self._queued == 0:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                priority, _seq, key, fn, args, future, context, enqueued = heapq.heappop(self._ready)
+                self._running += 1
+            metrics.observe(
+                "bot_scheduler_wait_seconds", time.perf_counter() - enqueued, priority=PRIORITY_NAMES.get(priority, "other")
+            )
+            if future.set_running_or_notify_cancel():
+                try:
+                    with tracer.attach(context):
+                        future.set_result(fn(*args))
+                except BaseException as exc:
+                    future.set_exception(exc)
+            with self._cond:
+                self._running -= 1
+                self._queued -= 1
+                parked = self._parked.get(key)
+                if parked:
+                    heapq.heappush(self._ready, heapq.heappop(parked))
+                    if not parked:
+                        del self._parked[key]
+                    self._cond.notify()
+                else:
+                    self._reserved.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queued": self._queued - self._running,
+                "running": self._running,
+                "max_queue": self.max_queue,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "keys_waiting": len(self._parked),
+                "closed": self.closed,
+            }
+
+
+signal_scheduler = SignalScheduler(SCHEDULER_WORKERS, SCHEDULER_QUEUE_SIZE)
+
+
+def _in_account(account: AccountContext, fn: Callable[..., Any], *args: Any) -> Any:
+    with account_scope(account):
+        return fn(*args)
+
+
+# ------------------------------------------------------------------------------
+# Decision core (olay -> durum -> komut; I/O yok)
+# ------------------------------------------------------------------------------
+
+# Buradaki fonksiyonlar yalnızca parametrelerine bakar: borsa, saat, config ya da
+# PrecisionCache okumaz (precision verilmezse _format_price önbellekten okur).
+# Canlı yollar girdileri toplar, kararı buradan alır, komutları uygular ve olayı
+# event_log'a yazar; replay.py aynı fonksiyonları kayıttan besleyip komutları karşılaştırır.
+
+
+def plan_quantity(
+    symbol: str,
+    entry: Decimal,
+    leverage: int,
+    margin: Decimal,
+    precision: Dict[str, Any],
+    mark_price: Optional[Decimal] = None,
+) -> Decimal:
+    """margin * kaldıraç / giriş, adıma yuvarlanmış ve yerel filtrelerden geçmiş.
+
+    Market emri: MIN_NOTIONAL mark fiyatıyla (yoksa entry) kontrol edilir,
+    PERCENT_PRICE bandı uygulanmaz.
+    """
+    if entry <= 0:
+        raise ValueError("entry must be > 0")
+    qty = _floor_quantity(symbol, margin * Decimal(leverage) / entry, precision)
+    if qty <= 0:
+        raise RuntimeError("calculated quantity <= 0")
+    return validate_order_quantity(symbol, qty, mark_price or entry, precision)
+
+
+def plan_size(
+    profile: SizingProfile,
+    hints: Dict[str, Any],
+    vol_pct: Optional[float],
+    settings: Dict[str, Any],
+    base_margin: Optional[Decimal] = None,
+) -> Tuple[Decimal, int, Dict[str, Any]]:
+    """(margin, kaldıraç, ayrıntı): profil -> alarm ipuçları -> volatilite ölçeği -> MAX_NOTIONAL tavanı."""
+    base = base_margin if base_margin is not None else profile.margin
+    margin = hints.get("margin", base) * hints.get("size", Decimal("1"))
+    leverage = hints.get("leverage", profile.leverage)
+    detail: Dict[str, Any] = {"base_margin": base}
+    max_leverage = settings["HINT_MAX_LEVERAGE"] or profile.leverage
+    if leverage > max_leverage:
+        leverage = max_leverage
+        detail["leverage_capped"] = True
+    mult = Decimal(str(settings["HINT_MAX_MULT"]))
+    cap = base * mult
+    if margin > cap:
+        margin = cap
+        detail["hint_capped"] = True
+    # Tavan margin'e değil pozisyon büyüklüğüne: kaldıraç ipucu notional'ı büyütemez.
+    notional_cap = base * Decimal(profile.leverage) * mult
+    if margin * Decimal(leverage) > notional_cap:
+        margin = notional_cap / Decimal(leverage)
+        detail["hint_capped"] = True
+    if profile.vol_target_pct > 0 and vol_pct:
+        scale = min(max(float(profile.vol_target_pct) / vol_pct, settings["VOL_SCALE_MIN"]), settings["VOL_SCALE_MAX"])
+        detail["vol_pct"] = round(vol_pct, 4)
+        detail["vol_scale"] = Decimal(str(round(scale, 4)))
+        margin *= detail["vol_scale"]
+    if profile.max_notional > 0 and margin * Decimal(leverage) > profile.max_notional:
+        margin = profile.max_notional / Decimal(leverage)
+        detail["notional_capped"] = True
+    return margin.quantize(Decimal("0.0001"), rounding=ROUND_DOWN), leverage, detail
+
+
+def plan_entry(position_side: str, qty: Decimal, amt_long: Decimal, amt_short: Decimal) -> List[Dict[str, Any]]:
+    """Alarm için komutlar: aynı yön açıksa ignore, zıt yön açıksa önce close, sonra open."""
+    held = amt_long if position_side == "LONG" else amt_short
+    if held > 0:
+        return [{"cmd": "ignore", "reason": "same_direction_exists"}]
+    commands: List[Dict[str, Any]] = []
+    opposite = "SHORT" if position_side == "LONG" else "LONG"
+    opposite_amt = amt_short if position_side == "LONG" else amt_long
+    if opposite_amt > 0:
+        commands.append({"cmd": "close", "position_side": opposite, "qty": opposite_amt})
+    commands.append({"cmd": "open", "position_side": position_side, "qty": qty})
+    return commands
+
+
+def plan_initial_stop(entry_price: Decimal, qty: Decimal, side: str, margin: Decimal, initial_sl_roe: Decimal) -> Decimal:
+    return _sl_price_from_target_pnl(entry_price, qty, side, _pnl_from_roe(initial_sl_roe, margin))
+
+
+def plan_tp_ladder(
+    symbol: str,
+    entry_price: Decimal,
+    qty: Decimal,
+    side: str,
+    margin: Decimal,
+    ladder: Tuple[Tuple[Decimal, Decimal], ...],
+    precision: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """TP bacakları [{price, qty, roe}]: fiyat ROE hedefinden, miktar girişin PCT yüzdesi.
+
+    Fiyat kâr yönüne yuvarlanır; PCT toplamı 100 ise son bacak kalan miktarın
+    tamamını alır. minQty / MIN_NOTIONAL altında kalan bacak atlanır.
+    """
+    precision = precision or PrecisionCache.get(symbol)
+    tp_side = "SHORT" if side.upper() == "BUY" else "LONG"
+    full = sum(pct for _roe, pct in ladder) == Decimal("100")
+    remaining = qty
+    legs: List[Dict[str, Any]] = []
+    for index, (roe, pct) in enumerate(ladder):
+        if full and index == len(ladder) - 1:
+            leg_qty = remaining
+        else:
+            leg_qty = min(_floor_quantity(symbol, qty * pct / Decimal("100"), precision), remaining)
+        price = _decimal(
+            _format_price(symbol, _sl_price_from_target_pnl(entry_price, qty, side, _pnl_from_roe(roe, margin)), tp_side, precision)
+        )
+        if leg_qty <= 0 or leg_qty < (precision.get("minQty") or 0) or leg_qty * price < (precision.get("minNotional") or 0):
+            continue
+        remaining -= leg_qty
+        legs.append({"price": price, "qty": leg_qty, "roe": roe})
+    return legs
+
+
+def _rescale_position(state: Dict[str, Any], qty: Decimal) -> None:
+    """Kısmi kapanış (TP dolumu vb.) sonrası margin ve peak PnL kalan miktara ölçeklenir.
+
+    ROE ve SL fiyatı miktardan bağımsız kalır; trailing kalan miktar üzerinden devam eder.
+    """
+    old_qty = _decimal(state.get("qty", "0"))
+    if old_qty > 0:
+        ratio = qty / old_qty
+        state["margin"] = _position_margin(state) * ratio
+        state["peak_pnl"] = _decimal(state.get("peak_pnl", "0")) * ratio
+    state["qty"] = qty
+
+
+def _trail_decision(
+    state: Dict[str, Any],
+    abs_amt: Decimal,
+    mark_price: Decimal,
+    initial_sl_roe: Optional[Decimal] = None,
+    precision: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Watcher tick'inin I/O'suz karar kısmı: yeni peak değerleri ve SL taşınmalı mı."""
+    symbol = state["symbol"]
+    side = state["side"]
+    position_side = state["position_side"]
+    entry_price: Decimal = state["entry"]
+    current_sl: Decimal = state.get("sl", Decimal("0"))
+    margin = _position_margin(state)
+    if initial_sl_roe is None:
+        initial_sl_roe = symbol_initial_sl_roe(symbol)
+
+    pnl = _compute_pnl(entry_price, mark_price, abs_amt, side)
+    roe_now = _roe_from_pnl(pnl, margin)
+    peak_pnl = max(state.get("peak_pnl", Decimal("0")), pnl)
+    peak_roe = max(_decimal(state.get("peak_roe", "0")), roe_now)
+
+    target_roe = _target_sl_roe_from_peak(peak_roe, initial_sl_roe)
+    target_pnl = _pnl_from_roe(target_roe, margin)
+    target_price = _sl_price_from_target_pnl(entry_price, abs_amt, side, target_pnl)
+    stop_str = _format_price(symbol, target_price, position_side, precision)
+    stop_price = _decimal(stop_str)
+
+    should_move = (
+        current_sl == 0
+        or (position_side == "LONG" and stop_price > current_sl)
+        or (position_side == "SHORT" and stop_price < current_sl)
+    )
+    return {
+        "amt": abs_amt,
+        "mark": mark_price,
+        "initial_sl_roe": initial_sl_roe,
+        "pnl": pnl,
+        "roe": roe_now,
+        "peak_pnl": peak_pnl,
+        "peak_roe": peak_roe,
+        "target_roe": target_roe,
+        "stop_price": stop_price,
+        "stop_str": stop_str,
+        "move": should_move,
+    }
+
+
+def plan_stop_debounce(
+    state: Dict[str, Any], decision: Dict[str, Any], now: float, settings: Dict[str, Any], tick: Decimal
+) -> Optional[str]:
+    """Taşınması gereken SL'i bekletme nedeni (ticks / trend / interval) ya da None.
+
+    SL'i olmayan pozisyon hiç bekletilmez. Bekletilen hareket kaybolmaz: sonraki
+    tick hedefi peak'ten yeniden hesaplar, aradaki basamaklar tek emirde atlanır.
+    """
+    current_sl = _decimal(state.get("sl", "0"))
+    if current_sl <= 0:
+        return None
+    if tick > 0 and abs(decision["stop_price"] - current_sl) < tick * settings["MIN_TICKS"]:
+        return "ticks"
+    if (
+        settings["SKIP_RUNGS"]
+        and decision["peak_roe"] > _decimal(state.get("peak_roe", "0"))
+        and now - state.get("sl_hold_since", now) < settings["MAX_HOLD_SECONDS"]
+    ):
+        return "trend"
+    if now - state.get("sl_ts", 0) < settings["MIN_INTERVAL_SECONDS"]:
+        return "interval"
+    return None
+
+
+def _debounce_stop(
+    state: Dict[str, Any], decision: Dict[str, Any], now: float, settings: Dict[str, Any], tick: Decimal
+) -> Optional[str]:
+    """plan_stop_debounce sonucunu state'e işle; bekletilirse decision["move"] False olur."""
+    decision["debounce"] = settings
+    reason = plan_stop_debounce(state, decision, now, settings, tick)
+    if reason is None:
+        state.pop("sl_hold_since", None)
+        return None
+    if reason == "trend":
+        state.setdefault("sl_hold_since", now)
+    avoided = state.setdefault("sl_avoided", {})
+    avoided[reason] = avoided.get(reason, 0) + 1
+    decision["move"] = False
+    return reason
+
+
+def _trail_commands(state_key: str, decision: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if not decision["move"]:
+        return []
+    return [{"cmd": "stop", "state_key": state_key, "price": decision["stop_price"], "roe": decision["target_roe"]}]
+
+
+def _tp_commands(state_key: str, legs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"cmd": "tp", "state_key": state_key, "price": leg["price"], "qty": leg["qty"], "roe": leg["roe"]} for leg in legs]
+
+
+def _event_precision(raw: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Kayıttaki precision: metne çevrilmiş Decimal alanlarını geri çevir."""
+    if raw is None:
+        return None
+    return {key: Decimal(value) if isinstance(value, str) else value for key, value in raw.items()}
+
+
+def _event_state(raw: Dict[str, Any], precision: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    state = dict(raw)
+    for field in ("entry", "qty", "sl", "peak_pnl", "margin", "sl_roe", "peak_roe"):
+        state[field] = _decimal(state.get(field, "0"))
+    state["precision"] = precision
+    return state
+
+
+def core_apply(book: Dict[str, Dict[str, Any]], kind: str, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tek olayı ``book``'a (state_key -> durum) uygula, üretilen komutları döndür.
+
+    Canlı motorun open_positions güncellemelerinin aynısı; SL yalnızca "stop"
+    olayı başarılı kaydedildiyse ilerler (borsa reddi replay'de de reddedilmiş sayılır).
+    """
+    if kind == "alert":
+        precision = _event_precision(event["precision"])
+        mark = _decimal(event["mark"]) if event.get("mark") is not None else None
+        try:
+            qty = plan_quantity(
+                event["symbol"], _decimal(event["entry"]), int(event["leverage"]), _decimal(event["margin"]), precision, mark
+            )
+        except (ValueError, RuntimeError) as exc:
+            return [{"cmd": "reject", "reason": str(exc)}]
+        if event.get("positions") is None:
+            return []  # pozisyon sorgusu başarısızdı, canlıda 500 döndü
+        amt_long, amt_short = (_decimal(amt) for amt in event["positions"])
+        position_side = "LONG" if event["direction"] == "LONG" else "SHORT"
+        return plan_entry(position_side, qty, amt_long, amt_short)
+
+    state_key = event.get("state_key")
+    if kind == "fill":
+        state = _event_state(
+            {key: event[key] for key in ("account", "symbol", "side", "position_side", "entry", "qty", "leverage", "margin")},
+            _event_precision(event["precision"]),
+        )
+        state.update(sl=Decimal("0"), sl_roe=_decimal(event["initial_sl_roe"]))
+        book[state_key] = state
+        price = plan_initial_stop(state["entry"], state["qty"], state["side"], state["margin"], state["sl_roe"])
+        ladder = tuple((_decimal(roe), _decimal(pct)) for roe, pct in event.get("tp_ladder") or ())
+        legs = plan_tp_ladder(
+            state["symbol"], state["entry"], state["qty"], state["side"], state["margin"], ladder, state["precision"]
+        )
+        return [{"cmd": "stop", "state_key": state_key, "price": price, "roe": state["sl_roe"]}] + _tp_commands(state_key, legs)
+    if kind == "adopt":
+        book[state_key] = _event_state(event["state"], _event_precision(event.get("precision")))
+        return []
+
+    state = book.get(state_key)
+    if state is None:
+        return []
+    if kind == "mark":
+        decision = _trail_decision(
+            state, _decimal(event["amt"]), _decimal(event["mark"]), _decimal(event["initial_sl_roe"]), state["precision"]
+        )
+        if decision["move"] and event.get("debounce"):
+            tick = state["precision"]["tickSize"] if state["precision"] else Decimal("0")
+            _debounce_stop(state, decision, event["ts"], event["debounce"], tick)
+        state["peak_pnl"] = decision["peak_pnl"]
+        state["peak_roe"] = decision["peak_roe"]
+        return _trail_commands(state_key, decision)
+    if kind == "stop" and event.get("ok"):
+        state["sl"] = _decimal(event["price"])
+        state["sl_roe"] = _decimal(event["roe"])
+        state["sl_ts"] = event.get("ts", 0)
+    elif kind == "resize":
+        _rescale_position(state, _decimal(event["qty"]))
+    elif kind == "closed":
+        book.pop(state_key, None)
+    return []
+
+
+# ------------------------------------------------------------------------------
+# Watcher thread
+# ------------------------------------------------------------------------------
+
+def _state_key(symbol: str, position_side: str, account: AccountContext) -> str:
+    """open_positions anahtarı; default hesap eski ``SYMBOL:SIDE`` biçimini korur."""
+    key = f"{symbol}:{position_side}"
+    return key if account.is_primary else f"{account.name}@{key}"
+
+
+def _watcher_alive(watcher: Any) -> bool:
+    if watcher is None:
+        return False
+    if isinstance(watcher, threading.Thread):
+        return watcher.is_alive()
+    return not watcher.done()
+
+
+def _start_watcher(state_key: str, delay: float = 2.0) -> None:
+    """Start a watcher for state_key unless one is alive. Caller holds state_lock."""
+    if _watcher_alive(watcher_threads.get(state_key)) or paper_exchange.replaying:
+        return  # replay sürücüsü watch_tick'i fiyat akışıyla kendisi çağırır
+    if lifecycle.stopping.is_set():
+        return  # pozisyon checkpoint'e yazılır, yeni süreç izler
+    runtime = _async_runtime()
+    if runtime is not None:
+        watcher_threads[state_key] = runtime.submit(async_roi_watcher(state_key, delay))
+        return
+    t = threading.Thread(target=roi_watcher, args=(state_key, delay), daemon=True)
+    watcher_threads[state_key] = t
+    t.start()
+
+
+def _trail_client_id(state_key: str, state: Dict[str, Any], decision: Dict[str, Any]) -> str:
+    # SL yalnızca ileri gider: aynı pozisyonda aynı fiyat ikinci kez açık emir olmaz.
+    return _client_order_id(f"{state_key}|{state.get('opened_ts')}", f"sl:{decision['stop_str']}")
+
+
+def _log_trail(state_key: str, decision: Dict[str, Any]) -> None:
+    print(
+        f"[SL TRAIL] {state_key} pnl={decision['pnl']:.2f} roe={decision['roe']:.2f}% "
+        f"peak_roe={decision['peak_roe']:.2f}% target_roe={decision['target_roe']}% stop={decision['stop_str']}"
+    )
+
+
+def _hold_trail(state: Dict[str, Any], decision: Dict[str, Any], now: float) -> None:
+    """SL_DEBOUNCE: taşınacak SL'i gerekirse beklet (decision["move"] False olur)."""
+    if not decision["move"]:
+        return
+    try:
+        tick = PrecisionCache.get(state["symbol"])["tickSize"]
+    except Exception:
+        tick = Decimal("0")
+    with state_lock:
+        reason = _debounce_stop(state, decision, now, {**SL_DEBOUNCE_DEFAULTS, **SL_DEBOUNCE}, tick)
+    if reason is not None:
+        metrics.inc("bot_sl_debounced_total", reason=reason)
+
+
+def sl_debounce_stats() -> Dict[str, Any]:
+    with state_lock:
+        avoided = {key: dict(st["sl_avoided"]) for key, st in open_positions.items() if st.get("sl_avoided")}
+    return {"settings": {**SL_DEBOUNCE_DEFAULTS, **SL_DEBOUNCE}, "avoided": avoided}
+
+
+def _commit_trail(state_key: str, state: Dict[str, Any], decision: Dict[str, Any], moved: bool, now: float) -> None:
+    with state_lock:
+        if moved:
+            state["sl"] = decision["stop_price"]
+            state["sl_roe"] = decision["target_roe"]
+            state["sl_ts"] = now
+            risk_book.on_sl_move(state_key, state)
+        state["peak_pnl"] = decision["peak_pnl"]
+        state["peak_roe"] = decision["peak_roe"]
+    commands = _trail_commands(state_key, decision)
+    event_log.record(
+        "mark",
+        {
+            "state_key": state_key,
+            "amt": decision["amt"],
+            "mark": decision["mark"],
+            "initial_sl_roe": decision["initial_sl_roe"],
+            "debounce": decision.get("debounce"),
+        },
+        commands,
+        ts=now,
+    )
+    if commands:
+        event_log.record(
+            "stop",
+            {"state_key": state_key, "price": decision["stop_price"], "roe": decision["target_roe"], "ok": moved, "ts": now},
+        )
+
+
+def _drop_closed_position(state_key: str) -> None:
+    print(f"[WATCHER] {state_key} position closed")
+    event_log.record("closed", {"state_key": state_key})
+    with state_lock:
+        state = open_positions.pop(state_key, None)
+        watcher_threads.pop(state_key, None)
+        risk_book.on_close(state_key)
+    legs = [leg for leg in (state or {}).get("tp") or [] if leg["status"] == "open"]
+    account = get_account(state.get("account")) if legs else None
+    if account is not None:
+        # Kalan TP bacakları SL ile kapanan pozisyonda yeni pozisyon açmasın.
+        try:
+            signal_scheduler.submit(
+                PRIORITY_EXIT, (account.name, state["symbol"]), _in_account, account, _cancel_tp_ladder, state["symbol"], legs
+            )
+        except SchedulerFull as exc:
+            print(f"[TP CANCEL] {state_key} {exc}")
+
+
+def _on_qty_change(state_key: str, state: Dict[str, Any], qty: Decimal) -> bool:
+    """positionAmt yereldeki qty'den farklıysa state'i kalan miktara ölçekle; değiştiyse True."""
+    with state_lock:
+        if _decimal(state.get("qty", "0")) == qty:
+            return False
+        print(f"[QTY] {state_key} qty {state.get('qty')} -> {qty}")
+        event_log.record("resize", {"state_key": state_key, "qty": qty})
+        _rescale_position(state, qty)
+        risk_book.on_open(state_key, state)
+        has_tp = bool(state.get("tp"))
+    if has_tp:
+        account = get_account(state.get("account"))
+        if account is not None:
+            try:
+                signal_scheduler.submit(
+                    PRIORITY_STOP, (account.name, state["symbol"]), _in_account, account, _sync_tp_ladder, state_key
+                )
+            except SchedulerFull as exc:
+                print(f"[TP SYNC] {state_key} {exc}")
+    return True
+
+
+def _sync_tp_ladder(state_key: str) -> None:
+    """TP bacaklarını borsayla eşitle; yalnızca miktar değişince çalışır (tek openOrders sorgusu).
+
+    openOrders'ta olmayan açık bacak dolmuş sayılır, kısmi dolumda kalan miktar
+    güncellenir. Açık TP toplamı pozisyonu aşıyorsa en uzak bacaktan başlayarak
+    iptal edilir ve gerekiyorsa küçültülmüş miktarla yeniden verilir; yeni id eski
+    bacak id'si ve yeni miktardan türetilir, tekrarlanan eşitleme çift emir açmaz.
+    """
+    with state_lock:
+        state = open_positions.get(state_key)
+        if not state or not state.get("tp"):
+            return
+        legs = [dict(leg) for leg in state["tp"]]
+        symbol, position_side, qty = state["symbol"], state["position_side"], _decimal(state["qty"])
+    orders = get_open_orders(symbol)
+    if not isinstance(orders, list):
+        print(f"[TP SYNC] {state_key} openOrders error {orders}")
+        return
+    by_cid = {str(order.get("clientOrderId")): order for order in orders}
+    for leg in legs:
+        if leg["status"] != "open":
+            continue
+        order = by_cid.get(leg["cid"])
+        if order is None:
+            leg["status"] = "done"
+        else:
+            leg["qty"] = _decimal(order.get("origQty", "0")) - _decimal(order.get("executedQty", "0"))
+
+    excess = sum(leg["qty"] for leg in legs if leg["status"] == "open") - qty
+    precision = PrecisionCache.get(symbol)
+    for index in range(len(legs) - 1, -1, -1):
+        leg = legs[index]
+        if excess <= 0:
+            break
+        if leg["status"] != "open":
+            continue
+        resp = cancel_order(symbol, by_cid[leg["cid"]]["orderId"])
+        print(f"[TP RESIZE] {state_key} cancel {leg['cid']} -> {resp}")
+        keep = _floor_quantity(symbol, max(leg["qty"] - excess, Decimal("0")), precision)
+        excess -= leg["qty"] - keep
+        legs[index] = dict(leg, status="cancelled")
+        if keep <= 0 or keep < (precision.get("minQty") or 0):
+            continue
+        client_id = _client_order_id(leg["cid"], f"resize|{_format_quantity(symbol, keep, precision)}")
+        payload = _tp_order_payload(symbol, leg["price"], keep, position_side, precision, client_id)
+        try:
+            _submit_order(payload, "tp order")
+            legs[index] = dict(leg, cid=payload["newClientOrderId"], qty=keep)
+        except Exception as exc:
+            print(f"[TP RESIZE ERROR] {state_key} {exc}")
+    with state_lock:
+        state = open_positions.get(state_key)
+        if state is not None:
+            state["tp"] = legs
+
+
+def plan_watch_interval(
+    state: Dict[str, Any], mark_price: Decimal, vol_pct: Optional[float], settings: Dict[str, Any], base: float
+) -> Tuple[float, Optional[float]]:
+    """(sonraki tick'e kadar bekleme, en yakın tetiğe uzaklık %).
+
+    Tetikler: mevcut SL, SL'i taşıyacak sonraki peak basamağı ve açık TP bacakları.
+    Rastgele yürüyüşte d uzaklığa varış süresi ~ (d / σ)^2 dakika (σ: 1m ATR %);
+    bu sürede SAMPLES kez bakılacak şekilde aralık seçilir. ATR henüz yoksa base.
+    """
+    if not settings["ENABLED"] or mark_price <= 0:
+        return base, None
+    entry: Decimal = state["entry"]
+    qty = _decimal(state.get("qty", "0"))
+    margin = _position_margin(state)
+    triggers = [leg["price"] for leg in state.get("tp") or [] if leg["status"] == "open"]
+    if _decimal(state.get("sl", "0")) > 0:
+        triggers.append(_decimal(state["sl"]))
+    if qty > 0:
+        next_roe = (max(_decimal(state.get("peak_roe", "0")), Decimal("0")) // TRAIL_STEP_ROE + 1) * TRAIL_STEP_ROE
+        triggers.append(_sl_price_from_target_pnl(entry, qty, state["side"], _pnl_from_roe(next_roe, margin)))
+    distance = float(min(abs(price - mark_price) for price in triggers) / mark_price * 100) if triggers else None
+    low, high = settings["MIN_INTERVAL_SECONDS"], settings["MAX_INTERVAL_SECONDS"]
+    if distance is None or not vol_pct:
+        return min(max(base, low), high), distance
+    interval = 60.0 * (distance / vol_pct) ** 2 / settings["SAMPLES"]
+    return min(max(interval, low), high), distance
+
+
+def _plan_poll(state: Dict[str, Any], mark_price: Decimal) -> None:
+    settings = {**WATCH_ADAPTIVE_DEFAULTS, **WATCH_ADAPTIVE}
+    vol_pct = price_history.atr_pct(state["symbol"]) if settings["ENABLED"] else None
+    interval, distance = plan_watch_interval(state, mark_price, vol_pct, settings, WATCH_INTERVAL_SECONDS)
+    with state_lock:
+        state["watch_interval"] = round(interval, 3)
+        state["trigger_distance_pct"] = round(distance, 4) if distance is not None else None
+
+
+def _watch_interval(state_key: str) -> float:
+    """Pozisyonun son tick'te planlanan aralığı (yoksa BOT_WATCH_INTERVAL_SECONDS)."""
+    with state_lock:
+        state = open_positions.get(state_key)
+        return state.get("watch_interval", WATCH_INTERVAL_SECONDS) if state else WATCH_INTERVAL_SECONDS
+
+
+def watch_intervals() -> Dict[str, Any]:
+    with state_lock:
+        intervals = {
+            key: {"interval": st.get("watch_interval", WATCH_INTERVAL_SECONDS), "distance_pct": st.get("trigger_distance_pct")}
+            for key, st in open_positions.items()
+        }
+    return {"settings": {**WATCH_ADAPTIVE_DEFAULTS, **WATCH_ADAPTIVE}, "base": WATCH_INTERVAL_SECONDS, "positions": intervals}
+
+
+def roi_watcher(state_key: str, delay: float = 2.0) -> None:
+    with state_lock:
+        state = open_positions.get(state_key)
+    account = get_account(state.get("account")) if state else PRIMARY_ACCOUNT
+    if account is None:
+        print(f"[WATCHER] {state_key} account {state.get('account')} has no API keys, not watching")
+        return
+    with account_scope(account):
+        _roi_watch_loop(state_key, delay)
+
+
+def _roi_watch_loop(state_key: str, delay: float = 2.0) -> None:
+    if lifecycle.wait(delay):
+        return
+    last_tick: Optional[float] = None
+    interval = WATCH_INTERVAL_SECONDS
+    while True:
+        tick_started = time.perf_counter()
+        if last_tick is not None:
+            lag = tick_started - last_tick - interval
+            metrics.observe("bot_watcher_lag_seconds", max(lag, 0.0))
+        last_tick = tick_started
+        if not watch_tick(state_key):
+            return
+        metrics.observe("bot_watcher_tick_seconds", time.perf_counter() - tick_started)
+        interval = _watch_interval(state_key)
+        if lifecycle.wait(interval):
+            return
+
+
+def watch_tick(state_key: str) -> bool:
+    """One trailing step for a position (caller is in its account scope). False once it is gone."""
+    with state_lock:
+        state = open_positions.get(state_key)
+    if not state:
+        return False
+
+    symbol = state["symbol"]
+    position_side = state["position_side"]
+    try:
+        pos = get_position_risk(symbol, position_side)
+    except Exception as exc:
+        print(f"[WATCHER] {state_key} positionRisk error {exc}")
+        return True
+
+    abs_amt = abs(_decimal(pos.get("positionAmt", "0")))
+    if abs_amt <= Decimal("0"):
+        _drop_closed_position(state_key)
+        return False
+    _on_qty_change(state_key, state, abs_amt)
+
+    try:
+        mark_price = _decimal(pos["markPrice"]) if pos.get("markPrice") else get_price(symbol)
+        if pos.get("markPrice") and not TEST_MODE:  # paper borsa kendi fiyatını zaten kaydeder
+            price_history.record(symbol, mark_price)
+    except Exception:
+        mark_price = state["entry"]
+
+    now = engine_time()
+    decision = _trail_decision(state, abs_amt, mark_price)
+    _hold_trail(state, decision, now)
+    moved = False
+    if decision["move"]:
+        _log_trail(state_key, decision)
+        try:
+            account = current_account()
+            signal_scheduler.run(
+                PRIORITY_STOP,
+                (account.name, symbol),
+                _in_account,
+                account,
+                place_stop_loss_close,
+                symbol,
+                decision["stop_price"],
+                position_side,
+                _trail_client_id(state_key, state, decision),
+            )
+            moved = True
+            metrics.inc("bot_sl_moves_total")
+        except Exception as exc:
+            print(f"[SL ERROR] {state_key} {exc}")
+            metrics.inc("bot_sl_failures_total", kind="trail")
+    _commit_trail(state_key, state, decision, moved, now)
+    _plan_poll(state, mark_price)
+    return True
+
+
+# ------------------------------------------------------------------------------
+# asyncio execution backend (BOT_EXECUTION_BACKEND=asyncio)
+# ------------------------------------------------------------------------------
+
+
+class AsyncExchangeClient:
+    """aiohttp tabanlı borsa istemcisi; sync wrapper'larla aynı yüzey.
+
+    Tüm metotlar tek bir event loop'ta (``AsyncEngine``) çalışır. Coroutine'ler
+    arasında thread-local hesap bağlamı olmadığı için hesap açıkça verilir.
+    """
+
+    def __init__(self) -> None:
+        self._sessions: Dict[str, Any] = {}
+
+    def _session(self, account: AccountContext) -> Any:
+        client_session = self._sessions.get(account.name)
+        if client_session is None or client_session.closed:
+            headers = {"X-MBX-APIKEY": account.api_key} if account.api_key else {}
+            client_session = aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=10))
+            self._sessions[account.name] = client_session
+        return client_session
+
+    async def _send(
+        self, account: AccountContext, method: str, path: str, params: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Tuple[int, Any]:
+        started = time.perf_counter()
+        status = "error"
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        try:
+            async with self._session(account).request(method, BASE_URL + path, params=params, timeout=request_timeout) as resp:
+                status = str(resp.status)
+                text = await resp.text()
+                try:
+                    return resp.status, json.loads(text)
+                except ValueError:
+                    return resp.status, {"raw": text}
+        finally:
+            metrics.observe("bot_exchange_request_seconds", time.perf_counter() - started, endpoint=path, method=method)
+            metrics.inc("bot_exchange_requests_total", endpoint=path, method=method, status=status)
+
+    async def signed(
+        self, account: AccountContext, method: str, path: str, params: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Tuple[int, Any]:
+        if TEST_MODE:
+            # handle() paper borsanın threading kilidini alır ve mark() ağdan fiyat çekebilir:
+            # event loop'u bloklamasın.
+            return await asyncio.get_running_loop().run_in_executor(
+                None, paper_exchange.handle, account.name, method, path, params
+            )
+        base = {k: (str(v) if isinstance(v, Decimal) else v) for k, v in params.items() if v is not None}
+        # aiohttp query parametrelerinde bool kabul etmez; Binance "true"/"false" bekler.
+        base = {k: (str(v).lower() if isinstance(v, bool) else v) for k, v in base.items()}
+        if RECV_WINDOW_MS > 0:
+            base.setdefault("recvWindow", RECV_WINDOW_MS)
+        for attempt in range(2):
+            payload = dict(base)
+            payload["timestamp"] = time_sync.timestamp()
+            payload["signature"] = account.sign(urlencode(payload, doseq=True))
+            status, data = await self._send(account, method, path, payload, timeout)
+            if attempt or not (status == 400 and isinstance(data, dict) and data.get("code") == -1021):
+                return status, data
+            time_sync.note_reject()
+            metrics.inc("bot_timestamp_rejects_total", endpoint=path)
+            await asyncio.get_running_loop().run_in_executor(None, time_sync.sync, 1)
+        return status, data
+
+    async def precision(self, symbol: str) -> Dict[str, Any]:
+        sym = symbol.upper()
+        with PrecisionCache._lock:
+            cached = PrecisionCache._cache.get(sym)
+        if cached:
+            return cached
+        if not USE_DYNAMIC_PRECISION:
+            return PrecisionCache.store(sym, PrecisionCache._fallback())
+        try:
+            status, data = await self._send(PRIMARY_ACCOUNT, "GET", "/fapi/v1/exchangeInfo", {"symbol": sym})
+            if status != 200:
+                raise RuntimeError(f"exchangeInfo HTTP {status}")
+            return PrecisionCache.store(sym, PrecisionCache.from_exchange_info(sym, data))
+        except Exception as exc:
+            print(f"[PRECISION] exchangeInfo error for {sym}: {exc}")
+            return PrecisionCache.store(sym, PrecisionCache._fallback())
+
+    async def get_symbol_positions(self, symbol: str, account: AccountContext) -> Dict[str, Dict[str, Any]]:
+        started = time.monotonic()
+        status, data = await self.signed(account, "GET", "/fapi/v2/positionRisk", {"symbol": symbol})
+        if status != 200 or not isinstance(data, list):
+            raise RuntimeError(f"positionRisk error {status} {data}")
+        position_cache.store(data, started, [symbol], account=account)
+        result: Dict[str, Dict[str, Any]] = {"LONG": {}, "SHORT": {}}
+        for item in data:
+            side = str(item.get("positionSide")).upper()
+            if str(item.get("symbol")).upper() == symbol.upper() and side in result:
+                result[side] = item
+        return result
+
+    async def get_position_risk(self, symbol: str, position_side: str, account: AccountContext) -> Dict[str, Any]:
+        return (await self.get_symbol_positions(symbol, account)).get(position_side.upper(), {})
+
+    async def get_open_orders(self, symbol: str, account: AccountContext) -> Any:
+        try:
+            _status, data = await self.signed(account, "GET", "/fapi/v1/openOrders", {"symbol": symbol})
+            return data if isinstance(data, list) else []
+        except Exception:
+            return []
+
+    async def get_price(self, symbol: str) -> Decimal:
+        if TEST_MODE:
+            return await asyncio.get_running_loop().run_in_executor(None, paper_exchange.mark, symbol)
+        status, data = await self._send(PRIMARY_ACCOUNT, "GET", "/fapi/v1/ticker/price", {"symbol": symbol})
+        if status != 200:
+            raise RuntimeError(f"ticker HTTP {status}")
+        price = _decimal(data["price"])
+        price_history.record(symbol, price)
+        return price
+
+    async def set_leverage_and_margin(self, symbol: str, leverage: int, account: AccountContext) -> None:
+        results = await asyncio.gather(
+            self.signed(account, "POST", "/fapi/v1/leverage", {"symbol": symbol, "leverage": leverage}),
+            self.signed(account, "POST", "/fapi/v1/marginType", {"symbol": symbol, "marginType": "ISOLATED"}),
+            return_exceptions=True,
+        )
+        for label, result in zip(("LEVERAGE", "MARGIN"), results):
+            print(f"[{label}]", symbol, result)
+
+    async def _query_order(self, account: AccountContext, symbol: str, client_id: str, label: str) -> Optional[Dict[str, Any]]:
+        status, data = await self.signed(
+            account, "GET", "/fapi/v1/order", {"symbol": symbol, "origClientOrderId": client_id}, ORDER_TIMEOUT_SECONDS
+        )
+        return _query_result(status, data, label)
+
+    async def submit_order(self, account: AccountContext, payload: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """Coroutine driver for ``_order_steps`` (same query-before-retry rules as ``_submit_order``)."""
+        steps = _order_steps(payload, label)
+        reply: Any = None
+        while True:
+            try:
+                action, arg = steps.send(reply)
+            except StopIteration as done:
+                return done.value
+            if action == "send":
+                try:
+                    reply = await self.signed(account, "POST", "/fapi/v1/order", arg, ORDER_TIMEOUT_SECONDS)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    reply = None, {"error": str(exc)}
+            elif action == "query":
+                try:
+                    reply = await self._query_order(account, payload["symbol"], payload["newClientOrderId"], label)
+                except (aiohttp.ClientError, asyncio.TimeoutError, OrderQueryUnknown) as exc:
+                    reply = exc
+            else:
+                await asyncio.sleep(arg)
+                reply = None
+
+    async def submit_batch(
+        self, account: AccountContext, payloads: List[Dict[str, Any]], label: str
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Coroutine counterpart of ``_submit_batch``."""
+        results: List[Optional[Dict[str, Any]]] = []
+        for start in range(0, len(payloads), 5):
+            chunk = payloads[start : start + 5]
+            for payload in chunk:
+                order_tracker.sent(payload["newClientOrderId"], payload["symbol"], label)
+            sent_at = time.monotonic()
+            try:
+                status, data = await self.signed(
+                    account,
+                    "POST",
+                    "/fapi/v1/batchOrders",
+                    {"batchOrders": json.dumps(chunk, separators=(",", ":")), "recvWindow": ORDER_RECV_WINDOW_MS},
+                    ORDER_TIMEOUT_SECONDS,
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                status, data = None, {"error": str(exc)}
+            settled = _batch_chunk_results(chunk, status, data, label)
+            if settled is not None:
+                results.extend(settled)
+                continue
+            wait = _recv_window_remaining(sent_at)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            for payload in chunk:
+                try:
+                    found = await self._query_order(account, payload["symbol"], payload["newClientOrderId"], label)
+                    if found is None:
+                        found = await self.submit_order(account, payload, label)
+                    else:
+                        order_tracker.resolved(payload["newClientOrderId"], found)
+                except Exception as exc:
+                    print(f"[{label.upper()} ERROR] {payload['symbol']} {payload['newClientOrderId']} {exc}")
+                    found = None
+                results.append(found)
+        return results
+
+    async def place_tp_ladder(
+        self,
+        symbol: str,
+        position_side: str,
+        legs: List[Dict[str, Any]],
+        account: AccountContext,
+        client_ids: Optional[List[Optional[str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        payloads = _tp_ladder_payloads(symbol, position_side, legs, await self.precision(symbol), client_ids)
+        return _tp_book(symbol, position_side, legs, payloads, await self.submit_batch(account, payloads, "tp order"))
+
+    async def place_futures_market_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity: Decimal,
+        position_side: str,
+        leverage: int,
+        account: AccountContext,
+        client_id: Optional[str] = None,
+        entry: Optional[Decimal] = None,
+    ) -> Dict[str, Any]:
+        precision = await self.precision(symbol)
+        payload = _market_order_payload(
+            symbol, side, quantity, position_side, precision, _reference_mark_price(symbol, account) or entry, client_id
+        )
+        await self.set_leverage_and_margin(symbol, leverage, account)
+        print(f"[ORDER PREP] {symbol} qty={payload['quantity']} precision={precision}")
+        position_cache.invalidate(symbol, account=account)
+        try:
+            data = await self.submit_order(account, payload, "order")
+        finally:
+            position_cache.invalidate(symbol, account=account)
+        print(f"[ORDER] {symbol} -> {data}")
+        return data
+
+    async def place_stop_loss_close(
+        self, symbol: str, stop_price: Decimal, position_side: str, account: AccountContext, client_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        precision = await self.precision(symbol)
+        payload = _stop_loss_payload(symbol, stop_price, position_side, precision, client_id)
+        orders = await self.get_open_orders(symbol, account)
+        stale = [o.get("orderId") for o in orders if _is_close_position_stop(o, position_side)]
+        if stale:
+            cancels = await asyncio.gather(
+                *(self.signed(account, "DELETE", "/fapi/v1/order", {"symbol": symbol, "orderId": oid}) for oid in stale),
+                return_exceptions=True,
+            )
+            for oid, resp in zip(stale, cancels):
+                print(f"[SL CANCEL] {symbol}:{position_side} orderId={oid} -> {resp}")
+        print(f"[SL PREP] {symbol}:{position_side} stop={payload['stopPrice']}")
+        data = await self.submit_order(account, payload, "stop order")
+        print(f"[SL] {symbol}:{position_side} -> {data}")
+        return data
+
+    async def prefetch(self, symbol: str, account: AccountContext) -> None:
+        """Webhook ön kontrolü: precision ve LONG/SHORT pozisyonlarını paralel çek."""
+        positions_needed = any(position_cache.get(symbol, side, account=account) is None for side in ("LONG", "SHORT"))
+        tasks = [self.precision(symbol)]
+        if positions_needed:
+            tasks.append(self.get_symbol_positions(symbol, account))
+        await asyncio.gather(*tasks)
+
+    async def close(self) -> None:
+        for client_session in self._sessions.values():
+            await client_session.close()
+
+
+class AsyncEngine:
+    """Dedicated thread running one asyncio loop for watchers and webhook I/O."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Any, timeout: float = 30) -> Any:
+        return self.submit(coro).result(timeout)
+
+    def run_order(self, coro: Any) -> Any:
+        """Emir gönderen coroutine: sonuç zaman aşımıyla bırakılmadan beklenir.
+
+        Süre sınırı coroutine'in içinde (aiohttp ClientTimeout + ORDER_RETRIES);
+        erken vazgeçen çağıran, borsada dolmuş emir için hata raporlardı.
+        """
+        return self.submit(coro).result()
+
+
+async_client: Optional[AsyncExchangeClient] = None
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_lock = threading.Lock()
+
+
+def _async_runtime() -> Optional[AsyncEngine]:
+    """The asyncio engine if BOT_EXECUTION_BACKEND=asyncio (lazily started)."""
+    global _async_engine, async_client
+    if EXECUTION_BACKEND != "asyncio":
+        return None
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                if aiohttp is None:
+                    logger.error("BOT_EXECUTION_BACKEND=asyncio requires aiohttp; using threads")
+                    return None
+                async_client = AsyncExchangeClient()
+                _async_engine = AsyncEngine()
+    return _async_engine
+
+
+def _run_async_order(method: Callable[..., Any], *args: Any) -> Any:
+    """Scheduler işi: emir coroutine'i iş çalışmaya başlayınca oluşturulur.
+
+    Kuyrukta reddedilen (SchedulerFull) ya da kapanışta atılan iş, hiç await
+    edilmemiş bir coroutine bırakmaz.
+    """
+    return _async_runtime().run_order(method(*args))
+
+
+async def _watch_pause(seconds: float) -> bool:
+    """asyncio.sleep that ends early on shutdown; True once the watcher should stop."""
+    deadline = time.monotonic() + seconds
+    while not lifecycle.stopping.is_set():
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return False
+        await asyncio.sleep(min(left, 0.25))
+    return True
+
+
+def _get_state(state_key: str) -> Optional[Dict[str, Any]]:
+    with state_lock:
+        return open_positions.get(state_key)
+
+
+def _async_tick_decide(
+    state_key: str, state: Dict[str, Any], abs_amt: Decimal, mark_price: Decimal
+) -> Tuple[Dict[str, Any], float]:
+    """state_lock alan tick adımları: qty değişimi, trailing kararı, debounce."""
+    _on_qty_change(state_key, state, abs_amt)
+    now = engine_time()
+    decision = _trail_decision(state, abs_amt, mark_price)
+    _hold_trail(state, decision, now)
+    return decision, now
+
+
+def _async_tick_commit(
+    state_key: str, state: Dict[str, Any], decision: Dict[str, Any], moved: bool, now: float, mark_price: Decimal
+) -> float:
+    _commit_trail(state_key, state, decision, moved, now)
+    _plan_poll(state, mark_price)
+    return _watch_interval(state_key)
+
+
+async def async_roi_watcher(state_key: str, delay: float = 2.0) -> None:
+    """Coroutine counterpart of roi_watcher; all watchers share one event loop.
+
+    state_lock threading kilidi: onu alan adımlar asyncio.to_thread ile çalışır,
+    kilit beklenirken event loop'taki diğer watcher'lar ve emirler durmaz.
+    """
+    state = await asyncio.to_thread(_get_state, state_key)
+    account = get_account(state.get("account")) if state else PRIMARY_ACCOUNT
+    if account is None or async_client is None:
+        print(f"[WATCHER] {state_key} account has no API keys, not watching")
+        return
+    if await _watch_pause(delay):
+        return
+    last_tick: Optional[float] = None
+    interval = WATCH_INTERVAL_SECONDS
+    while True:
+        tick_started = time.perf_counter()
+        if last_tick is not None:
+            metrics.observe("bot_watcher_lag_seconds", max(tick_started - last_tick - interval, 0.0))
+        last_tick = tick_started
+        state = await asyncio.to_thread(_get_state, state_key)
+        if not state:
+            return
+
+        symbol = state["symbol"]
+        position_side = state["position_side"]
+        try:
+            pos = await async_client.get_position_risk(symbol, position_side, account)
+        except Exception as exc:
+            print(f"[WATCHER] {state_key} positionRisk error {exc}")
+            interval = await asyncio.to_thread(_watch_interval, state_key)
+            if await _watch_pause(interval):
+                return
+            continue
+
+        abs_amt = abs(_decimal(pos.get("positionAmt", "0")))
+        if abs_amt <= Decimal("0"):
+            await asyncio.to_thread(_drop_closed_position, state_key)
+            return
+
+        try:
+            mark_price = _decimal(pos["markPrice"]) if pos.get("markPrice") else await async_client.get_price(symbol)
+            if pos.get("markPrice") and not TEST_MODE:
+                price_history.record(symbol, mark_price)
+        except Exception:
+            mark_price = state["entry"]
+
+        decision, now = await asyncio.to_thread(_async_tick_decide, state_key, state, abs_amt, mark_price)
+        moved = False
+        if decision["move"]:
+            _log_trail(state_key, decision)
+            try:
+                await asyncio.wrap_future(
+                    signal_scheduler.submit(
+                        PRIORITY_STOP,
+                        (account.name, symbol),
+                        _run_async_order,
+                        async_client.place_stop_loss_close,
+                        symbol,
+                        decision["stop_price"],
+                        position_side,
+                        account,
+                        _trail_client_id(state_key, state, decision),
+                    )
+                )
+                moved = True
+                metrics.inc("bot_sl_moves_total")
+            except Exception as exc:
+                print(f"[SL ERROR] {state_key} {exc}")
+                metrics.inc("bot_sl_failures_total", kind="trail")
+        interval = await asyncio.to_thread(_async_tick_commit, state_key, state, decision, moved, now, mark_price)
+
+        metrics.observe("bot_watcher_tick_seconds", time.perf_counter() - tick_started)
+        if await _watch_pause(interval):
+            return
+
+
+# ------------------------------------------------------------------------------
+# Reconciliation (open_positions <-> exchange)
+# ------------------------------------------------------------------------------
+
+
+class Reconciler:
+    """Yerel state ile borsayı periyodik olarak karşılaştırır.
+
+    Hesap başına iki toplu çağrı (tüm positionRisk + tüm openOrders) yapılır;
+    (sembol, positionSide) anahtarlı dict/set farklarıyla:
+
+    * borsada olup yerelde olmayan pozisyon trailing'e alınır (adopt),
+    * yerelde olup borsada olmayan kayıt düşürülür (stale),
+    * miktarı değişmiş pozisyonun qty/margin'i güncellenir ve TP bacakları eşitlenir,
+    * SL emri silinmiş pozisyon için stop yeniden yerleştirilir.
+
+    Düzeltmeler (hesap, sembol) anahtarlı scheduler işleri olarak çalışır: aynı
+    sembolde emir/SL/TP adımlarının ortasındaki bir giriş işi bitmeden pozisyona
+    dokunulmaz, giriş yeni açtığı pozisyonu kendisi yazar.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.passes = 0
+        self.last: Dict[str, Any] = {}
+
+    @staticmethod
+    def _stop_keys(orders: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        stops: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for order in orders:
+            side = str(order.get("positionSide", "")).upper()
+            if _is_close_position_stop(order, side):
+                stops[(str(order.get("symbol")).upper(), side)] = order
+        return stops
+
+    def reconcile_account(self, account: AccountContext) -> Dict[str, int]:
+        fetched_at = time.time()
+        started = time.monotonic()
+        with account_scope(account):
+            positions = _signed_get("/fapi/v2/positionRisk", {}).json()
+            orders = _signed_get("/fapi/v1/openOrders", {}).json()
+        if not isinstance(positions, list) or not isinstance(orders, list):
+            raise RuntimeError(f"bulk fetch failed: positions={positions!r:.200} orders={orders!r:.200}")
+        position_cache.store(positions, started, account=account)
+
+        live: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for row in positions:
+            side = str(row.get("positionSide")).upper()
+            if side in ("LONG", "SHORT") and _decimal(row.get("positionAmt", "0")) != 0:
+                live[(str(row.get("symbol")).upper(), side)] = row
+        stops = self._stop_keys(orders)
+        with state_lock:
+            local = {
+                (st["symbol"], st["position_side"]): key
+                for key, st in open_positions.items()
+                if st.get("account", PRIMARY_ACCOUNT_NAME) == account.name
+            }
+
+        counts = {"adopted": 0, "stale": 0, "resized": 0, "stops": 0}
+        jobs: List[Tuple[str, Future]] = []
+        for sym_side in local.keys() | live.keys():
+            symbol, side = sym_side
+            state_key = local.get(sym_side) or _state_key(symbol, side, account)
+            args = (account, state_key, live.get(sym_side), stops.get(sym_side), fetched_at)
+            future = signal_scheduler.submit(PRIORITY_STOP, (account.name, symbol), _in_account, account, self._fix, *args)
+            jobs.append((state_key, future))
+        for state_key, future in jobs:
+            try:
+                for action in future.result():
+                    counts[action] += 1
+            except Exception as exc:
+                print(f"[RECONCILE] {state_key} error {exc}")
+        with state_lock:
+            for state_key in local.values():
+                if state_key in open_positions:
+                    _start_watcher(state_key)
+        for action, n in counts.items():
+            if n:
+                metrics.inc("bot_reconcile_actions_total", n, action=action)
+        return counts
+
+    def _fix(
+        self,
+        account: AccountContext,
+        state_key: str,
+        row: Optional[Dict[str, Any]],
+        stop: Optional[Dict[str, Any]],
+        fetched_at: float,
+    ) -> List[str]:
+        """Tek (sembol, yön) için düzeltme; snapshot'tan sonra açılan pozisyona dokunmaz."""
+        if row is None:
+            return ["stale"] if self._drop_stale(state_key, fetched_at) else []
+        with state_lock:
+            state = open_positions.get(state_key)
+        if state is None:
+            return ["adopted"] if self._adopt(account, row, stop) else []
+        if state.get("opened_ts", 0) >= fetched_at - 1:
+            return []  # sıradaki giriş işi pozisyonu snapshot'tan sonra açtı
+        actions = ["resized"] if self._sync_qty(state_key, row) else []
+        if stop is None and self._restore_stop(state_key):
+            actions.append("stops")
+        return actions
+
+    @staticmethod
+    def _drop_stale(state_key: str, fetched_at: float) -> bool:
+        with state_lock:
+            state = open_positions.get(state_key)
+            # Snapshot'tan sonra açılan pozisyon henüz listede olmayabilir; opened_ts'i
+            # olmayan eski kayıtlar da düşürülmez (kapanırsa watcher düşürür).
+            if state is None or state.get("opened_ts") is None or state["opened_ts"] >= fetched_at - 1:
+                return False
+        print(f"[RECONCILE] {state_key} not on exchange, dropping")
+        _drop_closed_position(state_key)
+        return True
+
+    @staticmethod
+    def _adopt(account: AccountContext, row: Dict[str, Any], stop: Optional[Dict[str, Any]]) -> bool:
+        symbol = str(row["symbol"]).upper()
+        position_side = str(row["positionSide"]).upper()
+        qty = abs(_decimal(row.get("positionAmt", "0")))
+        entry = _decimal(row.get("entryPrice", "0"))
+        leverage = int(_decimal(row.get("leverage", "0"))) or symbol_leverage(symbol)
+        sl = _decimal(stop.get("stopPrice", "0")) if stop else Decimal("0")
+        state_key = _state_key(symbol, position_side, account)
+        state = {
+            "account": account.name,
+            "symbol": symbol,
+            "entry": entry,
+            "qty": qty,
+            "side": "BUY" if position_side == "LONG" else "SELL",
+            "position_side": position_side,
+            "leverage": leverage,
+            "sl": sl,
+            "peak_pnl": Decimal("0"),
+            "margin": entry * qty / Decimal(leverage),
+            "sl_roe": symbol_initial_sl_roe(symbol),
+            "peak_roe": Decimal("0"),
+            "opened_at": datetime.now().isoformat(),
+            "opened_ts": time.time(),
+            "adopted": True,
+        }
+        print(f"[RECONCILE] adopting {state_key} qty={qty} entry={entry} sl={sl or 'none'}")
+        try:
+            precision: Optional[Dict[str, Any]] = PrecisionCache.get(symbol)
+        except Exception:
+            precision = None
+        with state_lock:
+            if state_key in open_positions:
+                return False
+            event_log.record("adopt", {"state_key": state_key, "state": state, "precision": precision})
+            open_positions[state_key] = state
+            risk_book.on_open(state_key, state)
+            # SL yoksa watcher ilk tick'te hedef SL'i yerleştirir (current_sl == 0).
+            _start_watcher(state_key)
+        return True
+
+    @staticmethod
+    def _sync_qty(state_key: str, row: Dict[str, Any]) -> bool:
+        with state_lock:
+            state = open_positions.get(state_key)
+        if state is None:
+            return False
+        return _on_qty_change(state_key, state, abs(_decimal(row.get("positionAmt", "0"))))
+
+    @staticmethod
+    def _restore_stop(state_key: str) -> bool:
+        with state_lock:
+            state = open_positions.get(state_key)
+            if state is None or _decimal(state.get("sl", "0")) <= 0:
+                return False  # SL'i olmayan pozisyonu watcher yerleştirir
+            symbol, position_side, sl = state["symbol"], state["position_side"], _decimal(state["sl"])
+        try:
+            # Snapshot'tan beri watcher SL'i taşımış olabilir: sembolün emirlerini tekrar kontrol et.
+            if any(_is_close_position_stop(o, position_side) for o in get_open_orders(symbol) or []):
+                return False
+            print(f"[RECONCILE] {state_key} stop missing, re-placing at {sl}")
+            place_stop_loss_close(symbol, sl, position_side)
+            return True
+        except Exception as exc:
+            print(f"[RECONCILE] {state_key} stop restore failed: {exc}")
+            metrics.inc("bot_sl_failures_total", kind="reconcile")
+            return False
+
+    def run_once(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {}
+        for account in get_accounts():
+            try:
+                report[account.name] = self.reconcile_account(account)
+            except Exception as exc:
+                print(f"[RECONCILE] {account.name} error {exc}")
+                report[account.name] = {"error": str(exc)}
+        with self._lock:
+            self.passes += 1
+            self.last = {"at": datetime.now().isoformat(), "accounts": report}
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"interval_seconds": RECONCILE_INTERVAL_SECONDS, "passes": self.passes, "last": self.last}
+
+
+reconciler = Reconciler()
+
+
+def _reconcile_loop() -> None:
+    while not lifecycle.wait(RECONCILE_INTERVAL_SECONDS):
+        reconciler.run_once()
+
+
+def _start_reconciler() -> None:
+    if _runs_trading_engine() and RECONCILE_INTERVAL_SECONDS > 0:
+        threading.Thread(target=_reconcile_loop, name="reconciler", daemon=True).start()
+
+
+BACKGROUND_SERVICES.append(_start_reconciler)
+
+
+# ------------------------------------------------------------------------------
+# Lifecycle (graceful shutdown + restart handoff)
+# ------------------------------------------------------------------------------
+
+# Checkpoint'teki Decimal alanları; tp bacakları ayrıca çevrilir.
+_CHECKPOINT_DECIMALS = ("entry", "qty", "sl", "peak_pnl", "margin", "sl_roe", "peak_roe")
+
+
+def _checkpoint_value(value: Any) -> Any:
+    """JSON'a yazılabilir kopya (Decimal -> str)."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _checkpoint_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_checkpoint_value(item) for item in value]
+    return value
+
+
+class Lifecycle:
+    """SIGTERM'de emir işlerini boşaltır, watcher'ları durdurur ve trailing state'i yazar.
+
+    Sıra: yeni girişler reddedilir (503), kuyruktaki/çalışan emir işleri biter,
+    watcher'lar tick arasında çıkar, geç gelen SL/TP işleri de beklenir, sonra
+    ``CHECKPOINT_FILE`` yazılır. Borsadaki SL emirleri yerinde kaldığı için
+    pozisyonlar restart boyunca korumasız kalmaz; yalnızca trailing kısa süre durur.
+    Yeni süreç checkpoint'i açılışta yükler ve watcher'ları beklemeden başlatır.
+    """
+
+    def __init__(self) -> None:
+        self.stopping = threading.Event()
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.reason: Optional[str] = None
+        self.drained: Optional[bool] = None
+        self.restored = 0
+        self.last_checkpoint: Optional[Dict[str, Any]] = None
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``; True if shutdown started meanwhile."""
+        return self.stopping.wait(seconds)
+
+    def shutdown(self, reason: str = "shutdown") -> None:
+        with self._lock:
+            if self.stopping.is_set():
+                return
+            self.stopping.set()
+            self.reason = reason
+        started = time.monotonic()
+        deadline = started + SHUTDOWN_DRAIN_SECONDS
+        logger.info(f"Shutdown ({reason}): draining order work")
+        signal_scheduler.close()
+        drained = signal_scheduler.drain(SHUTDOWN_DRAIN_SECONDS)
+
+        with state_lock:
+            watchers = list(watcher_threads.values())
+        futures = [w for w in watchers if not isinstance(w, threading.Thread)]
+        for watcher in watchers:
+            if isinstance(watcher, threading.Thread):
+                watcher.join(max(deadline - time.monotonic(), 0.1))
+        if futures:
+            _done, pending = wait_futures(futures, timeout=max(deadline - time.monotonic(), 0.1))
+            for future in pending:
+                future.cancel()
+        # Son tick'lerin gönderdiği SL/TP işleri
+        drained = signal_scheduler.drain(max(deadline - time.monotonic(), 0.1)) and drained
+        self.drained = drained
+        if not drained:
+            logger.warning("Shutdown: order work still running after drain timeout")
+
+        try:
+            self.write_checkpoint()
+        except OSError as exc:
+            logger.error(f"Checkpoint write failed: {exc}")
+        event_log.close()
+        logger.info(f"Shutdown complete in {time.monotonic() - started:.2f}s")
+        self.stopped.set()
+
+    def write_checkpoint(self) -> Dict[str, Any]:
+        with state_lock:
+            positions = {
+                key: _checkpoint_value({field: value for field, value in state.items() if field != "precision"})
+                for key, state in open_positions.items()
+            }
+        with PrecisionCache._lock:
+            precision = {
+                state["symbol"]: _checkpoint_value(PrecisionCache._cache[state["symbol"]])
+                for state in positions.values()
+                if state["symbol"] in PrecisionCache._cache
+            }
+        _atomic_write_json(
+            CHECKPOINT_FILE,
+            {
+                "version": 1,
+                "saved_at": time.time(),
+                "pid": os.getpid(),
+                "test_mode": TEST_MODE,
+                "positions": positions,
+                "precision": precision,
+            },
+        )
+        self.last_checkpoint = {"at": datetime.now().isoformat(), "positions": len(positions), "file": str(CHECKPOINT_FILE)}
+        logger.info(f"Checkpoint: {len(positions)} position(s) -> {CHECKPOINT_FILE}")
+        return self.last_checkpoint
+
+    def restore(self) -> int:
+        """Load the previous process' checkpoint once and resume its watchers."""
+        try:
+            with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as exc:
+            logger.error(f"Checkpoint {CHECKPOINT_FILE} unreadable: {exc}")
+            return 0
+        if bool(data.get("test_mode")) != TEST_MODE:
+            # Paper pozisyonları gerçek hesapta (veya tersi) izlenmesin; dosya yerinde kalır.
+            logger.warning(f"Checkpoint {CHECKPOINT_FILE} is from TEST_MODE={data.get('test_mode')}, not loading")
+            return 0
+        # Aynı checkpoint iki kez yüklenmesin (ör. iki ardışık restart arasında çökme).
+        os.replace(CHECKPOINT_FILE, CHECKPOINT_FILE.with_name(CHECKPOINT_FILE.name + ".loaded"))
+
+        for symbol, raw in (data.get("precision") or {}).items():
+            PrecisionCache.store(symbol, _event_precision(raw))
+        restored = 0
+        for state_key, raw in (data.get("positions") or {}).items():
+            state = dict(raw)
+            for field in _CHECKPOINT_DECIMALS:
+                state[field] = _decimal(state.get(field, "0"))
+            if state.get("tp"):
+                state["tp"] = [
+                    {**leg, **{field: _decimal(leg[field]) for field in ("price", "qty", "roe")}} for leg in state["tp"]
+                ]
+            with state_lock:
+                if state_key in open_positions:
+                    continue
+                event_log.record(
+                    "adopt", {"state_key": state_key, "state": state, "precision": data.get("precision", {}).get(state["symbol"])}
+                )
+                open_positions[state_key] = state
+                risk_book.on_open(state_key, state)
+                # Kapanmış pozisyonu ilk tick (veya reconciler) düşürür.
+                _start_watcher(state_key, delay=0)
+            restored += 1
+        self.restored = restored
+        age = time.time() - float(data.get("saved_at", time.time()))
+        logger.info(f"Checkpoint restored: {restored} position(s), saved {age:.1f}s ago by pid {data.get('pid')}")
+        return restored
+
+    def install_signal_handlers(self, stop_serving: Optional[Callable[[], None]] = None, early: bool = False) -> None:
+        """SIGTERM/SIGINT -> shutdown in a worker thread; a second signal exits at once.
+
+        ``stop_serving`` kabul döngüsünü kapatır: ``early`` ise (soket devralındıysa)
+        boşaltmadan önce, böylece yeni bağlantılar kernel kuyruğunda yeni süreci bekler.
+        """
+
+        def _run(reason: str) -> None:
+            if stop_serving is not None and early:
+                stop_serving()
+            self.shutdown(reason)
+            if stop_serving is not None and not early:
+                stop_serving()
+
+        def _handle(signum: int, _frame: Any) -> None:
+            if self.stopping.is_set():
+                logger.warning("Second signal during shutdown, exiting without checkpoint")
+                os._exit(1)
+            threading.Thread(target=_run, args=(signal.Signals(signum).name,), name="shutdown").start()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, _handle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stopping": self.stopping.is_set(),
+            "reason": self.reason,
+            "drained": self.drained,
+            "restored": self.restored,
+            "last_checkpoint": self.last_checkpoint,
+            "drain_seconds": SHUTDOWN_DRAIN_SECONDS,
+        }
+
+
+lifecycle = Lifecycle()
+
+
+def _start_lifecycle() -> None:
+    if not _runs_trading_engine():
+        return
+    lifecycle.restore()
+    # gunicorn worker'ı gibi sinyali kendisi yöneten sunucularda da checkpoint yazılsın.
+    atexit.register(lifecycle.shutdown, "exit")
+
 
+BACKGROUND_SERVICES.append(_start_lifecycle)
 
-# ------------------------------------------------------------------------------
-# Watcher thread
-# ------------------------------------------------------------------------------
 
-def roi_watcher(state_key: str) -> None:
-    time.sleep(2)
-    while True:
-        with state_lock:
-            state = open_positions.get(state_key)
-        if not state:
-            return
+def _inherited_socket_fd() -> Optional[int]:
+    """systemd socket activation: devralınan ilk dinleyen soketin fd'si.
 
-        symbol = state["symbol"]
-        side = state["side"]
-        position_side = state["position_side"]
-        entry_price: Decimal = state["entry"]
-        current_sl: Decimal = state.get("sl", Decimal("0"))
-        peak_pnl: Decimal = state.get("peak_pnl", Decimal("0"))
-        peak_roe: Decimal = _decimal(state.get("peak_roe", "0"))
-        margin: Decimal = _position_margin(state)
+    Değişkenler okunduktan sonra silinir (sd_listen_fds gibi); alt süreçler fd 3'ü
+    kendi soketleri sanmasın.
+    """
+    pid = os.environ.pop("LISTEN_PID", "")
+    fds = os.environ.pop("LISTEN_FDS", "0")
+    os.environ.pop("LISTEN_FDNAMES", None)
+    if pid != str(os.getpid()) or int(fds or 0) < 1:
+        return None
+    return 3  # SD_LISTEN_FDS_START
 
-        try:
-            pos = get_position_risk(symbol, position_side)
-        except Exception as exc:
-            print(f"[WATCHER] {state_key} positionRisk error {exc}")
-            time.sleep(WATCH_INTERVAL_SECONDS)
-            continue
 
-        position_amt = _decimal(pos.get("positionAmt", "0"))
-        abs_amt = abs(position_amt)
+# ------------------------------------------------------------------------------
+# Signal deduplication (idempotency)
+# ------------------------------------------------------------------------------
 
-        if abs_amt <= Decimal("0"):
-            print(f"[WATCHER] {state_key} position closed")
-            with state_lock:
-                open_positions.pop(state_key, None)
-                watcher_threads.pop(state_key, None)
-            return
 
-        try:
-            mark_price = _decimal(pos.get("markPrice", get_price(symbol)))
-        except Exception:
-            mark_price = entry_price
+class SignalDeduper:
+    """TradingView'in tekrar gönderdiği alarmları borsaya gitmeden reddeder.
 
-        pnl = _compute_pnl(entry_price, mark_price, abs_amt, side)
-        roe_now = _roe_from_pnl(pnl, margin)
+    Anahtar (ticker, dir, alarm kimliği) üçlüsüdür; kimlik olarak sırasıyla
+    ``id``/``client_id``, bar zamanı (``time``) ya da son çare ``entry`` kullanılır.
+    TTL sabitken ekleme sırası bitiş sırasıdır; süresi dolanlar baştan O(1)
+    amortize maliyetle temizlenir. TTL config ile düşürülünce daha uzun ömürlü eski
+    kayıtların arkasında kalan anahtarlar da kendi bitiş anlarıyla kontrol edilir.
+    """
 
-        peak_pnl = max(peak_pnl, pnl)
-        peak_roe = max(peak_roe, roe_now)
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
-        target_roe = _target_sl_roe_from_peak(peak_roe)
-        target_pnl = _pnl_from_roe(target_roe, margin)
-        target_price = _sl_price_from_target_pnl(entry_price, abs_amt, side, target_pnl)
-        stop_str = _format_price(symbol, target_price, position_side)
-        stop_price = _decimal(stop_str)
+    @staticmethod
+    def key_for(data: Dict[str, Any], symbol: str, direction: str) -> str:
+        ident = data.get("id") or data.get("client_id") or data.get("time") or f"entry={data.get('entry')}"
+        return f"{symbol}|{direction}|{ident}"
 
-        should_move = (
-            current_sl == 0
-            or (position_side == "LONG" and stop_price > current_sl)
-            or (position_side == "SHORT" and stop_price < current_sl)
-        )
+    @staticmethod
+    def order_scope(data: Dict[str, Any], key: str) -> str:
+        """clientOrderId kapsamı: alarmın kendi kimliği varsa sadece anahtar (tekrar gönderim
+        aynı id'leri üretir), entry'den türetilen anahtar ise gün içinde tekrarlayabileceği
+        için alındığı anla birlikte."""
+        if data.get("id") or data.get("client_id") or data.get("time"):
+            return key
+        return f"{key}|{time.time_ns()}"
+
+    def claim(self, key: str) -> bool:
+        """Record key; returns False if it was already seen within the TTL."""
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                _oldest, expires = next(iter(self._seen.items()))
+                if expires > now:
+                    break
+                self._seen.popitem(last=False)
+            expires = self._seen.get(key)
+            if expires is not None and expires > now:
+                self.hits += 1
+                return False
+            self._seen.pop(key, None)  # süresi dolmuş kayıt sona, yeni bitiş anıyla taşınır
+            self._seen[key] = now + SIGNAL_DEDUP_TTL_SECONDS
+            self.misses += 1
+            return True
+
+    def release(self, key: str) -> None:
+        """Forget key so a retried alert is not rejected after a failed execution."""
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "tracked": len(self._seen),
+                "ttl_seconds": SIGNAL_DEDUP_TTL_SECONDS,
+            }
 
-        if should_move:
-            print(
-                f"[SL TRAIL] {state_key} pnl={pnl:.2f} roe={roe_now:.2f}% "
-                f"peak_roe={peak_roe:.2f}% target_roe={target_roe}% stop={stop_str}"
-            )
-            try:
-                place_stop_loss_close(symbol, stop_price, position_side)
-                with state_lock:
-                    state["sl"] = stop_price
-                    state["sl_roe"] = target_roe
-                    state["peak_pnl"] = peak_pnl
-                    state["peak_roe"] = peak_roe
-                current_sl = stop_price
-            except Exception as exc:
-                print(f"[SL ERROR] {state_key} {exc}")
-                with state_lock:
-                    state["peak_pnl"] = peak_pnl
-                    state["peak_roe"] = peak_roe
-        else:
-            with state_lock:
-                state["peak_pnl"] = peak_pnl
-                state["peak_roe"] = peak_roe
 
-        time.sleep(WATCH_INTERVAL_SECONDS)
+signal_deduper = SignalDeduper()
 
 
 # ------------------------------------------------------------------------------
-# Webhook endpoint
+# Signal execution
 # ------------------------------------------------------------------------------
 
-@app.route("/webhook", methods=["POST"])
-def webhook() -> Any:
-    if DAILY_MAX_LOSS < 0:
-        pnl = get_daily_realized_pnl()
-        if pnl <= DAILY_MAX_LOSS:
-            return jsonify({"status": "blocked", "reason": "DAILY_MAX_LOSS", "pnl": float(pnl)}), 403
 
-    data = request.get_json(force=True, silent=True) or {}
+class InvalidDirection(ValueError):
+    pass
+
+
+def parse_signal(data: Dict[str, Any]) -> Tuple[str, str, Decimal]:
+    """(symbol, direction, entry) from a TradingView payload; ValueError if invalid."""
     try:
         raw_symbol = str(data["ticker"]).replace("/", "").split(".")[0].upper()
         symbol = SYMBOL_ALIASES.get(raw_symbol, raw_symbol)
         direction = str(data["dir"]).upper()
         entry = _decimal(data["entry"])
-    except Exception:
-        return jsonify({"status": "error", "msg": "invalid payload", "data": data}), 400
-
+    except Exception as exc:
+        raise ValueError("invalid payload") from exc
     if direction not in ("LONG", "SHORT"):
-        return jsonify({"status": "error", "msg": "invalid direction"}), 400
+        raise InvalidDirection("invalid direction")
+    return symbol, direction, entry
+
+
+def parse_size_hints(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Alarmın opsiyonel boyut ipuçları: ``margin`` (USDT), ``leverage``, ``size`` (margin çarpanı)."""
+    hints: Dict[str, Any] = {}
+    try:
+        if data.get("margin") is not None:
+            hints["margin"] = _decimal(data["margin"])
+        if data.get("leverage") is not None:
+            hints["leverage"] = int(data["leverage"])
+        if data.get("size") is not None:
+            hints["size"] = _decimal(data["size"])
+    except (TypeError, ValueError, ArithmeticError) as exc:
+        raise ValueError("invalid size hint") from exc
+    if hints.get("margin", 1) <= 0 or hints.get("size", 1) <= 0 or not 1 <= hints.get("leverage", 1) <= 125:
+        raise ValueError("invalid size hint")
+    return hints
+
+
+def select_accounts(data: Dict[str, Any]) -> Tuple[List[AccountContext], bool]:
+    """(hedef hesaplar, fan-out mu) döner; ``accounts`` geçersizse ValueError.
+
+    Webhook kimlik doğrulamasız olduğundan alarm gövdesi hesap seçemez; seçim yalnızca
+    operatör FANOUT_ACCOUNTS'u açtığında, API anahtarı olan hesaplar arasında geçerlidir.
+    """
+    requested = data.get("accounts")
+    if requested is None or requested == "" or requested == []:
+        return (get_accounts() if FANOUT_ACCOUNTS else [PRIMARY_ACCOUNT]), FANOUT_ACCOUNTS
+    if not FANOUT_ACCOUNTS:
+        raise ValueError("account selection is disabled (FANOUT_ACCOUNTS is off)")
+    if isinstance(requested, str):
+        requested = [requested]
+    if not isinstance(requested, (list, tuple)) or not all(isinstance(name, str) and name for name in requested):
+        raise ValueError("invalid accounts")
+    known = {account.name: account for account in get_accounts()}
+    unknown = sorted({name for name in requested if name not in known})
+    if unknown:
+        raise ValueError(f"unknown account(s): {', '.join(unknown)}")
+    return [known[name] for name in dict.fromkeys(requested)], True
+
+
+def execute_signal(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """TradingView alarmını işler; (yanıt gövdesi, HTTP durum kodu) döner."""
+    try:
+        symbol, direction, entry = parse_signal(data)
+    except InvalidDirection:
+        return {"status": "error", "msg": "invalid direction"}, 400
+    except ValueError:
+        return {"status": "error", "msg": "invalid payload", "data": data}, 400
+    try:
+        hints = parse_size_hints(data) if {**SIZING_DEFAULTS, **SIZING}["ALLOW_HINTS"] else {}
+    except ValueError as exc:
+        return {"status": "error", "msg": str(exc)}, 400
+    try:
+        accounts, fanout = select_accounts(data)
+    except ValueError as exc:
+        return {"status": "error", "msg": str(exc)}, 400
+
+    dedup_key = SignalDeduper.key_for(data, symbol, direction)
+    if SIGNAL_DEDUP_TTL_SECONDS > 0 and not signal_deduper.claim(dedup_key):
+        print(f"[ALARM DUPLICATE] {dedup_key}")
+        metrics.inc("bot_signals_total", status="duplicate")
+        return {"status": "ignored", "reason": "duplicate_signal"}, 200
+
+    with metrics.timer("bot_webhook_stage_seconds", stage="total"):
+        with tracer.trace("webhook", symbol=symbol, direction=direction) as trace_id:
+            body, status = _dispatch_signal(
+                accounts, fanout, symbol, direction, entry, SignalDeduper.order_scope(data, dedup_key), hints
+            )
+    body = dict(body, trace_id=trace_id)
+    if status >= 400 and status != 403:
+        signal_deduper.release(dedup_key)
+    metrics.inc("bot_signals_total", status=body.get("status", "unknown"))
+    return body, status
+
+
+def _wait_scheduled(future: Future, deadline: float) -> Tuple[Dict[str, Any], int]:
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeoutError:
+        # İş kuyrukta kalmaya devam eder ve sırası gelince çalışır.
+        return {"status": "queued", "msg": "signal accepted, still waiting for execution"}, 202
+
+
+def _dispatch_signal(
+    accounts: List[AccountContext],
+    fanout: bool,
+    symbol: str,
+    direction: str,
+    entry: Decimal,
+    order_scope: Optional[str] = None,
+    hints: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], int]:
+    if not accounts:
+        return {"status": "error", "msg": "no account with API keys matched"}, 400
+
+    # Her hesap scheduler'da (hesap, sembol) anahtarıyla sıraya girer: aynı sembole gelen
+    # alarmlar seri, farklı semboller/hesaplar paralel çalışır.
+    def _run(account: AccountContext) -> Tuple[Dict[str, Any], int]:
+        if not fanout:
+            with account_scope(account):
+                return _execute_for_account(account, symbol, direction, entry, order_scope, hints)
+        with tracer.span("account", account=account.name), account_scope(account):
+            try:
+                return _execute_for_account(account, symbol, direction, entry, order_scope, hints)
+            except Exception as exc:
+                print(f"[FANOUT ERROR] {account.name} {symbol} {exc}")
+                return {"status": "error", "msg": str(exc)}, 500
+
+    try:
+        futures = {
+            account.name: signal_scheduler.submit(PRIORITY_ENTRY, (account.name, symbol), _run, account)
+            for account in accounts
+        }
+    except SchedulerFull as exc:
+        print(f"[SCHEDULER] {symbol} {direction} rejected: {exc}")
+        return {"status": "error", "msg": str(exc)}, 503 if isinstance(exc, SchedulerClosed) else 429
+    deadline = time.monotonic() + SCHEDULER_WAIT_SECONDS
+    if not fanout:
+        return _wait_scheduled(futures[PRIMARY_ACCOUNT.name], deadline)
+    results = {name: _wait_scheduled(fut, deadline) for name, fut in futures.items()}
+    ok = sum(1 for _body, code in results.values() if code == 200)
+    overall = "ok" if ok == len(results) else ("partial" if ok else "error")
+    return {
+        "status": overall,
+        "symbol": symbol,
+        "direction": direction,
+        "accounts": {name: dict(body, http_status=code) for name, (body, code) in results.items()},
+    }, 200 if ok else 500
+
+
+def _execute_for_account(
+    account: AccountContext,
+    symbol: str,
+    direction: str,
+    entry: Decimal,
+    order_scope: Optional[str] = None,
+    hints: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], int]:
+    """Run one alert against one account; caller has entered account_scope(account).
+
+    ``order_scope`` (alarmın dedup anahtarı) verilirse her bacak (close/open/sl)
+    deterministik bir newClientOrderId alır; ``hints`` parse_size_hints çıktısıdır.
+    """
+
+    def leg_id(leg: str) -> Optional[str]:
+        return _client_order_id(f"{account.name}|{order_scope}", leg) if order_scope else None
+
+    with metrics.timer("bot_webhook_stage_seconds", stage="risk_gate"):
+        if DAILY_MAX_LOSS < 0:
+            pnl = get_daily_realized_pnl()
+            if pnl <= DAILY_MAX_LOSS:
+                return {"status": "blocked", "reason": "DAILY_MAX_LOSS", "pnl": float(pnl)}, 403
+
+        if account.max_open_positions is not None:
+            in_use = risk_book.account_open(account.name)
+            if in_use >= account.max_open_positions:
+                return {"status": "blocked", "reason": "ACCOUNT_MAX_POSITIONS", "open": in_use}, 403
 
     side = "BUY" if direction == "LONG" else "SELL"
     position_side = "LONG" if direction == "LONG" else "SHORT"
-
+    # Config değerlerini tek seferde oku: işlem ortasında gelen bir config güncellemesi
+    # aynı alarm içinde farklı margin/leverage kullanılmasına yol açmasın.
+    profile = sizing_profile(symbol)
+    position_margin, leverage, sizing = plan_size(
+        profile,
+        hints or {},
+        price_history.atr_pct(symbol) if profile.vol_target_pct > 0 else None,
+        {**SIZING_DEFAULTS, **SIZING},
+        account.margin_usdt,
+    )
+    initial_sl_roe = profile.initial_sl_roe
+    runtime = _async_runtime()
+
+    # Portföy limitleri: yalnızca bellek içi toplamlar, ağ çağrısı yok. Zıt yöndeki
+    # pozisyon bu alarmla kapatılacağı için katkısı düşülür. Geçen giriş aynı kilit
+    # altında rezerve edilir; başarısız çıkışta finally ile bırakılır.
+    state_key = _state_key(symbol, position_side, account)
+    with metrics.timer("bot_webhook_stage_seconds", stage="risk_limits"):
+        opposite_key = _state_key(symbol, "SHORT" if position_side == "LONG" else "LONG", account)
+        breach = risk_book.check(
+            symbol,
+            position_side,
+            position_margin,
+            position_margin * Decimal(leverage),
+            position_margin * abs(initial_sl_roe) / Decimal("100"),
+            releasing=opposite_key,
+            reserve=state_key,
+            account=account.name,
+        )
+    if breach is not None:
+        limit, details = breach
+        print(f"[RISK BLOCK] {symbol}:{position_side} {limit} {details}")
+        metrics.inc("bot_risk_blocks_total", limit=limit)
+        return {"status": "blocked", "reason": f"RISK_{limit}", **details}, 403
     try:
-        qty = compute_quantity(symbol, entry, DEFAULT_LEVERAGE)
-    except Exception as exc:
-        return jsonify({"status": "error", "msg": f"quantity error: {exc}"}), 400
+        return _open_reserved(
+            account, symbol, direction, entry, side, position_side, state_key,
+            profile, position_margin, leverage, sizing, runtime, leg_id,
+        )
+    finally:
+        risk_book.release(state_key)
 
-    current_long = get_position_risk(symbol, "LONG")
-    current_short = get_position_risk(symbol, "SHORT")
-    amt_long = abs(_decimal(current_long.get("positionAmt", "0")))
-    amt_short = abs(_decimal(current_short.get("positionAmt", "0")))
 
-    if (position_side == "LONG" and amt_long > 0) or (position_side == "SHORT" and amt_short > 0):
-        print(f"[ALARM IGNORE] {symbol} {position_side} already open")
-        return jsonify({"status": "ignored", "reason": "same_direction_exists"}), 200
+def _open_reserved(
+    account: AccountContext,
+    symbol: str,
+    direction: str,
+    entry: Decimal,
+    side: str,
+    position_side: str,
+    state_key: str,
+    profile: SizingProfile,
+    position_margin: Decimal,
+    leverage: int,
+    sizing: Dict[str, Any],
+    runtime: Optional[AsyncEngine],
+    leg_id: Callable[[str], Optional[str]],
+) -> Tuple[Dict[str, Any], int]:
+    """_execute_for_account'ın risk rezervasyonundan sonraki kısmı: emir, SL, TP, state."""
+    initial_sl_roe = profile.initial_sl_roe
+
+    if runtime is not None:
+        # precision + LONG/SHORT pozisyon sorgusu tek event loop'ta paralel; sonraki
+        # adımlar önbellekten okur.
+        try:
+            with metrics.timer("bot_webhook_stage_seconds", stage="prefetch"):
+                runtime.run(async_client.prefetch(symbol, account))
+        except Exception as exc:
+            print(f"[PREFETCH] {symbol} {exc}")
+
+    alert: Dict[str, Any] = {
+        "account": account.name,
+        "symbol": symbol,
+        "direction": direction,
+        "entry": entry,
+        "leverage": leverage,
+        "margin": position_margin,
+        "initial_sl_roe": initial_sl_roe,
+        "sizing": sizing,
+    }
+    try:
+        with metrics.timer("bot_webhook_stage_seconds", stage="precision"):
+            precision = PrecisionCache.get(symbol)
+            alert.update(precision=precision, mark=_reference_mark_price(symbol))
+            qty = plan_quantity(symbol, entry, leverage, position_margin, precision, alert["mark"])
+    except Exception as exc:
+        if "precision" in alert:
+            event_log.record("alert", alert, [{"cmd": "reject", "reason": str(exc)}])
+        return {"status": "error", "msg": f"quantity error: {exc}"}, 400
 
-    if position_side == "LONG" and amt_short > 0:
-        _close_position_market(symbol, "SHORT", amt_short)
-    elif position_side == "SHORT" and amt_long > 0:
-        _close_position_market(symbol, "LONG", amt_long)
+    try:
+        with metrics.timer("bot_webhook_stage_seconds", stage="position_check"):
+            current = get_symbol_positions(symbol)
+    except Exception as exc:
+        event_log.record("alert", alert, [])
+        return {"status": "error", "msg": f"position check error: {exc}"}, 500
+    amt_long = abs(_decimal(current["LONG"].get("positionAmt", "0")))
+    amt_short = abs(_decimal(current["SHORT"].get("positionAmt", "0")))
+
+    commands = plan_entry(position_side, qty, amt_long, amt_short)
+    event_log.record("alert", {**alert, "positions": [amt_long, amt_short]}, commands)
+    for command in commands:
+        if command["cmd"] == "ignore":
+            print(f"[ALARM IGNORE] {symbol} {position_side} already open")
+            return {"status": "ignored", "reason": command["reason"]}, 200
+        if command["cmd"] == "close":
+            _close_position_market(symbol, command["position_side"], command["qty"], leg_id("close"))
 
     try:
-        order_res = place_futures_market_order(symbol, side, qty, position_side, DEFAULT_LEVERAGE)
+        with metrics.timer("bot_webhook_stage_seconds", stage="order"):
+            if runtime is not None:
+                order_res = runtime.run_order(
+                    async_client.place_futures_market_order(
+                        symbol, side, qty, position_side, leverage, account, leg_id("open"), entry
+                    )
+                )
+            else:
+                order_res = place_futures_market_order(symbol, side, qty, position_side, leverage, leg_id("open"), entry)
+    except ValueError as exc:
+        return {"status": "error", "msg": f"order rejected: {exc}"}, 400
     except Exception as exc:
-        return jsonify({"status": "error", "msg": f"order error: {exc}"}), 500
+        return {"status": "error", "msg": f"order error: {exc}"}, 500
 
     raw_avg = _decimal(order_res.get("avgPrice", "0"))
     if raw_avg > 0:
@@ -977,54 +5854,464 @@ def webhook() -> Any:
             entry_price = entry
 
     # --- INITIAL ROI-BASED STOP LOSS ---
-    position_margin = BOT_MARGIN_USDT
-    initial_sl_roe = INITIAL_SL_ROE
-    initial_target_pnl = _pnl_from_roe(initial_sl_roe, position_margin)
+    initial_sl_price = plan_initial_stop(entry_price, qty, side, position_margin, initial_sl_roe)
+    tp_legs = plan_tp_ladder(symbol, entry_price, qty, side, position_margin, profile.tp_ladder, precision)
+    event_log.record(
+        "fill",
+        {
+            "state_key": state_key,
+            "account": account.name,
+            "symbol": symbol,
+            "side": side,
+            "position_side": position_side,
+            "entry": entry_price,
+            "qty": qty,
+            "leverage": leverage,
+            "margin": position_margin,
+            "initial_sl_roe": initial_sl_roe,
+            "tp_ladder": profile.tp_ladder,
+            "precision": precision,
+        },
+        [{"cmd": "stop", "state_key": state_key, "price": initial_sl_price, "roe": initial_sl_roe}]
+        + _tp_commands(state_key, tp_legs),
+    )
     sl_for_state = Decimal("0")
     sl_roe_for_state = initial_sl_roe
 
     try:
-        initial_sl_price = _sl_price_from_target_pnl(entry_price, qty, side, initial_target_pnl)
-        place_stop_loss_close(symbol, initial_sl_price, position_side)
+        with metrics.timer("bot_webhook_stage_seconds", stage="stop_loss"):
+            if runtime is not None:
+                runtime.run_order(
+                    async_client.place_stop_loss_close(symbol, initial_sl_price, position_side, account, leg_id("sl"))
+                )
+            else:
+                place_stop_loss_close(symbol, initial_sl_price, position_side, leg_id("sl"))
         sl_for_state = initial_sl_price
         print(f"[INIT SL] {symbol}:{position_side} roe={initial_sl_roe}% price={initial_sl_price}")
     except Exception as exc:
         print(f"[INIT SL ERROR] {symbol}:{position_side} {exc}")
+        metrics.inc("bot_sl_failures_total", kind="initial")
         sl_for_state = Decimal("0")
+    sl_ts = engine_time()
+    event_log.record(
+        "stop",
+        {"state_key": state_key, "price": initial_sl_price, "roe": initial_sl_roe, "ok": sl_for_state > 0, "ts": sl_ts},
+    )
+
+    # --- TAKE PROFIT LADDER ---
+    tp_book: List[Dict[str, Any]] = []
+    if tp_legs:
+        try:
+            with metrics.timer("bot_webhook_stage_seconds", stage="take_profit"):
+                tp_ids = [leg_id(f"tp{i}") for i in range(len(tp_legs))]
+                if runtime is not None:
+                    tp_book = runtime.run_order(async_client.place_tp_ladder(symbol, position_side, tp_legs, account, tp_ids))
+                else:
+                    tp_book = place_tp_ladder(symbol, position_side, tp_legs, tp_ids)
+        except Exception as exc:
+            print(f"[TP ERROR] {symbol}:{position_side} {exc}")
 
-    state_key = f"{symbol}:{position_side}"
     with state_lock:
         open_positions[state_key] = {
+            "account": account.name,
             "symbol": symbol,
             "entry": entry_price,
             "qty": qty,
             "side": side,
             "position_side": position_side,
-            "leverage": DEFAULT_LEVERAGE,
+            "leverage": leverage,
             "sl": sl_for_state,
+            "sl_ts": sl_ts if sl_for_state > 0 else 0,
             "peak_pnl": Decimal("0"),
             "margin": position_margin,
             "sl_roe": sl_roe_for_state,
             "peak_roe": Decimal("0"),
             "opened_at": datetime.now().isoformat(),
+            "opened_ts": time.time(),
+            "tp": tp_book,
         }
-        watcher = watcher_threads.get(state_key)
-        if not watcher or not watcher.is_alive():
-            t = threading.Thread(target=roi_watcher, args=(state_key,), daemon=True)
-            watcher_threads[state_key] = t
-            t.start()
+        risk_book.on_open(state_key, open_positions[state_key])
+        _start_watcher(state_key)
 
-    return jsonify(
-        {
+    return {
+        "status": "ok",
+        "account": account.name,
+        "symbol": symbol,
+        "direction": direction,
+        "entry": float(entry_price),
+        "qty": float(qty),
+        "leverage": leverage,
+        "margin": float(position_margin),
+        "sizing": _to_serializable(sizing),
+        "take_profit": _to_serializable(tp_book),
+        "order": order_res,
+    }, 200
+
+
+def close_position_by_key(state_key: str) -> Tuple[Dict[str, Any], int]:
+    """Close a tracked position by state_key with a market order."""
+    with state_lock:
+        state = open_positions.get(state_key)
+        if not state:
+            return {"status": "error", "message": "Position not found"}, 404
+        symbol = state.get("symbol")
+        position_side = state.get("position_side")
+        qty = _decimal(state.get("qty", "0"))
+        account = get_account(state.get("account"))
+    if account is None:
+        return {"status": "error", "message": "Account for position has no API keys"}, 400
+    try:
+        signal_scheduler.run(
+            PRIORITY_EXIT, (account.name, symbol), _in_account, account, _close_position_market, symbol, position_side, qty
+        )
+        logger.info(f"Position closed via API: {state_key}")
+        return {"status": "ok", "message": "Position close order placed"}, 200
+    except Exception as exc:
+        logger.error(f"Position close error: {exc}")
+        return {"status": "error", "message": str(exc)}, 500
+
+
+# ------------------------------------------------------------------------------
+# Trading engine (tek süreç) ve web worker IPC
+# ------------------------------------------------------------------------------
+#
+# open_positions, watcher_threads ve PrecisionCache süreç içi state'tir. gunicorn
+# birden çok worker ile çalıştığında bu state bölünür ve aynı pozisyon için birden
+# fazla watcher başlayabilir. Bu yüzden:
+#
+#   * BOT_ENGINE_MODE=embedded (varsayılan): her şey tek süreçte, eski davranış.
+#   * BOT_ENGINE_MODE=engine / ``python bot.py --engine``: sadece trading engine;
+#     webhook yürütme, watcher'lar ve precision cache burada yaşar.
+#   * BOT_ENGINE_MODE=client: web worker'ları (``gunicorn -w N bot:app``) emirleri
+#     BOT_ENGINE_ADDRESS üzerinden engine'e iletir, kendileri borsaya emir atmaz.
+
+ENGINE_MODE = os.getenv("BOT_ENGINE_MODE", "embedded").strip().lower()
+ENGINE_ADDRESS = os.getenv(
+    "BOT_ENGINE_ADDRESS",
+    str(BASE_DIR / "engine.sock") if hasattr(socket, "AF_UNIX") else "127.0.0.1:5001",
+)
+# BOT_ENGINE_AUTHKEY yoksa engine ile web worker'ları ilk kullanımda üretilen rastgele
+# anahtarı bu dosyadan (0600) paylaşır.
+ENGINE_AUTHKEY_FILE = Path(os.getenv("BOT_ENGINE_AUTHKEY_FILE", str(BASE_DIR / "engine.key")))
+_engine_authkey_value: Optional[bytes] = None
+ENGINE_TIMEOUT_SECONDS = float(os.getenv("BOT_ENGINE_TIMEOUT_SECONDS", "30"))
+
+
+def _runs_trading_engine() -> bool:
+    """True if this process owns trading state (embedded or dedicated engine)."""
+    return ENGINE_MODE != "client"
+
+
+def _engine_authkey() -> bytes:
+    global _engine_authkey_value
+    if _engine_authkey_value is not None:
+        return _engine_authkey_value
+    key = os.getenv("BOT_ENGINE_AUTHKEY", "").strip()
+    if not key:
+        with _file_lock(ENGINE_AUTHKEY_FILE):
+            try:
+                key = ENGINE_AUTHKEY_FILE.read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                key = secrets.token_hex(32)
+                fd = os.open(ENGINE_AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(key)
+                logger.info(f"Engine auth key generated in {ENGINE_AUTHKEY_FILE}")
+        if not key:
+            raise RuntimeError(f"{ENGINE_AUTHKEY_FILE} is empty; set BOT_ENGINE_AUTHKEY or delete the file")
+    _engine_authkey_value = key.encode()
+    return _engine_authkey_value
+
+
+def _engine_address() -> Any:
+    host, sep, port = ENGINE_ADDRESS.rpartition(":")
+    if sep and port.isdigit() and "/" not in ENGINE_ADDRESS and "\\" not in ENGINE_ADDRESS:
+        return (host or "127.0.0.1", int(port))
+    return ENGINE_ADDRESS
+
+
+def _engine_positions(_payload: Any) -> Tuple[Dict[str, Any], int]:
+    return {"positions": _snapshot_positions()}, 200
+
+
+def _engine_stats(_payload: Any) -> Tuple[Dict[str, Any], int]:
+    return {
+        "dedup": signal_deduper.stats(),
+        "position_batches": position_batcher.stats(),
+        "position_cache": position_cache.stats(),
+        "time_sync": time_sync.stats(),
+        "risk": risk_book.snapshot(),
+        "scheduler": signal_scheduler.stats(),
+        "reconcile": reconciler.stats(),
+        "events": event_log.stats(),
+        "orders": order_tracker.stats(),
+        "sl_debounce": sl_debounce_stats(),
+        "watch": watch_intervals(),
+        "lifecycle": lifecycle.stats(),
+    }, 200
+
+
+def _engine_paper(_payload: Any) -> Tuple[Dict[str, Any], int]:
+    summary = paper_exchange.summary()
+    summary["recent_trades"] = paper_exchange.recent_trades(50)
+    return {"status": "ok", **summary}, 200
+
+
+def _engine_strategy(_payload: Any) -> Tuple[Dict[str, Any], int]:
+    try:
+        return {"status": "ok", **strategy_summary.get()}, 200
+    except Exception as exc:
+        return {"status": "error", "message": f"strategy summary unavailable: {exc}"}, 503
+
+
+def _engine_market(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    symbol = str(payload.get("symbol") or "").upper()
+    if not symbol:
+        return {"status": "ok", "symbols": price_history.symbols()}, 200
+    interval = payload.get("interval") or "1m"
+    if interval not in BAR_INTERVAL_SECONDS:
+        return {"status": "error", "message": f"interval must be one of {sorted(BAR_INTERVAL_SECONDS)}"}, 400
+    try:
+        limit = int(payload.get("limit", 120))
+    except (TypeError, ValueError):
+        return {"status": "error", "message": "limit must be an integer"}, 400
+    snap = price_history.snapshot(symbol, interval, limit)
+    if snap is None:
+        return {"status": "error", "message": f"no price history for {symbol}"}, 404
+    return {"status": "ok", "symbol": symbol, **snap}, 200
+
+
+def _engine_sizing(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    symbol = str(payload.get("symbol") or "").upper()
+    settings = {**SIZING_DEFAULTS, **SIZING}
+    if not symbol:
+        return {
             "status": "ok",
-            "symbol": symbol,
-            "direction": direction,
-            "entry": float(entry_price),
-            "qty": float(qty),
-            "leverage": DEFAULT_LEVERAGE,
-            "order": order_res,
-        }
-    )
+            "settings": settings,
+            "default": _to_serializable(SIZING_DEFAULT.as_dict()),
+            "symbols": {sym: _to_serializable(profile.as_dict()) for sym, profile in sorted(SIZING_TABLE.items())},
+        }, 200
+    try:
+        hints = parse_size_hints(payload)
+    except ValueError as exc:
+        return {"status": "error", "message": str(exc)}, 400
+    profile = sizing_profile(symbol)
+    vol_pct = price_history.atr_pct(symbol)
+    margin, leverage, detail = plan_size(profile, hints, vol_pct if profile.vol_target_pct > 0 else None, settings)
+    return {
+        "status": "ok",
+        "symbol": symbol,
+        "profile": _to_serializable(profile.as_dict()),
+        "atr_pct": vol_pct,
+        "margin": float(margin),
+        "leverage": leverage,
+        "notional": float(margin * Decimal(leverage)),
+        "detail": _to_serializable(detail),
+    }, 200
+
+
+def _engine_metrics(_payload: Any) -> Tuple[Dict[str, Any], int]:
+    return {"text": metrics.render()}, 200
+
+
+def _engine_gauges() -> List[tuple]:
+    with state_lock:
+        positions = len(open_positions)
+        watchers = sum(1 for w in watcher_threads.values() if _watcher_alive(w))
+        intervals = [(key, st.get("watch_interval", WATCH_INTERVAL_SECONDS)) for key, st in open_positions.items()]
+    dedup = signal_deduper.stats()
+    risk = risk_book.snapshot()
+    sched = signal_scheduler.stats()
+    return [
+        ("bot_open_positions", positions, {}),
+        ("bot_watchers_alive", watchers, {}),
+        ("bot_watch_interval_seconds", WATCH_INTERVAL_SECONDS, {}),
+        ("bot_signal_dedup_hit_ratio", dedup["hit_rate"], {}),
+        ("bot_config_version", config_store.version, {}),
+        ("bot_risk_total_margin_usdt", risk["total_margin"], {}),
+        ("bot_risk_worst_case_loss_usdt", risk["worst_case_loss"], {}),
+        ("bot_risk_notional_usdt", risk["notional"]["LONG"], {"side": "LONG"}),
+        ("bot_risk_notional_usdt", risk["notional"]["SHORT"], {"side": "SHORT"}),
+        ("bot_scheduler_queue_depth", sched["queued"], {}),
+        ("bot_scheduler_running", sched["running"], {}),
+    ] + [("bot_position_watch_interval_seconds", interval, {"position": key}) for key, interval in intervals]
+
+
+def _engine_counters() -> List[tuple]:
+    # Sınıfların kendi tuttuğu, yalnızca artan toplamlar: rate() ile kullanılmak üzere counter.
+    dedup = signal_deduper.stats()
+    cache = position_cache.stats()
+    batches = position_batcher.stats()
+    return [
+        ("bot_signal_dedup_hits_total", dedup["hits"], {}),
+        ("bot_signal_dedup_misses_total", dedup["misses"], {}),
+        ("bot_position_cache_hits_total", cache["hits"], {}),
+        ("bot_position_cache_misses_total", cache["misses"], {}),
+        ("bot_position_batch_requests_total", batches["requests"], {}),
+        ("bot_position_batch_fetches_total", batches["fetches"], {}),
+    ]
+
+
+metrics.add_collector(_engine_gauges)
+metrics.add_collector(_engine_counters, kind="counter")
+
+
+def _engine_traces(payload: Any) -> Tuple[Dict[str, Any], int]:
+    payload = payload or {}
+    trace_id = payload.get("trace_id")
+    if not trace_id:
+        try:
+            limit = int(payload.get("limit", 50))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "limit must be an integer"}, 400
+        return {"status": "ok", "traces": tracer.recent(min(max(limit, 1), tracer.capacity))}, 200
+    trace = tracer.get(trace_id)
+    if trace is None:
+        return {"status": "error", "message": "Trace not found"}, 404
+    if payload.get("format") == "otlp":
+        return tracer.to_otlp(trace), 200
+    return {"status": "ok", "trace": trace}, 200
+
+
+ENGINE_COMMANDS: Dict[str, Callable[[Any], Tuple[Dict[str, Any], int]]] = {
+    "signal": execute_signal,
+    "positions": _engine_positions,
+    "close": close_position_by_key,
+    "stats": _engine_stats,
+    "metrics": _engine_metrics,
+    "traces": _engine_traces,
+    "market": _engine_market,
+    "strategy": _engine_strategy,
+    "paper": _engine_paper,
+    "sizing": _engine_sizing,
+}
+
+
+def _dispatch_engine_command(command: str, payload: Any) -> Tuple[Dict[str, Any], int]:
+    handler = ENGINE_COMMANDS.get(command)
+    if handler is None:
+        return {"status": "error", "message": f"unknown engine command {command}"}, 400
+    return handler(payload)
+
+
+_engine_client_local = threading.local()
+
+
+def _engine_connection() -> Connection:
+    conn = getattr(_engine_client_local, "conn", None)
+    if conn is not None and not conn.closed:
+        # Boşta bekleyen bağlantı okunabilir görünüyorsa engine kapatmıştır (restart):
+        # komutu ölü bağlantıya yazıp sonucu belirsiz bırakmadan önce yenisini aç.
+        try:
+            stale = conn.poll(0)
+        except (OSError, EOFError):
+            stale = True
+        if stale:
+            _drop_engine_connection()
+            conn = None
+    if conn is None or conn.closed:
+        conn = Client(_engine_address(), authkey=_engine_authkey())
+        _engine_client_local.conn = conn
+    return conn
+
+
+def _drop_engine_connection() -> None:
+    conn = getattr(_engine_client_local, "conn", None)
+    if conn is not None:
+        conn.close()
+    _engine_client_local.conn = None
+
+
+def _engine_timeout(command: str) -> float:
+    # "signal" engine'de kuyrukta SCHEDULER_WAIT_SECONDS'a kadar bekleyip 202 "queued"
+    # döner; cevap süresi bunun üstüne ENGINE_TIMEOUT_SECONDS payı kadar beklenir.
+    if command == "signal":
+        return SCHEDULER_WAIT_SECONDS + ENGINE_TIMEOUT_SECONDS
+    return ENGINE_TIMEOUT_SECONDS
+
+
+def engine_call(command: str, payload: Any = None) -> Tuple[Dict[str, Any], int]:
+    """Run an engine command locally or forward it to the engine process."""
+    if _runs_trading_engine():
+        return _dispatch_engine_command(command, payload)
+    for attempt in range(2):
+        try:
+            conn = _engine_connection()
+            conn.send((command, payload))
+        except (OSError, EOFError, AuthenticationError) as exc:
+            _drop_engine_connection()
+            if attempt:
+                logger.error(f"Engine call {command} failed: {exc}")
+                return {"status": "error", "msg": f"engine unavailable: {exc}"}, 503
+            continue
+        # Gönderildikten sonra tekrar deneme yok: engine komutu (emri) yürütmüş olabilir.
+        try:
+            timeout = _engine_timeout(command)
+            if not conn.poll(timeout):
+                raise TimeoutError(f"engine did not answer {command} in {timeout:g}s")
+            return conn.recv()
+        except (OSError, EOFError, TimeoutError) as exc:
+            _drop_engine_connection()
+            logger.error(f"Engine call {command} failed after send: {exc}")
+            return {"status": "error", "msg": f"engine unavailable: {exc}"}, 503
+    return {"status": "error", "msg": "engine unavailable"}, 503
+
+
+def _serve_engine_connection(conn: Connection) -> None:
+    with conn:
+        while True:
+            try:
+                command, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                result = _dispatch_engine_command(command, payload)
+            except Exception as exc:
+                logger.error(f"Engine command {command} error: {exc}")
+                result = ({"status": "error", "msg": str(exc)}, 500)
+            try:
+                conn.send(result)
+            except (OSError, ValueError) as exc:
+                logger.error(f"Engine reply failed: {exc}")
+                return
+
+
+def run_engine_server() -> None:
+    """Serve engine commands for the web workers until the process exits."""
+    address = _engine_address()
+    if isinstance(address, str) and os.path.exists(address):
+        os.unlink(address)  # önceki çalıştırmadan kalan soket
+    listener = Listener(address, authkey=_engine_authkey())
+    if isinstance(address, str):
+        os.chmod(address, 0o600)
+    logger.info(f"Trading engine listening on {ENGINE_ADDRESS}")
+    start_background_services()
+    threading.Thread(target=_engine_accept_loop, args=(listener,), name="engine-accept", daemon=True).start()
+    lifecycle.install_signal_handlers()
+    # Ana thread sinyalleri alır; shutdown kendi thread'inde çalışır.
+    while not lifecycle.stopped.wait(1.0):
+        pass
+
+
+def _engine_accept_loop(listener: Listener) -> None:
+    while not lifecycle.stopping.is_set():
+        try:
+            conn = listener.accept()
+        except (OSError, AuthenticationError) as exc:
+            logger.warning(f"Engine accept error: {exc}")
+            continue
+        threading.Thread(target=_serve_engine_connection, args=(conn,), daemon=True).start()
+
+
+# ------------------------------------------------------------------------------
+# Webhook endpoint
+# ------------------------------------------------------------------------------
+
+@app.route("/webhook", methods=["POST"])
+def webhook() -> Any:
+    data = request.get_json(force=True, silent=True) or {}
+    body, status = engine_call("signal", data)
+    return jsonify(body), status
 
 
 # ------------------------------------------------------------------------------
@@ -1047,14 +6334,26 @@ def api_status() -> Any:
         "INITIAL_SL_ROE": float(INITIAL_SL_ROE),
         "USE_DYNAMIC_PRECISION": USE_DYNAMIC_PRECISION,
         "WATCH_INTERVAL_SECONDS": WATCH_INTERVAL_SECONDS,
+        "CONFIG_VERSION": config_store.version,
     }
-    return jsonify({"bot_version": BOT_VERSION, "health": "running", "config": _to_serializable(config)})
+    engine_stats, _status = engine_call("stats")
+    return jsonify(
+        {
+            "bot_version": BOT_VERSION,
+            "health": "running",
+            "config": _to_serializable(config),
+            "signals": engine_stats,
+        }
+    )
 
 
 @app.route("/api/open-positions", methods=["GET"])
 @login_required
 def api_open_positions() -> Any:
-    snapshot = _snapshot_positions()
+    body, status = engine_call("positions")
+    if status != 200:
+        return jsonify(body), status
+    snapshot = body["positions"]
     positions: List[Dict[str, Any]] = []
     for state_key, state in snapshot.items():
         try:
@@ -1090,6 +6389,7 @@ def api_open_positions() -> Any:
             _to_serializable(
                 {
                     "state_key": state_key,
+                    "account": state.get("account", PRIMARY_ACCOUNT_NAME),
                     "symbol": state.get("symbol"),
                     "side": state.get("side"),
                     "position_side": state.get("position_side"),
@@ -1187,10 +6487,24 @@ def api_auth_me() -> Any:
 # ------------------------------------------------------------------------------
 
 
+def _test_mode_switch_blocked(value: Any) -> Optional[Any]:
+    """409 if TEST_MODE would flip while the engine holds positions."""
+    try:
+        if _parse_bool(value) == TEST_MODE:
+            return None
+    except ValueError:
+        return None  # geçersiz değer: config_store.update 400 döner
+    body, status = engine_call("positions")
+    if status == 200 and not body.get("positions"):
+        return None
+    return jsonify({"status": "error", "message": "TEST_MODE cannot change while positions are open"}), 409
+
+
 @app.route("/api/config", methods=["GET"])
 @login_required
 def api_config_get() -> Any:
     """Get current config."""
+    config_store.refresh()
     config = load_config()
     return jsonify({"status": "ok", "config": config})
 
@@ -1199,24 +6513,18 @@ def api_config_get() -> Any:
 @login_required
 def api_config_post() -> Any:
     """Update config."""
-    data = request.get_json(force=True, silent=True) or {}
-    current = load_config()
-    current.update(data)
-    # Validate types
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Config body must be a JSON object"}), 400
+    data.pop("CONFIG_VERSION", None)
+    blocked = _test_mode_switch_blocked(data.get("TEST_MODE", TEST_MODE))
+    if blocked is not None:
+        return blocked
     try:
-        current["BOT_MARGIN_USDT"] = float(current.get("BOT_MARGIN_USDT", 5))
-        current["BOT_LEVERAGE"] = int(current.get("BOT_LEVERAGE", 20))
-        current["BOT_DAILY_MAX_LOSS"] = float(current.get("BOT_DAILY_MAX_LOSS", -100))
-        current["BOT_INITIAL_SL_ROE"] = float(current.get("BOT_INITIAL_SL_ROE", -20))
-        current["BOT_WATCH_INTERVAL_SECONDS"] = float(current.get("BOT_WATCH_INTERVAL_SECONDS", 3))
-        current["USE_DYNAMIC_PRECISION"] = bool(current.get("USE_DYNAMIC_PRECISION", True))
-        current["TEST_MODE"] = bool(current.get("TEST_MODE", False))
-        current["AUTO_LOGOUT_MINUTES"] = int(current.get("AUTO_LOGOUT_MINUTES", 30))
-    except Exception as exc:
+        current = config_store.update(data)
+    except ValueError as exc:
         return jsonify({"status": "error", "message": f"Invalid config values: {exc}"}), 400
-    save_config(current)
-    apply_config(current)
-    logger.info("Config updated")
+    logger.info(f"Config updated (version {config_store.version})")
     return jsonify({"status": "ok", "config": current})
 
 
@@ -1224,18 +6532,10 @@ def api_config_post() -> Any:
 @login_required
 def api_config_reset() -> Any:
     """Reset config to defaults."""
-    default_config = {
-        "BOT_MARGIN_USDT": 5.0,
-        "BOT_LEVERAGE": 20,
-        "BOT_DAILY_MAX_LOSS": -100.0,
-        "BOT_INITIAL_SL_ROE": -20.0,
-        "BOT_WATCH_INTERVAL_SECONDS": 3.0,
-        "USE_DYNAMIC_PRECISION": True,
-        "TEST_MODE": False,
-        "AUTO_LOGOUT_MINUTES": 30,
-    }
-    save_config(default_config)
-    apply_config(default_config)
+    blocked = _test_mode_switch_blocked(DEFAULT_CONFIG["TEST_MODE"])
+    if blocked is not None:
+        return blocked
+    default_config = config_store.replace(DEFAULT_CONFIG)
     logger.info("Config reset to defaults")
     return jsonify({"status": "ok", "config": default_config})
 
@@ -1286,11 +6586,8 @@ def api_users_post() -> Any:
 @admin_required
 def api_users_delete(username: str) -> Any:
     """Delete user (admin only)."""
-    users = load_users()
-    filtered = [u for u in users if u.get("username") != username]
-    if len(filtered) == len(users):
+    if not user_store.delete(username):
         return jsonify({"status": "error", "message": "User not found"}), 404
-    save_users(filtered)
     logger.info(f"User deleted: {username}")
     return jsonify({"status": "ok", "message": "User deleted"})
 
@@ -1303,16 +6600,8 @@ def api_users_reset_password(username: str) -> Any:
     new_password = data.get("password", "").strip()
     if not new_password:
         return jsonify({"status": "error", "message": "Password required"}), 400
-    users = load_users()
-    found = False
-    for user in users:
-        if user.get("username") == username:
-            user["password_hash"] = generate_password_hash(new_password)
-            found = True
-            break
-    if not found:
+    if not user_store.update(username, {"password_hash": generate_password_hash(new_password)}):
         return jsonify({"status": "error", "message": "User not found"}), 404
-    save_users(users)
     logger.info(f"Password reset for: {username}")
     return jsonify({"status": "ok", "message": "Password reset", "new_password": new_password})
 
@@ -1362,20 +6651,8 @@ def api_position_close() -> Any:
     state_key = data.get("state_key", "").strip()
     if not state_key:
         return jsonify({"status": "error", "message": "state_key required"}), 400
-    with state_lock:
-        state = open_positions.get(state_key)
-        if not state:
-            return jsonify({"status": "error", "message": "Position not found"}), 404
-        symbol = state.get("symbol")
-        position_side = state.get("position_side")
-        qty = _decimal(state.get("qty", "0"))
-    try:
-        _close_position_market(symbol, position_side, qty)
-        logger.info(f"Position closed via API: {state_key}")
-        return jsonify({"status": "ok", "message": "Position close order placed"})
-    except Exception as exc:
-        logger.error(f"Position close error: {exc}")
-        return jsonify({"status": "error", "message": str(exc)}), 500
+    body, status = engine_call("close", state_key)
+    return jsonify(body), status
 
 
 # ------------------------------------------------------------------------------
@@ -1409,17 +6686,101 @@ def api_logs() -> Any:
 @app.route("/api/btc-strategy-summary", methods=["GET"])
 @login_required
 def api_btc_strategy_summary() -> Any:
-    """Get BTC strategy summary (dummy data for now)."""
-    # TODO: Implement real BTC strategy logic
-    dummy_data = {
-        "symbol": "BTCUSDT",
-        "long_trend": True,
-        "last_long_start_price": 62350.0,
-        "current_price": 64120.0,
-        "breakout_price": 65500.0,
-        "confidence_score": 73,
-    }
-    return jsonify({"status": "ok", **dummy_data})
+    """Get BTC strategy summary (EMA trend, Donchian breakout, confidence score)."""
+    body, status = engine_call("strategy", {})
+    return jsonify(body), status
+
+
+# ------------------------------------------------------------------------------
+# Paper trading endpoint
+# ------------------------------------------------------------------------------
+
+
+@app.route("/api/paper", methods=["GET"])
+@login_required
+def api_paper() -> Any:
+    """Simulated wallet, fees and recent paper trades (TEST_MODE)."""
+    body, status = engine_call("paper", {})
+    return jsonify(body), status
+
+
+# ------------------------------------------------------------------------------
+# Market data endpoints
+# ------------------------------------------------------------------------------
+
+
+@app.route("/api/market", methods=["GET"])
+@login_required
+def api_market_symbols() -> Any:
+    """Symbols with recorded price history."""
+    body, status = engine_call("market", {})
+    return jsonify(body), status
+
+
+@app.route("/api/sizing", methods=["GET"])
+@login_required
+def api_sizing() -> Any:
+    """Compiled sizing profiles; ?symbol=X[&margin=&leverage=&size=] previews one alert's size."""
+    body, status = engine_call("sizing", request.args.to_dict())
+    return jsonify(body), status
+
+
+@app.route("/api/market/<symbol>", methods=["GET"])
+@login_required
+def api_market_bars(symbol: str) -> Any:
+    """Rolling OHLC bars with ATR/volatility; ?interval=1s|1m&limit=N."""
+    body, status = engine_call(
+        "market",
+        {"symbol": symbol, "interval": request.args.get("interval", "1m"), "limit": request.args.get("limit", 120)},
+    )
+    return jsonify(body), status
+
+
+# ------------------------------------------------------------------------------
+# Trace endpoints
+# ------------------------------------------------------------------------------
+
+
+@app.route("/api/traces", methods=["GET"])
+@login_required
+def api_traces() -> Any:
+    """List recent webhook traces."""
+    body, status = engine_call("traces", {"limit": request.args.get("limit", 50)})
+    return jsonify(body), status
+
+
+@app.route("/api/traces/<trace_id>", methods=["GET"])
+@login_required
+def api_trace_get(trace_id: str) -> Any:
+    """Get one trace; ?format=otlp returns OTLP-compatible JSON."""
+    body, status = engine_call("traces", {"trace_id": trace_id, "format": request.args.get("format", "")})
+    return jsonify(body), status
+
+
+# ------------------------------------------------------------------------------
+# Metrics endpoint
+# ------------------------------------------------------------------------------
+
+METRICS_TOKEN = os.getenv("BOT_METRICS_TOKEN", "")
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint() -> Any:
+    """Prometheus scrape endpoint: BOT_METRICS_TOKEN Bearer token'ı ya da panel oturumu ister.
+
+    Metrikler açık pozisyonları (``position`` etiketi) içerdiği için diğer veri
+    endpoint'leri gibi varsayılan olarak kapalıdır; scraper için token tanımlayın.
+    """
+    authorization = request.headers.get("Authorization", "")
+    token_ok = bool(METRICS_TOKEN) and hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode())
+    if not token_ok and "user" not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    body, status = engine_call("metrics")
+    if status != 200:
+        return jsonify(body), status
+    response = make_response(body["text"], 200)
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
 
 
 # ------------------------------------------------------------------------------
@@ -1442,7 +6803,25 @@ def api_health() -> Any:
 # ------------------------------------------------------------------------------
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Binance Futures PnL trailing bot")
+    parser.add_argument("--engine", action="store_true", help="run only the trading engine (IPC server)")
+    args = parser.parse_args()
+    if args.engine or ENGINE_MODE == "engine":
+        ENGINE_MODE = "engine"
+        run_engine_server()
+    else:
+        from werkzeug.serving import make_server
+
+        inherited_fd = _inherited_socket_fd()
+        server = make_server("0.0.0.0", 5000, app, threaded=True, fd=inherited_fd)
+        if inherited_fd is not None:
+            logger.info(f"Serving on inherited socket fd {inherited_fd}")
+        start_background_services()
+        lifecycle.install_signal_handlers(server.shutdown, early=inherited_fd is not None)
+        server.serve_forever()
+        lifecycle.stopped.wait(SHUTDOWN_DRAIN_SECONDS + 5)
 
 
 
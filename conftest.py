@@ -0,0 +1,68 @@
+"""pytest ortak fixture'ları: ağ çağrısı yapmayan paper borsa."""
+import time
+from decimal import Decimal
+
+import pytest
+
+import bot
+
+
+def _clear_state():
+    with bot.state_lock:
+        bot.open_positions.clear()
+        bot.watcher_threads.clear()
+    bot.risk_book.reset()
+
+
+@pytest.fixture
+def paper(monkeypatch):
+    """TEST_MODE paper borsası; ``replaying`` watcher thread'i ve canlı ticker'ı kapatır."""
+    monkeypatch.setattr(bot, "TEST_MODE", True)
+    monkeypatch.setattr(bot, "USE_DYNAMIC_PRECISION", False)
+    monkeypatch.setattr(bot, "RISK_LIMITS", {})
+    exchange = bot.paper_exchange
+    exchange.reset()
+    exchange.replaying = True
+    _clear_state()
+    yield exchange
+    exchange.replaying = False
+    exchange.reset()
+    _clear_state()
+
+
+def open_paper_position(exchange, symbol, position_side, qty, price=100):
+    """Bot'un haberi olmadan borsada pozisyon aç (manuel işlem gibi)."""
+    exchange.set_price(symbol, price, time.time())
+    status, data = exchange.handle(
+        bot.PRIMARY_ACCOUNT.name,
+        "POST",
+        "/fapi/v1/order",
+        {
+            "symbol": symbol,
+            "side": "BUY" if position_side == "LONG" else "SELL",
+            "positionSide": position_side,
+            "type": "MARKET",
+            "quantity": str(qty),
+        },
+    )
+    assert status == 200, data
+    return data
+
+
+def make_state(symbol, position_side, qty="0.5", entry="100", **extra):
+    state = {
+        "account": bot.PRIMARY_ACCOUNT.name,
+        "symbol": symbol,
+        "side": "BUY" if position_side == "LONG" else "SELL",
+        "position_side": position_side,
+        "entry": Decimal(entry),
+        "qty": Decimal(qty),
+        "leverage": 20,
+        "margin": Decimal(entry) * Decimal(qty) / 20,
+        "sl": Decimal("0"),
+        "sl_roe": Decimal("-20"),
+        "peak_pnl": Decimal("0"),
+        "peak_roe": Decimal("0"),
+    }
+    state.update(extra)
+    return state
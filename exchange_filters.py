@@ -0,0 +1,129 @@
+"""Binance sembol filtreleri ve precision yardımcıları.
+
+bot.py ve scanner.py ortak kullanır. Import edildiğinde ağ, config ya da
+dosya işlemi yapmaz; tüm fonksiyonlar verilen ``exchangeInfo`` girdisi veya
+precision sözlüğü üzerinde çalışır.
+"""
+
+from __future__ import annotations
+
+from decimal import ROUND_DOWN, Decimal
+from typing import Any, Dict
+
+SYMBOL_ALIASES: Dict[str, str] = {
+    "BONKUSDT": "1000BONKUSDT",
+}
+
+
+def count_decimals(text: str) -> int:
+    if "." not in text:
+        return 0
+    return len(text.split(".")[1].rstrip("0"))
+
+
+def fallback_precision() -> Dict[str, Any]:
+    return {
+        "stepSize": Decimal("0"),
+        "marketStepSize": Decimal("0"),
+        "tickSize": Decimal("0.0001"),
+        "qty_decimals": 3,
+        "market_qty_decimals": 3,
+        "price_decimals": 4,
+        # 0 = sınır bilinmiyor, yerel doğrulama atlanır
+        "minQty": Decimal("0"),
+        "maxQty": Decimal("0"),
+        "minNotional": Decimal("0"),
+        "multiplierUp": Decimal("0"),
+        "multiplierDown": Decimal("0"),
+    }
+
+
+def parse_symbol_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the precision dict (step/tick plus pre-trade filter bounds) from one exchangeInfo ``symbols[]`` entry."""
+    sym = str(info.get("symbol")).upper()
+    step_size = None
+    market_step_size = None
+    tick_size = None
+    lot: Dict[str, Any] = {}
+    market_lot: Dict[str, Any] = {}
+    min_notional = None
+    percent: Dict[str, Any] = {}
+    for flt in info.get("filters", []):
+        if flt.get("filterType") == "LOT_SIZE":
+            step_size = flt.get("stepSize")
+            lot = flt
+        elif flt.get("filterType") == "MARKET_LOT_SIZE":
+            market_step_size = flt.get("stepSize")
+            market_lot = flt
+        elif flt.get("filterType") == "PRICE_FILTER":
+            tick_size = flt.get("tickSize")
+        elif flt.get("filterType") == "MIN_NOTIONAL":
+            min_notional = flt.get("notional", flt.get("minNotional"))
+        elif flt.get("filterType") == "PERCENT_PRICE":
+            percent = flt
+    if (step_size is None and market_step_size is None) or tick_size is None:
+        raise RuntimeError(
+            f"missing filters for {sym}: step={step_size} market_step={market_step_size} tick={tick_size}"
+        )
+    qty_decimals = count_decimals(str(step_size))
+    market_qty_decimals = count_decimals(str(market_step_size)) if market_step_size else qty_decimals
+    price_decimals = count_decimals(str(tick_size))
+    return {
+        "stepSize": Decimal(str(step_size)) if step_size else Decimal("0"),
+        "marketStepSize": Decimal(str(market_step_size)) if market_step_size else Decimal("0"),
+        "tickSize": Decimal(str(tick_size)),
+        "qty_decimals": qty_decimals,
+        "market_qty_decimals": market_qty_decimals,
+        "price_decimals": price_decimals,
+        # Market emirleri MARKET_LOT_SIZE sınırlarına tabi; yoksa LOT_SIZE.
+        "minQty": Decimal(str(market_lot.get("minQty") or lot.get("minQty") or "0")),
+        "maxQty": Decimal(str(market_lot.get("maxQty") or lot.get("maxQty") or "0")),
+        "minNotional": Decimal(str(min_notional or "0")),
+        "multiplierUp": Decimal(str(percent.get("multiplierUp") or "0")),
+        "multiplierDown": Decimal(str(percent.get("multiplierDown") or "0")),
+    }
+
+
+def format_decimal(value: Decimal, decimals: int) -> str:
+    quant = Decimal("1") if decimals == 0 else Decimal(f"1e-{decimals}")
+    return f"{value.quantize(quant, rounding=ROUND_DOWN):.{decimals}f}"
+
+
+def floor_to_step(value: Decimal, step: Decimal) -> Decimal:
+    if step <= 0:
+        return value
+    units = (value / step).to_integral_value(rounding=ROUND_DOWN)
+    return units * step
+
+
+def ceil_to_step(value: Decimal, step: Decimal) -> Decimal:
+    if step <= 0:
+        return value
+    units = (value / step)
+    integral = units.to_integral_value(rounding=ROUND_DOWN)
+    if units == integral:
+        return value
+    return (integral + 1) * step
+
+
+def floor_quantity(qty: Decimal, precision: Dict[str, Any]) -> Decimal:
+    step = precision["marketStepSize"] if precision["marketStepSize"] > 0 else precision["stepSize"]
+    if step > 0:
+        return floor_to_step(qty, step)
+    return qty.quantize(Decimal("0.001"), rounding=ROUND_DOWN)
+
+
+def format_quantity(qty: Decimal, precision: Dict[str, Any]) -> str:
+    decimals = precision["market_qty_decimals"] if precision["marketStepSize"] > 0 else precision["qty_decimals"]
+    decimals = decimals if decimals is not None else 3
+    return format_decimal(qty, decimals)
+
+
+def format_price(price: Decimal, position_side: str, precision: Dict[str, Any]) -> str:
+    tick = precision["tickSize"] if precision["tickSize"] > 0 else Decimal("0.0001")
+    decimals = precision["price_decimals"] if precision["price_decimals"] is not None else 4
+    if position_side.upper() == "LONG":
+        adj = floor_to_step(price, tick)
+    else:
+        adj = ceil_to_step(price, tick)
+    return format_decimal(adj, decimals)
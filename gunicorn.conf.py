@@ -0,0 +1,31 @@
+"""gunicorn ayarları: arka plan servisleri worker fork'undan hemen sonra başlasın.
+
+Aksi halde servisler (checkpoint restore ve watcher'lar dahil) ilk HTTP isteğinde
+başlar; restart sonrası pozisyonlar bir istek gelene kadar izlenmez.
+
+Trading engine'i taşıyan modda (BOT_ENGINE_MODE=embedded, varsayılan) yalnızca tek
+worker'a izin verilir: her worker borsadaki pozisyonları sahiplenip kendi watcher'ını
+başlatırdı ve aynı stop'u N trailer iptal edip yeniden koyardı. Çok worker için
+``python bot.py --engine`` + ``BOT_ENGINE_MODE=client gunicorn -w N bot:app``.
+"""
+
+import os
+
+
+def _engine_mode():
+    return os.getenv("BOT_ENGINE_MODE", "embedded").strip().lower()
+
+
+def on_starting(server):
+    workers = server.cfg.workers
+    if workers > 1 and _engine_mode() != "client":
+        raise RuntimeError(
+            f"BOT_ENGINE_MODE={_engine_mode()} runs the trading engine in every worker; "
+            f"use -w 1, or run `python bot.py --engine` and BOT_ENGINE_MODE=client for -w {workers}"
+        )
+
+
+def post_worker_init(worker):
+    import bot
+
+    bot.start_background_services()
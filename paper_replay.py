@@ -0,0 +1,133 @@
+"""Kayıtlı fiyat + alarm akışını TEST_MODE paper borsası üzerinden hızlı tekrar oynatır.
+
+Girdi JSONL, her satır bir olay (zaman sırasına göre sıralanır)::
+
+    {"ts": 1717000000, "symbol": "BTCUSDT", "price": 67123.5}
+    {"ts": 1717000060, "alert": {"ticker": "BTCUSDT", "dir": "LONG", "entry": 67150}}
+
+Alarmlar webhook ile aynı ``_execute_for_account`` yolundan, fiyatlar
+``PaperExchange.set_price`` (yerel stop tetikleme) ve ``watch_tick``
+(trailing SL) üzerinden işlenir; watcher thread'i, bekleme ve ağ çağrısı yoktur.
+
+Kullanım
+--------
+* ``python paper_replay.py events.jsonl``
+* ``python paper_replay.py events.jsonl --balance 500 --slippage-bps 5 --snapshot exchange_info_snapshot.json``
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import bot
+
+
+def load_events(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    events.sort(key=lambda e: float(e["ts"]))
+    return events
+
+
+def _load_precision(snapshot_path: Optional[str]) -> None:
+    """Precision offline gelsin: scanner snapshot'ı ya da sabit fallback."""
+    if snapshot_path and os.path.exists(snapshot_path):
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        for info in snapshot["exchangeInfo"].get("symbols", []):
+            try:
+                bot.PrecisionCache.store(str(info["symbol"]), bot.PrecisionCache.parse_symbol_info(info))
+            except RuntimeError:
+                continue
+    else:
+        bot.USE_DYNAMIC_PRECISION = False
+
+
+def replay(events: Iterable[Dict[str, Any]], balance: Optional[Decimal] = None) -> Dict[str, Any]:
+    """Run events through the paper backend; returns the paper summary plus alert outcomes."""
+    paper = bot.paper_exchange
+    paper.reset(balance)
+    # Önceki replay'den kalan pozisyonlar alarmları ve risk limitlerini etkilemesin.
+    with bot.state_lock:
+        bot.open_positions.clear()
+        bot.watcher_threads.clear()
+    bot.risk_book.reset()
+    bot.TEST_MODE = True
+    # Replay zamanı sıkıştırılmış: batch penceresi ve pozisyon cache yaşı anlamsız.
+    bot.POSITION_BATCH_WINDOW_SECONDS = 0
+    bot.POSITION_CACHE_MAX_AGE_SECONDS = 0
+    account = bot.PRIMARY_ACCOUNT
+    outcomes: Dict[str, int] = {}
+    prices = alerts = 0
+    paper.replaying = True
+    try:
+        with bot.account_scope(account):
+            for event in events:
+                ts = float(event["ts"])
+                if "alert" in event:
+                    alerts += 1
+                    try:
+                        symbol, direction, entry = bot.parse_signal(event["alert"])
+                    except ValueError as exc:
+                        outcomes[str(exc)] = outcomes.get(str(exc), 0) + 1
+                        continue
+                    paper.clock = ts
+                    if not paper.has_price(symbol):
+                        paper.set_price(symbol, entry, ts)
+                    body, _status = bot._execute_for_account(account, symbol, direction, entry)
+                    label = body.get("reason") or body.get("status", "unknown")
+                    outcomes[label] = outcomes.get(label, 0) + 1
+                    continue
+                prices += 1
+                symbol = str(event["symbol"]).upper()
+                paper.set_price(symbol, event["price"], ts)
+                with bot.state_lock:
+                    keys = [key for key, st in bot.open_positions.items() if st["symbol"] == symbol]
+                for key in keys:
+                    bot.watch_tick(key)
+    finally:
+        paper.replaying = False
+    return {**paper.summary(), "price_events": prices, "alerts": alerts, "alert_outcomes": outcomes}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Paper trading replay (TEST_MODE)")
+    parser.add_argument("events", help="JSONL olay dosyası")
+    parser.add_argument("--balance", type=Decimal, help=f"başlangıç bakiyesi (varsayılan {bot.PAPER_START_BALANCE})")
+    parser.add_argument("--slippage-bps", type=Decimal, help="slippage (baz puan)")
+    parser.add_argument("--fee-rate", type=Decimal, help="taker fee oranı")
+    parser.add_argument("--snapshot", default=None, help="scanner.py exchangeInfo snapshot'ı (precision için)")
+    parser.add_argument("--trades", action="store_true", help="kapanan işlemleri de yazdır")
+    parser.add_argument("--verbose", action="store_true", help="bot loglarını gizleme")
+    args = parser.parse_args(argv)
+
+    if args.slippage_bps is not None:
+        bot.PAPER_SLIPPAGE_BPS = args.slippage_bps
+    if args.fee_rate is not None:
+        bot.PAPER_FEE_RATE = args.fee_rate
+    _load_precision(args.snapshot)
+    events = load_events(args.events)
+
+    started = time.perf_counter()
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        result = replay(events, args.balance)
+    elapsed = time.perf_counter() - started
+    result["elapsed_seconds"] = round(elapsed, 3)
+    result["events_per_second"] = round(len(events) / elapsed) if elapsed > 0 else None
+    if args.trades:
+        result["closed_trades"] = bot.paper_exchange.trades
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Event log tekrar oynatıcı: kayıtlı girdileri karar çekirdeğinden geçirip komutları karşılaştırır.
+
+Motor her alarmı, fill'i, SL sonucunu, mark tick'ini ve config değişikliğini
+``logs/events/YYYYMMDD.evt`` dosyasına (``BOT_EVENT_LOG_DIR``) yazar. Bu araç
+dosyayı sırayla ``bot.core_apply``'a verir; ağ, thread ve bekleme yoktur.
+Kayıttaki komutlarla yeniden üretilenler farklıysa olay listelenir ve çıkış
+kodu 1 olur; trailing/sizing değişikliklerinin etkisini görmek için kullanılır.
+
+Kullanım
+--------
+* ``python replay.py logs/events/20261018.evt``
+* ``python replay.py logs/events/*.evt --show 50 --json``
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import bot
+
+
+def _normalize(commands: List[Dict[str, Any]]) -> str:
+    return json.dumps(commands, sort_keys=True, default=str)
+
+
+def replay(paths: Iterable[str], show: int = 20) -> Dict[str, Any]:
+    """Re-run every logged event; returns counts plus the first ``show`` command diffs."""
+    book: Dict[str, Dict[str, Any]] = {}
+    kinds: Dict[str, int] = {}
+    commands: Dict[str, int] = {}
+    diffs: List[Dict[str, Any]] = []
+    mismatched = 0
+    total = 0
+    for path in paths:
+        for index, (kind, ts, event) in enumerate(bot.read_events(path)):
+            total += 1
+            kinds[kind] = kinds.get(kind, 0) + 1
+            recorded = event.pop("out")
+            produced = bot.core_apply(book, kind, event)
+            for command in produced:
+                commands[command["cmd"]] = commands.get(command["cmd"], 0) + 1
+            if _normalize(recorded) == _normalize(produced):
+                continue
+            mismatched += 1
+            if len(diffs) < show:
+                diffs.append(
+                    {
+                        "file": path,
+                        "index": index,
+                        "ts": ts,
+                        "kind": kind,
+                        "key": event.get("state_key") or event.get("symbol"),
+                        "recorded": recorded,
+                        "replayed": json.loads(_normalize(produced)),
+                    }
+                )
+    return {
+        "events": total,
+        "by_kind": kinds,
+        "commands": commands,
+        "open_at_end": sorted(book),
+        "mismatched": mismatched,
+        "diffs": diffs,
+    }
+
+
+def _print_diffs(diffs: List[Dict[str, Any]]) -> None:
+    for diff in diffs:
+        stamp = time.strftime("%H:%M:%S", time.gmtime(diff["ts"]))
+        print(f"#{diff['index']} {stamp} {diff['kind']} {diff['key']}")
+        print(f"  recorded: {json.dumps(diff['recorded'], default=str)}")
+        print(f"  replayed: {json.dumps(diff['replayed'], default=str)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Event log replay + komut diff'i")
+    parser.add_argument("files", nargs="+", help="event log dosyaları (sırayla oynatılır)")
+    parser.add_argument("--show", type=int, default=20, help="gösterilecek en fazla fark")
+    parser.add_argument("--json", action="store_true", help="JSON çıktı")
+    parser.add_argument("--verbose", action="store_true", help="bot loglarını gizleme")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        result = replay(args.files, args.show)
+    elapsed = time.perf_counter() - started
+    result["elapsed_seconds"] = round(elapsed, 3)
+    result["events_per_second"] = round(result["events"] / elapsed) if elapsed > 0 else None
+
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        _print_diffs(result["diffs"])
+        print(
+            f"{result['events']} events in {result['elapsed_seconds']}s "
+            f"({result['events_per_second']}/s), {result['mismatched']} with different commands"
+        )
+        print("by kind: " + ", ".join(f"{k}={n}" for k, n in sorted(result["by_kind"].items())))
+    return 1 if result["mismatched"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
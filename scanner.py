@@ -0,0 +1,199 @@
+"""Çoklu sembol piyasa tarayıcısı (precision / miktar uygunluğu).
+
+Tek bir ``exchangeInfo`` ve tek bir ``ticker/price`` çağrısıyla tüm evreni
+yükler, snapshot olarak diske yazar ve bot ile aynı filtre yardımcılarıyla
+(``exchange_filters.parse_symbol_info``, ``floor_quantity``) her sembol için
+bot_config.json'daki margin * kaldıraç ile açılacak miktarı hesaplar. Miktarı
+sıfıra düşen veya MIN_NOTIONAL / minQty altında kalan semboller işaretlenir.
+``bot`` import edilmez; tarama config yazmaz, servis başlatmaz.
+
+Kullanım
+--------
+* ``python scanner.py --refresh``            borsadan yeni snapshot çek ve tara
+* ``python scanner.py``                      kayıtlı snapshot ile offline tara
+* ``python scanner.py --symbols RUNEUSDT FILUSDT --margin 5 --leverage 20``
+* ``python scanner.py --problems --json``    sadece sorunlu semboller, JSON çıktı
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from exchange_filters import SYMBOL_ALIASES, floor_quantity, format_quantity, parse_symbol_info
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_FILE = os.getenv("BOT_SCANNER_SNAPSHOT", os.path.join(HERE, "exchange_info_snapshot.json"))
+CONFIG_FILE = os.path.join(HERE, "bot_config.json")
+BASE_URL = os.getenv("BINANCE_BASE_URL", "https://fapi.binance.com")
+
+
+def fetch_snapshot() -> Dict[str, Any]:
+    """Tüm semboller için exchangeInfo + son fiyatlar (toplam 2 istek)."""
+    info = requests.get(BASE_URL + "/fapi/v1/exchangeInfo", timeout=20)
+    info.raise_for_status()
+    ticker = requests.get(BASE_URL + "/fapi/v1/ticker/price", timeout=20)
+    ticker.raise_for_status()
+    return {
+        "fetched_at": int(time.time()),
+        "exchangeInfo": info.json(),
+        "prices": {str(row["symbol"]).upper(): row["price"] for row in ticker.json()},
+    }
+
+
+def save_snapshot(snapshot: Dict[str, Any], path: str = SNAPSHOT_FILE) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str = SNAPSHOT_FILE) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_sizing(path: str = CONFIG_FILE) -> Callable[[str], Tuple[Decimal, int]]:
+    """bot_config.json'dan sembol -> (margin, kaldıraç); SYMBOL_OVERRIDES dahil, yoksa env/varsayılan."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    margin = Decimal(str(config.get("BOT_MARGIN_USDT", os.getenv("BOT_MARGIN_USDT", "5"))))
+    leverage = int(config.get("BOT_LEVERAGE", os.getenv("BOT_LEVERAGE", "20")))
+    overrides = {str(sym).upper(): fields for sym, fields in (config.get("SYMBOL_OVERRIDES") or {}).items()}
+
+    def sizing(symbol: str) -> Tuple[Decimal, int]:
+        fields = overrides.get(symbol.upper(), {})
+        return Decimal(str(fields.get("BOT_MARGIN_USDT", margin))), int(fields.get("BOT_LEVERAGE", leverage))
+
+    return sizing
+
+
+def _default_universe(infos: Dict[str, Dict[str, Any]]) -> List[str]:
+    return sorted(
+        sym
+        for sym, info in infos.items()
+        if info.get("quoteAsset", "USDT") == "USDT" and info.get("contractType", "PERPETUAL") == "PERPETUAL"
+    )
+
+
+def scan(
+    snapshot: Dict[str, Any],
+    symbols: Optional[Iterable[str]] = None,
+    margin: Optional[Decimal] = None,
+    leverage: Optional[int] = None,
+    sizing: Optional[Callable[[str], Tuple[Decimal, int]]] = None,
+) -> List[Dict[str, Any]]:
+    """Her sembol için miktar/notional hesapla; ``issues`` boşsa sembol işlem açılabilir."""
+    sizing = sizing or load_sizing()
+    infos = {str(item.get("symbol")).upper(): item for item in snapshot["exchangeInfo"].get("symbols", [])}
+    prices = {sym.upper(): Decimal(str(p)) for sym, p in snapshot.get("prices", {}).items()}
+    targets = [s.upper() for s in symbols] if symbols else _default_universe(infos)
+
+    rows: List[Dict[str, Any]] = []
+    for sym in targets:
+        resolved = SYMBOL_ALIASES.get(sym, sym)
+        row: Dict[str, Any] = {"symbol": sym, "resolved": resolved, "issues": []}
+        rows.append(row)
+        info = infos.get(resolved)
+        if info is None:
+            row["issues"].append("not_listed")
+            continue
+        if info.get("status", "TRADING") != "TRADING":
+            row["issues"].append(f"status_{str(info['status']).lower()}")
+        try:
+            precision = parse_symbol_info(info)
+        except RuntimeError:
+            row["issues"].append("missing_filters")
+            continue
+        price = prices.get(resolved)
+        if not price or price <= 0:
+            row["issues"].append("no_price")
+            continue
+
+        config_margin, config_leverage = sizing(sym)
+        sym_margin = margin if margin is not None else config_margin
+        sym_leverage = leverage if leverage is not None else config_leverage
+        qty = floor_quantity(sym_margin * Decimal(sym_leverage) / price, precision)
+        notional = qty * price
+        min_notional = precision["minNotional"]
+        min_qty = precision["minQty"]
+        step = precision["marketStepSize"] if precision["marketStepSize"] > 0 else precision["stepSize"]
+        # En küçük geçerli emir: min notional ile bir adım (ya da minQty) miktarının büyüğü.
+        required_notional = max(min_notional, max(step, min_qty) * price)
+
+        row.update(
+            price=price,
+            margin=sym_margin,
+            leverage=sym_leverage,
+            step=step,
+            qty=qty,
+            qty_str=format_quantity(qty, precision),
+            notional=notional,
+            min_notional=min_notional,
+            min_margin=required_notional / Decimal(sym_leverage),
+        )
+        if qty <= 0:
+            row["issues"].append("zero_qty")
+        elif qty < min_qty:
+            row["issues"].append("below_min_qty")
+        if qty > 0 and notional < min_notional:
+            row["issues"].append("below_min_notional")
+    return rows
+
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'SYMBOL':<16}{'PRICE':>14}{'STEP':>12}{'QTY':>16}{'NOTIONAL':>12}{'MIN_NOT':>10}{'MIN_MARGIN':>12}  ISSUES")
+    for row in rows:
+        if "qty" not in row:
+            print(f"{row['symbol']:<16}{'-':>14}{'-':>12}{'-':>16}{'-':>12}{'-':>10}{'-':>12}  {','.join(row['issues'])}")
+            continue
+        print(
+            f"{row['symbol']:<16}{row['price']:>14}{row['step']:>12}{row['qty_str']:>16}"
+            f"{row['notional']:>12.2f}{row['min_notional']:>10}{row['min_margin']:>12.2f}  {','.join(row['issues']) or 'ok'}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sembol evreni için miktar / MIN_NOTIONAL uygunluk taraması")
+    parser.add_argument("--refresh", action="store_true", help="borsadan yeni snapshot çek")
+    parser.add_argument("--snapshot", default=SNAPSHOT_FILE, help="snapshot dosyası")
+    parser.add_argument("--symbols", nargs="*", help="varsayılan: snapshot'taki tüm USDT perpetual'lar")
+    parser.add_argument("--margin", type=Decimal, help="varsayılan: bot config (sembol override'ları dahil)")
+    parser.add_argument("--leverage", type=int, help="varsayılan: bot config (sembol override'ları dahil)")
+    parser.add_argument("--problems", action="store_true", help="sadece sorunlu sembolleri göster")
+    parser.add_argument("--json", action="store_true", help="JSON çıktı")
+    args = parser.parse_args(argv)
+
+    if args.refresh or not os.path.exists(args.snapshot):
+        snapshot = fetch_snapshot()
+        save_snapshot(snapshot, args.snapshot)
+        print(f"[SCANNER] snapshot saved: {args.snapshot} ({len(snapshot['exchangeInfo'].get('symbols', []))} symbols)", file=sys.stderr)
+    else:
+        snapshot = load_snapshot(args.snapshot)
+        age = int(time.time()) - int(snapshot.get("fetched_at", 0))
+        print(f"[SCANNER] offline snapshot {args.snapshot} (age {age}s)", file=sys.stderr)
+
+    rows = scan(snapshot, args.symbols, args.margin, args.leverage)
+    if args.problems:
+        rows = [row for row in rows if row["issues"]]
+    if args.json:
+        print(json.dumps(rows, default=str, indent=2))
+    else:
+        _print_table(rows)
+        flagged = sum(1 for row in rows if row["issues"])
+        print(f"\n{len(rows)} symbols, {flagged} flagged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
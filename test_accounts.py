@@ -0,0 +1,54 @@
+"""Alarmın ``accounts`` alanı: str tek hesap, bilinmeyen ad 400, seçim yalnızca FANOUT_ACCOUNTS açıkken."""
+import pytest
+
+import bot
+
+ALICE = bot.AccountContext("alice", "k1", "s1")
+BOB = bot.AccountContext("bob", "k2", "s2")
+
+
+@pytest.fixture
+def fanout(monkeypatch):
+    monkeypatch.setattr(bot, "get_accounts", lambda: [bot.PRIMARY_ACCOUNT, ALICE, BOB])
+    monkeypatch.setattr(bot, "FANOUT_ACCOUNTS", True)
+
+
+def test_string_selects_one_account(fanout):
+    accounts, is_fanout = bot.select_accounts({"accounts": "alice"})
+    assert [acc.name for acc in accounts] == ["alice"]
+    assert is_fanout
+
+
+def test_list_is_deduplicated_in_order(fanout):
+    accounts, _ = bot.select_accounts({"accounts": ["bob", "alice", "bob"]})
+    assert [acc.name for acc in accounts] == ["bob", "alice"]
+
+
+@pytest.mark.parametrize("requested", [["alice", "mallory"], "mallory", [1], {"alice": 1}])
+def test_unknown_or_invalid_names_are_rejected(fanout, requested):
+    with pytest.raises(ValueError):
+        bot.select_accounts({"accounts": requested})
+
+
+def test_selection_disabled_without_fanout(monkeypatch):
+    monkeypatch.setattr(bot, "FANOUT_ACCOUNTS", False)
+    with pytest.raises(ValueError, match="disabled"):
+        bot.select_accounts({"accounts": ["alice"]})
+    assert bot.select_accounts({}) == ([bot.PRIMARY_ACCOUNT], False)
+
+
+def test_webhook_rejects_unknown_account_before_dedup(fanout):
+    alert = {"ticker": "BTCUSDT", "dir": "LONG", "entry": "100", "accounts": "mallory"}
+    body, status = bot.execute_signal(alert)
+    assert status == 400
+    assert "mallory" in body["msg"]
+
+
+@pytest.mark.parametrize("raw, expected", [("false", False), ("0", False), ("true", True), (1, True)])
+def test_fanout_flag_parsed_strictly(raw, expected):
+    assert bot.validate_config({"FANOUT_ACCOUNTS": raw})["FANOUT_ACCOUNTS"] is expected
+
+
+def test_fanout_flag_rejects_ambiguous_value():
+    with pytest.raises(ValueError):
+        bot.validate_config({"FANOUT_ACCOUNTS": "sometimes"})
@@ -0,0 +1,28 @@
+"""asyncio backend + TEST_MODE: paper borsa çağrıları event loop thread'inde çalışmaz."""
+import asyncio
+import threading
+
+import pytest
+
+import bot
+
+
+def test_paper_handle_runs_off_the_event_loop(paper, monkeypatch):
+    pytest.importorskip("aiohttp")
+    threads = []
+    real_handle = paper.handle
+
+    def recording_handle(*args):
+        threads.append(threading.current_thread())
+        return real_handle(*args)
+
+    monkeypatch.setattr(paper, "handle", recording_handle)
+    client = bot.AsyncExchangeClient()
+
+    async def call():
+        status, data = await client.signed(bot.PRIMARY_ACCOUNT, "GET", "/fapi/v1/openOrders", {"symbol": "BTCUSDT"})
+        return status, data, threading.current_thread()
+
+    status, data, loop_thread = asyncio.run(call())
+    assert (status, data) == (200, [])
+    assert threads and threads[0] is not loop_thread
@@ -0,0 +1,77 @@
+"""/api/config: JSON nesnesi olmayan gövde 400; varsayılanların tek kaynağı DEFAULT_CONFIG."""
+import json
+import os
+
+import pytest
+
+import bot
+from conftest import make_state
+
+# apply_config'in yazdığı global'ler; testten sonra eski değerlerine döner.
+APPLIED = [
+    "DEFAULT_LEVERAGE", "BOT_MARGIN_USDT", "DAILY_MAX_LOSS", "INITIAL_SL_ROE", "USE_DYNAMIC_PRECISION",
+    "WATCH_INTERVAL_SECONDS", "SYMBOL_OVERRIDES", "FANOUT_ACCOUNTS", "SIGNAL_DEDUP_TTL_SECONDS", "RISK_LIMITS",
+    "TEST_MODE", "SIZING", "SIZING_TABLE", "SIZING_DEFAULT", "TP_LADDER", "SL_DEBOUNCE", "WATCH_ADAPTIVE",
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(bot, "_background_started", True)
+    with bot.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["user"] = {"username": "admin", "role": "admin"}
+        yield client
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", '"TEST_MODE"', "42", "not json"])
+def test_non_object_body_is_rejected(client, body):
+    resp = client.post("/api/config", data=body, content_type="application/json")
+    assert resp.status_code == 400
+    assert resp.get_json()["status"] == "error"
+
+
+def test_store_defaults_come_from_default_config():
+    defaults = bot.ConfigStore._defaults()
+    assert defaults == bot.DEFAULT_CONFIG
+    defaults["RISK_LIMITS"]["MAX_OPEN_POSITIONS"] = 1
+    assert bot.DEFAULT_CONFIG["RISK_LIMITS"] == {}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    for name in APPLIED:
+        monkeypatch.setattr(bot, name, getattr(bot, name))
+    store = bot.ConfigStore(tmp_path / "bot_config.json")
+    store.load()
+    with bot.state_lock:
+        bot.open_positions["BTCUSDT:LONG"] = make_state("BTCUSDT", "LONG")
+    yield store
+    with bot.state_lock:
+        bot.open_positions.clear()
+
+
+def _on_disk(store):
+    return json.loads(store._path.read_text(encoding="utf-8"))
+
+
+def test_test_mode_flip_with_open_positions_is_rejected(store):
+    running = bot.TEST_MODE
+    before = _on_disk(store)
+    with pytest.raises(ValueError, match="TEST_MODE"):
+        store.update({"TEST_MODE": not running, "BOT_LEVERAGE": 7})
+    assert bot.TEST_MODE is running
+    assert _on_disk(store) == before
+    assert store.get()["TEST_MODE"] is running
+
+
+def test_flip_written_by_another_process_is_reverted_on_disk(store):
+    running = bot.TEST_MODE
+    foreign = dict(_on_disk(store), TEST_MODE=not running, BOT_LEVERAGE=7)
+    store._path.write_text(json.dumps(foreign), encoding="utf-8")
+    os.utime(store._path, ns=(0, 1))  # mtime farklı olsun
+    assert store.refresh()
+    assert bot.TEST_MODE is running
+    assert bot.DEFAULT_LEVERAGE == 7  # diğer alanlar uygulanır
+    assert _on_disk(store)["TEST_MODE"] is running
+    assert store.get()["TEST_MODE"] is running
@@ -0,0 +1,76 @@
+"""SL_DEBOUNCE zamanlaması: bekletme kararları paper/replay saatine göre verilir."""
+import contextlib
+import io
+from decimal import Decimal
+
+import pytest
+
+import bot
+import paper_replay
+
+SETTINGS = {**bot.SL_DEBOUNCE_DEFAULTS, "MIN_INTERVAL_SECONDS": 5}
+
+
+def _decision(stop="101"):
+    return {"stop_price": Decimal(stop), "peak_roe": Decimal("10"), "move": True}
+
+
+def test_interval_hold_uses_given_clock():
+    state = {"sl": Decimal("100"), "sl_ts": 1000.0, "peak_roe": Decimal("10")}
+    assert bot.plan_stop_debounce(state, _decision(), 1004.9, SETTINGS, Decimal("0.01")) == "interval"
+    assert bot.plan_stop_debounce(state, _decision(), 1005.0, SETTINGS, Decimal("0.01")) is None
+
+
+def test_position_without_stop_is_never_held():
+    state = {"sl": Decimal("0"), "sl_ts": 1000.0}
+    assert bot.plan_stop_debounce(state, _decision(), 1000.0, SETTINGS, Decimal("0.01")) is None
+
+
+def _events():
+    events = [{"ts": 1000, "symbol": "BTCUSDT", "price": 100}, {"ts": 1001, "alert": {"ticker": "BTCUSDT", "dir": "LONG", "entry": 100}}]
+    price = 100.0
+    for i in range(300):
+        price += 0.05 if i % 7 else -0.08
+        events.append({"ts": 1010 + i * 10, "symbol": "BTCUSDT", "price": round(price, 2)})
+    return events
+
+
+@pytest.fixture
+def replay_moves(paper, monkeypatch):
+    monkeypatch.setattr(bot, "POSITION_BATCH_WINDOW_SECONDS", bot.POSITION_BATCH_WINDOW_SECONDS)
+    monkeypatch.setattr(bot, "POSITION_CACHE_MAX_AGE_SECONDS", bot.POSITION_CACHE_MAX_AGE_SECONDS)
+    placed = []
+    original = bot.place_stop_loss_close
+    monkeypatch.setattr(bot, "place_stop_loss_close", lambda *args: placed.append(args) or original(*args))
+
+    def run(debounce):
+        monkeypatch.setattr(bot, "SL_DEBOUNCE", debounce)
+        placed.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            paper_replay.replay(_events())
+        return len(placed), bot.open_positions["BTCUSDT:LONG"]["sl"]
+
+    return run
+
+
+def test_replay_interval_shorter_than_ticks_changes_nothing(replay_moves):
+    baseline = replay_moves({})
+    assert baseline[0] > 10
+    assert replay_moves({"MIN_INTERVAL_SECONDS": 5}) == baseline
+
+
+def test_replay_interval_longer_than_ticks_thins_moves(replay_moves):
+    moves, _sl = replay_moves({})
+    held, _sl = replay_moves({"MIN_INTERVAL_SECONDS": 120})
+    assert 0 < held < moves
+    assert bot.open_positions["BTCUSDT:LONG"]["sl_avoided"]["interval"] > 0
+
+
+@pytest.mark.parametrize("raw, expected", [("false", False), ("0", False), ("true", True), (1, True)])
+def test_skip_rungs_parsed_strictly(raw, expected):
+    assert bot.validate_config({"SL_DEBOUNCE": {"SKIP_RUNGS": raw}})["SL_DEBOUNCE"]["SKIP_RUNGS"] is expected
+
+
+def test_skip_rungs_rejects_ambiguous_value():
+    with pytest.raises(ValueError, match="SKIP_RUNGS"):
+        bot.validate_config({"SL_DEBOUNCE": {"SKIP_RUNGS": "off"}})
@@ -0,0 +1,61 @@
+"""SignalDeduper: anahtar seçimi, kaydın kendi bitiş anı ve başarısız yürütmede bırakma."""
+import time
+
+import pytest
+
+import bot
+
+ALERT = {"ticker": "BTCUSDT", "dir": "LONG", "entry": "100", "id": "a-1"}
+
+
+@pytest.mark.parametrize(
+    "data, ident",
+    [
+        ({"id": "x", "client_id": "c", "time": "t", "entry": "1"}, "x"),
+        ({"client_id": "c", "time": "t", "entry": "1"}, "c"),
+        ({"time": "t", "entry": "1"}, "t"),
+        ({"entry": "1"}, "entry=1"),
+    ],
+)
+def test_key_falls_back_from_id_to_entry(data, ident):
+    assert bot.SignalDeduper.key_for(data, "BTCUSDT", "LONG") == f"BTCUSDT|LONG|{ident}"
+
+
+def test_order_scope_is_unique_only_for_entry_keys():
+    assert bot.SignalDeduper.order_scope({"id": "x"}, "k") == "k"
+    first = bot.SignalDeduper.order_scope({"entry": "1"}, "k")
+    assert first.startswith("k|") and first != bot.SignalDeduper.order_scope({"entry": "1"}, "k")
+
+
+def test_claim_until_own_expiry_after_ttl_change(monkeypatch):
+    deduper = bot.SignalDeduper()
+    monkeypatch.setattr(bot, "SIGNAL_DEDUP_TTL_SECONDS", 60.0)
+    assert deduper.claim("old")
+    monkeypatch.setattr(bot, "SIGNAL_DEDUP_TTL_SECONDS", 0.01)
+    assert deduper.claim("new")
+    assert not deduper.claim("new")
+    time.sleep(0.02)
+    assert deduper.claim("new")  # uzun ömürlü "old" önünde dursa da süresi doldu
+    assert not deduper.claim("old")
+    assert deduper.stats()["hits"] == 2
+
+
+@pytest.fixture
+def dispatch(monkeypatch):
+    replies = []
+    monkeypatch.setattr(bot, "signal_deduper", bot.SignalDeduper())
+    monkeypatch.setattr(bot, "SIGNAL_DEDUP_TTL_SECONDS", 60.0)
+    monkeypatch.setattr(bot, "FANOUT_ACCOUNTS", False)
+    monkeypatch.setattr(bot, "_dispatch_signal", lambda *args: replies.pop(0))
+    return replies
+
+
+@pytest.mark.parametrize("status, released", [(500, True), (429, True), (403, False), (200, False)])
+def test_failed_execution_releases_the_key(dispatch, status, released):
+    dispatch.extend([({"status": "x"}, status), ({"status": "ok"}, 200)])
+    assert bot.execute_signal(dict(ALERT))[1] == status
+    body, code = bot.execute_signal(dict(ALERT))
+    if released:
+        assert code == 200 and body["status"] == "ok"
+    else:
+        assert body == {"status": "ignored", "reason": "duplicate_signal"}
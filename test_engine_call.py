@@ -0,0 +1,40 @@
+"""client modu: "signal" cevabı scheduler bekleme süresinden uzun beklenir, böylece 202 "queued" kaybolmaz."""
+import pytest
+
+import bot
+
+
+class FakeConnection:
+    def __init__(self, reply):
+        self.reply = reply
+        self.polled = []
+
+    def send(self, message):
+        self.sent = message
+
+    def poll(self, timeout):
+        self.polled.append(timeout)
+        return True
+
+    def recv(self):
+        return self.reply
+
+
+@pytest.fixture
+def client_mode(monkeypatch):
+    conn = FakeConnection(({"status": "queued"}, 202))
+    monkeypatch.setattr(bot, "ENGINE_MODE", "client")
+    monkeypatch.setattr(bot, "_engine_connection", lambda: conn)
+    monkeypatch.setattr(bot, "SCHEDULER_WAIT_SECONDS", 60.0)
+    monkeypatch.setattr(bot, "ENGINE_TIMEOUT_SECONDS", 30.0)
+    return conn
+
+
+def test_signal_waits_past_scheduler_deadline(client_mode):
+    assert bot.engine_call("signal", {}) == ({"status": "queued"}, 202)
+    assert client_mode.polled == [90.0]
+
+
+def test_other_commands_use_engine_timeout(client_mode):
+    bot.engine_call("stats")
+    assert client_mode.polled == [30.0]
@@ -0,0 +1,89 @@
+"""Event log: kayıtlar aynen geri okunur ve replay canlı motorun komutlarını yeniden üretir."""
+from decimal import Decimal
+
+import pytest
+
+import bot
+import replay
+
+PRECISION = {**bot.fallback_precision(), "tickSize": Decimal("0.1"), "stepSize": Decimal("0.001")}
+KEY = "BTCUSDT:LONG"
+DEBOUNCE = {"MIN_INTERVAL_SECONDS": 5.0, "MIN_TICKS": 2, "SKIP_RUNGS": True, "MAX_HOLD_SECONDS": 30.0}
+
+
+@pytest.fixture
+def log(tmp_path):
+    event_log = bot.EventLog(str(tmp_path))
+    event_log.enabled = True
+    yield event_log
+    event_log.close()
+
+
+def _fill():
+    return {
+        "state_key": KEY,
+        "account": "default",
+        "symbol": "BTCUSDT",
+        "side": "BUY",
+        "position_side": "LONG",
+        "entry": Decimal("100"),
+        "qty": Decimal("1"),
+        "leverage": 10,
+        "margin": Decimal("10"),
+        "initial_sl_roe": Decimal("-50"),
+        "tp_ladder": [],
+        "precision": PRECISION,
+    }
+
+
+def _mark(mark, debounce=None):
+    return {"state_key": KEY, "amt": Decimal("1"), "mark": Decimal(mark), "initial_sl_roe": Decimal("-50"), "debounce": debounce}
+
+
+def test_mark_record_round_trip(log):
+    stop = [{"cmd": "stop", "state_key": KEY, "price": Decimal("103.5"), "roe": Decimal("35")}]
+    log.record("mark", _mark("104.2", DEBOUNCE), stop, ts=1_000.5)
+    log.record("mark", _mark("104.3"), [], ts=1_001.0)
+    log.record("closed", {"state_key": KEY}, ts=1_002.0)
+    log.close()
+
+    events = list(bot.read_events(str(log.path_for("19700101"))))
+    assert [(kind, ts) for kind, ts, _ in events] == [("mark", 1_000.5), ("mark", 1_001.0), ("closed", 1_002.0)]
+    first, second = events[0][2], events[1][2]
+    assert (first["amt"], first["mark"], first["initial_sl_roe"]) == ("1", "104.2", "-50")
+    assert first["out"] == [{"cmd": "stop", "state_key": KEY, "price": "103.5", "roe": "35"}]
+    assert first["debounce"] == DEBOUNCE
+    assert second["out"] == [] and "debounce" not in second
+    assert events[2][2] == {"state_key": KEY, "out": []}
+
+
+def test_truncated_tail_is_ignored(log):
+    log.record("closed", {"state_key": KEY}, ts=10.0)
+    log.record("closed", {"state_key": "ETHUSDT:LONG"}, ts=11.0)
+    log.close()
+    path = log.path_for("19700101")
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [event["state_key"] for _, _, event in bot.read_events(str(path))] == [KEY]
+
+
+def test_replay_reproduces_recorded_commands(log):
+    live = {}
+
+    def record(kind, event, ts):
+        out = bot.core_apply(live, kind, dict(event, ts=ts))
+        log.record(kind, event, out, ts=ts)
+        return out
+
+    assert record("fill", _fill(), 100.0)[0]["cmd"] == "stop"
+    for i, mark in enumerate(["101", "104", "108", "107", "112"]):
+        out = record("mark", _mark(mark, DEBOUNCE if i % 2 else None), 101.0 + 10 * i)
+        for command in out:
+            record("stop", {"state_key": KEY, "price": command["price"], "roe": command["roe"], "ok": True}, 102.0 + 10 * i)
+    record("closed", {"state_key": KEY}, 200.0)
+    log.close()
+
+    result = replay.replay([str(log.path_for("19700101"))])
+    assert result["mismatched"] == 0, result["diffs"]
+    assert result["by_kind"]["mark"] == 5
+    assert result["by_kind"]["stop"] >= 1  # en az bir trailing hareketi kaydedildi
+    assert result["open_at_end"] == []
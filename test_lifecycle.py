@@ -0,0 +1,101 @@
+"""Lifecycle: checkpoint yazma/yükleme, diğer TEST_MODE'un checkpoint'i ve kapanış sırası."""
+import json
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+import bot
+from conftest import make_state
+
+KEY = "BTCUSDT:LONG"
+LEGS = [
+    {"cid": "fb-tp0", "price": Decimal("110.5"), "qty": Decimal("0.25"), "roe": Decimal("200"), "status": "open"},
+    {"cid": "fb-tp1", "price": Decimal("121"), "qty": Decimal("0.25"), "roe": Decimal("400"), "status": "filled"},
+]
+
+
+@pytest.fixture
+def checkpoint(paper, tmp_path, monkeypatch):
+    path = tmp_path / "state_checkpoint.json"
+    monkeypatch.setattr(bot, "CHECKPOINT_FILE", path)
+    started = []
+    monkeypatch.setattr(bot, "_start_watcher", lambda state_key, delay=2.0: started.append((state_key, delay)))
+    monkeypatch.setitem(bot.PrecisionCache._cache, "BTCUSDT", {**bot.fallback_precision(), "tickSize": Decimal("0.1")})
+    return path, started
+
+
+def _hold_position():
+    state = make_state("BTCUSDT", "LONG", sl=Decimal("99.5"), peak_roe=Decimal("12.5"), tp=LEGS, watch_interval=1.5)
+    with bot.state_lock:
+        bot.open_positions[KEY] = state
+    return dict(state)
+
+
+def _forget_positions():
+    with bot.state_lock:
+        bot.open_positions.clear()
+    bot.risk_book.reset()
+
+
+def test_checkpoint_round_trip(checkpoint):
+    path, started = checkpoint
+    original = _hold_position()
+    assert bot.Lifecycle().write_checkpoint()["positions"] == 1
+    assert json.loads(path.read_text())["positions"][KEY]["sl"] == "99.5"
+    _forget_positions()
+    bot.PrecisionCache._cache.pop("BTCUSDT")
+
+    lifecycle = bot.Lifecycle()
+    assert lifecycle.restore() == 1
+    with bot.state_lock:
+        restored = dict(bot.open_positions[KEY])
+    assert restored == original
+    assert isinstance(restored["tp"][0]["price"], Decimal)
+    assert bot.PrecisionCache._cache["BTCUSDT"]["tickSize"] == Decimal("0.1")
+    assert started == [(KEY, 0)]
+    assert bot.risk_book.snapshot()["open_positions"] == 1
+    # Aynı dosya ikinci kez yüklenmez.
+    assert not path.exists() and path.with_name(path.name + ".loaded").exists()
+    assert bot.Lifecycle().restore() == 0
+
+
+def test_checkpoint_from_other_test_mode_is_not_loaded(checkpoint, monkeypatch):
+    path, started = checkpoint
+    _hold_position()
+    bot.Lifecycle().write_checkpoint()
+    _forget_positions()
+    monkeypatch.setattr(bot, "TEST_MODE", False)
+    assert bot.Lifecycle().restore() == 0
+    assert path.exists()
+    assert started == [] and not bot.open_positions
+
+
+def test_shutdown_drains_order_work_before_checkpoint(checkpoint, monkeypatch):
+    path, _started = checkpoint
+    scheduler = bot.SignalScheduler(workers=1, max_queue=10)
+    monkeypatch.setattr(bot, "signal_scheduler", scheduler)
+    monkeypatch.setattr(bot, "SHUTDOWN_DRAIN_SECONDS", 5.0)
+    monkeypatch.setattr(bot.event_log, "close", lambda: None)
+    release = threading.Event()
+
+    def entry():
+        assert release.wait(5)
+        _hold_position()  # çalışan emir işi pozisyonu kapanıştan önce açar
+
+    scheduler.submit(bot.PRIORITY_ENTRY, KEY, entry)
+    lifecycle = bot.Lifecycle()
+    shutdown = threading.Thread(target=lifecycle.shutdown, args=("test",))
+    shutdown.start()
+    assert lifecycle.stopping.wait(5)
+    deadline = time.monotonic() + 5
+    while not scheduler.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with pytest.raises(bot.SchedulerClosed):
+        scheduler.submit(bot.PRIORITY_ENTRY, "late", lambda: None)
+    assert not path.exists()  # iş bitmeden checkpoint yazılmaz
+    release.set()
+    shutdown.join(5)
+    assert lifecycle.stopped.is_set() and lifecycle.drained
+    assert list(json.loads(path.read_text())["positions"]) == [KEY]
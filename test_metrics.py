@@ -0,0 +1,48 @@
+"""/metrics: artan toplamlar counter, anlık değerler gauge olarak yayınlanır."""
+import pytest
+
+import bot
+
+
+def _types(text):
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE"))
+
+
+def test_collector_kinds():
+    registry = bot.MetricsRegistry()
+    registry.add_collector(lambda: [("demo_hits_total", 3, {})], kind="counter")
+    registry.add_collector(lambda: [("demo_depth", 1, {})])
+    text = registry.render()
+    assert _types(text) == {"demo_hits_total": "counter", "demo_depth": "gauge"}
+    assert "demo_hits_total 3" in text
+    with pytest.raises(ValueError):
+        registry.add_collector(lambda: [], kind="summary")
+
+
+def test_engine_totals_are_counters():
+    types = _types(bot.metrics.render())
+    for name in ("bot_signal_dedup_hits_total", "bot_position_cache_hits_total", "bot_position_batch_fetches_total"):
+        assert types[name] == "counter"
+    assert types["bot_signal_dedup_hit_ratio"] == "gauge"
+
+
+@pytest.fixture
+def web(monkeypatch):
+    monkeypatch.setattr(bot, "_background_started", True)
+    with bot.app.test_client() as client:
+        yield client
+
+
+def test_metrics_require_login_without_token(web, monkeypatch):
+    monkeypatch.setattr(bot, "METRICS_TOKEN", "")
+    assert web.get("/metrics").status_code == 401
+    with web.session_transaction() as sess:
+        sess["user"] = {"username": "admin", "role": "admin"}
+    resp = web.get("/metrics")
+    assert resp.status_code == 200 and b"# TYPE" in resp.data
+
+
+def test_metrics_accept_bearer_token(web, monkeypatch):
+    monkeypatch.setattr(bot, "METRICS_TOKEN", "s3cret")
+    assert web.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert web.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
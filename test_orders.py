@@ -0,0 +1,98 @@
+"""clientOrderId idempotency: belirsiz sonuçtan sonra önce sorgu, emir yoksa aynı id ile tekrar."""
+import pytest
+import requests
+
+import bot
+
+QUERY_ORDER = bot._query_order
+PAYLOAD = {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET", "quantity": "1", "newClientOrderId": "fb-idem"}
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    """POST'lar ``sent``'e düşer; cevaplar ve sorgu sonuçları sırayla ``posts``/``queries``'den gelir."""
+    sent, posts, queries = [], [], []
+
+    def fake_signed(method, path, params, timeout=None):
+        sent.append(dict(params))
+        reply = posts.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return FakeResponse(*reply)
+
+    def fake_query(symbol, client_id, label):
+        reply = queries.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(bot, "_signed_request", fake_signed)
+    monkeypatch.setattr(bot, "_query_order", fake_query)
+    monkeypatch.setattr(bot, "ORDER_RECV_WINDOW_MS", -250)  # recvWindow beklemesi yok
+    monkeypatch.setattr(bot, "order_tracker", bot.OrderTracker())
+    return sent, posts, queries
+
+
+def test_timed_out_order_found_by_query_is_not_resent(exchange):
+    sent, posts, queries = exchange
+    posts.append(requests.Timeout("read timeout"))
+    queries.append({"orderId": 7, "status": "FILLED", "clientOrderId": "fb-idem"})
+    order = bot._submit_order(PAYLOAD, "ENTRY")
+    assert order["orderId"] == 7
+    assert len(sent) == 1
+    assert bot.order_tracker.get("fb-idem")["state"] == "acked"
+
+
+def test_missing_order_is_resent_with_same_client_id(exchange):
+    sent, posts, queries = exchange
+    posts.extend([(503, {"msg": "busy"}), (200, {"orderId": 8, "status": "NEW"})])
+    queries.append(None)
+    order = bot._submit_order(PAYLOAD, "ENTRY")
+    assert order["orderId"] == 8
+    assert [p["newClientOrderId"] for p in sent] == ["fb-idem", "fb-idem"]
+    assert bot.order_tracker.get("fb-idem")["attempts"] == 2
+
+
+def test_failed_query_is_retried_before_resending(exchange):
+    sent, posts, queries = exchange
+    posts.append(requests.ConnectionError("reset"))
+    queries.extend([requests.ConnectionError("still down"), {"orderId": 9, "status": "NEW"}])
+    assert bot._submit_order(PAYLOAD, "ENTRY")["orderId"] == 9
+    assert len(sent) == 1
+
+
+@pytest.mark.parametrize("reply", [(503, {"msg": "busy"}), (400, {"code": -1001, "msg": "Internal error"})])
+def test_unknown_query_reply_is_retried_before_resending(exchange, monkeypatch, reply):
+    sent, posts, _queries = exchange
+    posts.append(requests.Timeout("read timeout"))
+    gets = [reply, (200, {"orderId": 10, "status": "FILLED", "executedQty": "1"})]
+
+    def fake_signed(method, path, params, timeout=None):
+        if method == "GET":
+            return FakeResponse(*gets.pop(0))
+        sent.append(dict(params))
+        raise posts.pop(0)
+
+    monkeypatch.setattr(bot, "_signed_request", fake_signed)
+    monkeypatch.setattr(bot, "_query_order", QUERY_ORDER)  # gerçek sorgu, sahte HTTP
+    assert bot._submit_order(PAYLOAD, "ENTRY")["orderId"] == 10
+    assert len(sent) == 1 and gets == []
+
+
+def test_rejection_is_not_retried(exchange):
+    sent, posts, _queries = exchange
+    posts.append((400, {"code": -2019, "msg": "Margin is insufficient."}))
+    with pytest.raises(RuntimeError):
+        bot._submit_order(PAYLOAD, "ENTRY")
+    assert len(sent) == 1
+    assert bot.order_tracker.get("fb-idem")["state"] == "rejected"
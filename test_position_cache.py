@@ -0,0 +1,51 @@
+"""PositionCache: emirden önce başlamış positionRisk sorgusu geçersiz kılmadan sonra saklanmaz."""
+import time
+
+import bot
+
+FLAT = [{"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0", "markPrice": "100"}]
+
+
+def test_fetch_started_before_invalidate_is_dropped():
+    cache = bot.PositionCache()
+    account = bot.PRIMARY_ACCOUNT
+    started = time.monotonic()
+    cache.invalidate("BTCUSDT", account=account)  # emir bu sırada gönderildi
+    cache.store(FLAT, started, ["BTCUSDT"], account=account)
+    assert cache.get("BTCUSDT", "LONG", account=account) is None
+
+
+def test_fetch_started_after_invalidate_is_cached():
+    cache = bot.PositionCache()
+    account = bot.PRIMARY_ACCOUNT
+    cache.invalidate("BTCUSDT", account=account)
+    cache.store(FLAT, time.monotonic(), ["BTCUSDT"], account=account)
+    assert cache.get("BTCUSDT", "LONG", account=account)["positionAmt"] == "0"
+    assert cache.get("BTCUSDT", "SHORT", account=account) == {}
+
+
+def test_rows_age_from_fetch_start(monkeypatch):
+    monkeypatch.setattr(bot, "POSITION_CACHE_MAX_AGE_SECONDS", 2.0)
+    cache = bot.PositionCache()
+    cache.store(FLAT, time.monotonic() - 3, ["BTCUSDT"], account=bot.PRIMARY_ACCOUNT)
+    assert cache.get("BTCUSDT", "LONG", account=bot.PRIMARY_ACCOUNT) is None
+
+
+def test_lone_request_does_not_wait_for_batch_window(paper):
+    paper.set_price("BTCUSDT", 100, time.time())
+    batcher = bot.PositionBatcher(0.5)
+    started = time.perf_counter()
+    bot.signal_scheduler.run(bot.PRIORITY_ENTRY, ("default", "BTCUSDT"), batcher.fetch, "BTCUSDT")
+    assert time.perf_counter() - started < 0.25
+    assert batcher.stats() == {"requests": 1, "fetches": 1}
+
+
+def test_concurrent_requests_share_one_fetch(paper):
+    batcher = bot.PositionBatcher(0.2)
+    jobs = [
+        bot.signal_scheduler.submit(bot.PRIORITY_ENTRY, ("default", sym), batcher.fetch, sym)
+        for sym in ("BTCUSDT", "ETHUSDT", "SOLUSDT")
+    ]
+    for job in jobs:
+        job.result(5)
+    assert batcher.stats() == {"requests": 3, "fetches": 1}
@@ -0,0 +1,64 @@
+"""Reconciler: borsadaki pozisyonu sahiplenme, kaybolanı düşürme, süren girişle yarış."""
+import threading
+import time
+
+import bot
+from conftest import make_state, open_paper_position
+
+
+def test_adopts_position_opened_outside_the_bot(paper):
+    open_paper_position(paper, "BTCUSDT", "LONG", "0.5")
+    counts = bot.reconciler.reconcile_account(bot.PRIMARY_ACCOUNT)
+    assert counts["adopted"] == 1
+    state = bot.open_positions["BTCUSDT:LONG"]
+    assert state["adopted"] and str(state["qty"]) == "0.5"
+    assert bot.reconciler.reconcile_account(bot.PRIMARY_ACCOUNT)["adopted"] == 0
+
+
+def test_drops_position_missing_on_exchange(paper):
+    bot.open_positions["BTCUSDT:LONG"] = make_state("BTCUSDT", "LONG", opened_ts=time.time() - 600)
+    counts = bot.reconciler.reconcile_account(bot.PRIMARY_ACCOUNT)
+    assert counts["stale"] == 1
+    assert "BTCUSDT:LONG" not in bot.open_positions
+
+
+def test_keeps_fresh_and_legacy_entries(paper):
+    bot.open_positions["BTCUSDT:LONG"] = make_state("BTCUSDT", "LONG", opened_ts=time.time())
+    bot.open_positions["ETHUSDT:LONG"] = make_state("ETHUSDT", "LONG")  # opened_ts yok
+    counts = bot.reconciler.reconcile_account(bot.PRIMARY_ACCOUNT)
+    assert counts["stale"] == 0
+    assert {"BTCUSDT:LONG", "ETHUSDT:LONG"} <= set(bot.open_positions)
+
+
+def test_resizes_partially_closed_position(paper):
+    open_paper_position(paper, "BTCUSDT", "LONG", "0.3")
+    bot.open_positions["BTCUSDT:LONG"] = make_state("BTCUSDT", "LONG", qty="0.5", opened_ts=time.time() - 600)
+    counts = bot.reconciler.reconcile_account(bot.PRIMARY_ACCOUNT)
+    assert counts["resized"] == 1
+    assert str(bot.open_positions["BTCUSDT:LONG"]["qty"]) == "0.3"
+
+
+def test_waits_for_inflight_entry_instead_of_adopting(paper):
+    account = bot.PRIMARY_ACCOUNT
+    filled, release = threading.Event(), threading.Event()
+
+    def entry():
+        # Market emri dolmuş, SL/TP yerleştiriliyor; state henüz yazılmadı.
+        open_paper_position(paper, "BTCUSDT", "LONG", "0.5")
+        filled.set()
+        release.wait(5)
+        with bot.state_lock:
+            bot.open_positions["BTCUSDT:LONG"] = make_state("BTCUSDT", "LONG", opened_ts=time.time(), entry_job=True)
+
+    job = bot.signal_scheduler.submit(bot.PRIORITY_ENTRY, (account.name, "BTCUSDT"), entry)
+    assert filled.wait(5)
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(bot.reconciler.reconcile_account(account)))
+    worker.start()
+    time.sleep(0.2)
+    assert "BTCUSDT:LONG" not in bot.open_positions
+    release.set()
+    worker.join(5)
+    job.result(5)
+    assert result["adopted"] == 0
+    assert bot.open_positions["BTCUSDT:LONG"]["entry_job"]
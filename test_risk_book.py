@@ -0,0 +1,39 @@
+"""RiskBook: check() geçen girişi aynı kilit altında rezerve eder."""
+from decimal import Decimal
+
+import bot
+from conftest import make_state
+
+LIMITS = {"MAX_OPEN_POSITIONS": 1}
+
+
+def _check(book, symbol, reserve=None):
+    return book.check(symbol, "LONG", Decimal("5"), Decimal("100"), Decimal("1"), reserve=reserve)
+
+
+def test_reservation_blocks_concurrent_entry(monkeypatch):
+    monkeypatch.setattr(bot, "RISK_LIMITS", LIMITS)
+    book = bot.RiskBook()
+    assert _check(book, "BTCUSDT", reserve="BTCUSDT:LONG") is None
+    assert _check(book, "ETHUSDT", reserve="ETHUSDT:LONG")[0] == "MAX_OPEN_POSITIONS"
+    assert book.snapshot()["reserved"] == 1
+
+
+def test_release_frees_failed_entry(monkeypatch):
+    monkeypatch.setattr(bot, "RISK_LIMITS", LIMITS)
+    book = bot.RiskBook()
+    _check(book, "BTCUSDT", reserve="BTCUSDT:LONG")
+    book.release("BTCUSDT:LONG")
+    assert book.snapshot()["total_margin"] == 0
+    assert _check(book, "ETHUSDT") is None
+
+
+def test_on_open_replaces_reservation(monkeypatch):
+    monkeypatch.setattr(bot, "RISK_LIMITS", LIMITS)
+    book = bot.RiskBook()
+    _check(book, "BTCUSDT", reserve="BTCUSDT:LONG")
+    book.on_open("BTCUSDT:LONG", make_state("BTCUSDT", "LONG", qty="1", entry="100"))
+    book.release("BTCUSDT:LONG")  # execute_signal'ın finally'si: artık etkisiz
+    snap = book.snapshot()
+    assert (snap["open_positions"], snap["reserved"]) == (1, 0)
+    assert snap["total_margin"] == 5.0
@@ -0,0 +1,120 @@
+"""SignalScheduler: anahtar başına seri yürütme, öncelik sırası, kuyruk sınırı ve drain."""
+import threading
+
+import pytest
+
+import bot
+
+TIMEOUT = 5
+
+
+class Gate:
+    """İlk işi ``release()``'e kadar tutar; başlayan işleri sırayla kaydeder."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.order = []
+
+    def hold(self, name):
+        self.order.append(name)
+        self.started.set()
+        assert self.released.wait(TIMEOUT)
+        return name
+
+    def record(self, name):
+        self.order.append(name)
+        return name
+
+    def release(self):
+        self.released.set()
+
+
+@pytest.fixture
+def gate():
+    gate = Gate()
+    yield gate
+    gate.release()
+
+
+def test_same_key_runs_serially_other_keys_in_parallel(gate):
+    scheduler = bot.SignalScheduler(workers=4, max_queue=10)
+    scheduler.submit(bot.PRIORITY_ENTRY, ("a", "BTCUSDT"), gate.hold, "first")
+    assert gate.started.wait(TIMEOUT)
+    second = scheduler.submit(bot.PRIORITY_ENTRY, ("a", "BTCUSDT"), gate.record, "second")
+    other = scheduler.submit(bot.PRIORITY_ENTRY, ("a", "ETHUSDT"), gate.record, "other")
+    assert other.result(TIMEOUT) == "other"
+    assert not second.done()
+    assert scheduler.stats()["keys_waiting"] == 1
+    gate.release()
+    assert second.result(TIMEOUT) == "second"
+    assert gate.order == ["first", "other", "second"]
+
+
+def test_exits_and_stops_run_before_entries(gate):
+    scheduler = bot.SignalScheduler(workers=1, max_queue=10)
+    scheduler.submit(bot.PRIORITY_ENTRY, "busy", gate.hold, "busy")
+    assert gate.started.wait(TIMEOUT)
+    futures = [
+        scheduler.submit(bot.PRIORITY_ENTRY, "k1", gate.record, "entry"),
+        scheduler.submit(bot.PRIORITY_STOP, "k2", gate.record, "stop"),
+        scheduler.submit(bot.PRIORITY_EXIT, "k3", gate.record, "exit"),
+    ]
+    gate.release()
+    for future in futures:
+        future.result(TIMEOUT)
+    assert gate.order == ["busy", "exit", "stop", "entry"]
+
+
+def test_parked_jobs_of_one_key_follow_priority(gate):
+    scheduler = bot.SignalScheduler(workers=2, max_queue=10)
+    scheduler.submit(bot.PRIORITY_ENTRY, "k", gate.hold, "busy")
+    assert gate.started.wait(TIMEOUT)
+    entry = scheduler.submit(bot.PRIORITY_ENTRY, "k", gate.record, "entry")
+    stop = scheduler.submit(bot.PRIORITY_STOP, "k", gate.record, "stop")
+    gate.release()
+    entry.result(TIMEOUT)
+    stop.result(TIMEOUT)
+    assert gate.order == ["busy", "stop", "entry"]
+
+
+def test_full_queue_rejects_entries_only(gate):
+    scheduler = bot.SignalScheduler(workers=1, max_queue=1)
+    scheduler.submit(bot.PRIORITY_ENTRY, "k", gate.hold, "busy")
+    assert gate.started.wait(TIMEOUT)
+    with pytest.raises(bot.SchedulerFull):
+        scheduler.submit(bot.PRIORITY_ENTRY, "k2", gate.record, "entry")
+    exit_job = scheduler.submit(bot.PRIORITY_EXIT, "k3", gate.record, "exit")
+    gate.release()
+    assert exit_job.result(TIMEOUT) == "exit"
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_closed_scheduler_keeps_accepting_stops():
+    scheduler = bot.SignalScheduler(workers=1, max_queue=10)
+    scheduler.close()
+    with pytest.raises(bot.SchedulerClosed):
+        scheduler.submit(bot.PRIORITY_ENTRY, "k", lambda: None)
+    assert scheduler.run(bot.PRIORITY_STOP, "k", lambda: "moved") == "moved"
+
+
+def test_drain_waits_for_running_and_queued_jobs(gate):
+    scheduler = bot.SignalScheduler(workers=1, max_queue=10)
+    scheduler.submit(bot.PRIORITY_ENTRY, "k", gate.hold, "busy")
+    queued = scheduler.submit(bot.PRIORITY_ENTRY, "k2", gate.record, "queued")
+    assert gate.started.wait(TIMEOUT)
+    assert scheduler.drain(0.1) is False
+    gate.release()
+    assert scheduler.drain(TIMEOUT) is True
+    assert queued.done() and scheduler.backlog() == 0
+
+
+def test_job_exception_reaches_the_caller():
+    scheduler = bot.SignalScheduler(workers=1, max_queue=10)
+
+    def boom():
+        raise ValueError("bad order")
+
+    with pytest.raises(ValueError, match="bad order"):
+        scheduler.run(bot.PRIORITY_ENTRY, "k", boom)
+    assert scheduler.drain(TIMEOUT)
@@ -0,0 +1,64 @@
+"""plan_size tavanları: alarm ipuçları profil notional'ının HINT_MAX_MULT katını geçemez."""
+from decimal import Decimal
+
+import pytest
+
+import bot
+
+PROFILE = bot.SizingProfile(Decimal("4"), 20, Decimal("0"), Decimal("-20"), Decimal("0"))
+
+
+def _plan(hints, **settings):
+    return bot.plan_size(PROFILE, hints, None, {**bot.SIZING_DEFAULTS, **settings})
+
+
+def test_hints_disabled_by_default():
+    assert bot.SIZING_DEFAULTS["ALLOW_HINTS"] is False
+
+
+def test_no_hints_uses_profile():
+    margin, leverage, detail = _plan({})
+    assert (margin, leverage) == (Decimal("4"), 20)
+    assert "hint_capped" not in detail
+
+
+def test_leverage_hint_capped_at_profile_leverage():
+    margin, leverage, detail = _plan({"leverage": 125, "margin": Decimal("1000"), "size": Decimal("5")})
+    assert leverage == 20
+    assert margin * leverage == Decimal("240")  # 3 x 80 USDT profil notional'ı
+    assert detail["leverage_capped"] and detail["hint_capped"]
+
+
+def test_configured_max_leverage_still_caps_notional():
+    margin, leverage, _ = _plan({"leverage": 125, "margin": Decimal("1000")}, HINT_MAX_LEVERAGE=50)
+    assert leverage == 50
+    assert margin * leverage == Decimal("240")
+
+
+def test_lower_leverage_hint_allowed():
+    margin, leverage, detail = _plan({"leverage": 10})
+    assert (margin, leverage) == (Decimal("4"), 10)
+    assert "leverage_capped" not in detail
+
+
+def test_max_notional_applies_after_hints():
+    profile = bot.SizingProfile(Decimal("4"), 20, Decimal("100"), Decimal("-20"), Decimal("0"))
+    margin, leverage, detail = bot.plan_size(profile, {"size": Decimal("2")}, None, dict(bot.SIZING_DEFAULTS))
+    assert margin * leverage == Decimal("100")
+    assert detail["notional_capped"]
+
+
+def test_validate_rejects_out_of_range_max_leverage():
+    with pytest.raises(ValueError):
+        bot._validate_sizing({"HINT_MAX_LEVERAGE": 200})
+
+
+@pytest.mark.parametrize("raw, expected", [("false", False), ("0", False), (0, False), (True, True), ("TRUE", True), (1, True)])
+def test_allow_hints_parsed_strictly(raw, expected):
+    assert bot.validate_config({"SIZING": {"ALLOW_HINTS": raw}})["SIZING"]["ALLOW_HINTS"] is expected
+
+
+@pytest.mark.parametrize("raw", ["no", "", 2, None, [1]])
+def test_allow_hints_rejects_ambiguous_values(raw):
+    with pytest.raises(ValueError, match="ALLOW_HINTS"):
+        bot.validate_config({"SIZING": {"ALLOW_HINTS": raw}})
@@ -0,0 +1,93 @@
+"""KlineCache yenileme hatasında geri çekilir; StrategySummary fiyatı bar önbelleğinden bağımsız okur."""
+import time
+from decimal import Decimal
+
+import pytest
+
+import bot
+
+HOUR_MS = 3_600_000
+
+
+class FakeResponse:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._rows
+
+
+def _recent_bars(count):
+    """Son bar'ı şu an açık olan ``count`` bar."""
+    open_ms = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+    return _bars(open_ms - (count - 1) * HOUR_MS, count)
+
+
+def _bars(start_ms, count, price=100.0):
+    return [[start_ms + i * HOUR_MS, price, price + 1, price - 1, price + i * 0.1, 10] for i in range(count)]
+
+
+@pytest.fixture
+def klines(monkeypatch):
+    calls = []
+    replies = []
+
+    def fake_get(path, params, timeout=10):
+        calls.append(params)
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return FakeResponse(reply)
+
+    monkeypatch.setattr(bot, "_public_get", fake_get)
+    monkeypatch.setattr(bot, "STRATEGY_RETRY_SECONDS", 5.0)
+    return calls, replies
+
+
+def test_failed_refresh_backs_off(klines):
+    calls, replies = klines
+    cache = bot.KlineCache("BTCUSDT", "1h", 50)
+    replies.append(ConnectionError("down"))
+    with pytest.raises(ConnectionError):
+        cache.refresh(now_ms=0)
+    with pytest.raises(RuntimeError, match="backoff"):
+        cache.refresh(now_ms=4_000)
+    assert len(calls) == 1
+
+    replies.append(ConnectionError("still down"))
+    with pytest.raises(ConnectionError):
+        cache.refresh(now_ms=5_000)
+    assert cache.retry_at_ms == 15_000  # 5 sn, sonra 10 sn
+
+    replies.append(_bars(0, 30))
+    assert cache.refresh(now_ms=15_000)
+    assert (cache.failures, cache.last_error) == (0, None)
+
+
+def test_current_price_is_live_not_bar_close(klines, monkeypatch):
+    _calls, replies = klines
+    replies.append(_recent_bars(30))
+    prices = iter([Decimal("123.5"), Decimal("124")])
+    monkeypatch.setattr(bot, "get_price", lambda symbol: next(prices))
+    monkeypatch.setattr(bot, "STRATEGY_PRICE_TTL_SECONDS", 0.0)
+    summary = bot.StrategySummary("BTCUSDT", "1h", 50)
+    first = summary.get()
+    assert (first["current_price"], first["price_source"]) == (123.5, "live")
+    assert summary.get()["current_price"] == 124.0
+
+
+def test_current_price_falls_back_to_bar_close(klines, monkeypatch):
+    _calls, replies = klines
+    replies.append(_recent_bars(30))
+
+    def broken(symbol):
+        raise ConnectionError("ticker down")
+
+    monkeypatch.setattr(bot, "get_price", broken)
+    summary = bot.StrategySummary("BTCUSDT", "1h", 50)
+    result = summary.get()
+    assert result["price_source"] == "bar"
+    assert result["current_price"] == pytest.approx(102.9)
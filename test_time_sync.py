@@ -0,0 +1,117 @@
+"""TimeSync ofseti ve -1021 (timestamp) reddinde tek seferlik yeniden senkron + tekrar."""
+import asyncio
+import time
+
+import pytest
+
+import bot
+
+SKEW_MS = 5_000.0
+TIMESTAMP_REJECT = (400, {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."})
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """İmzalı istekleri kaydeder, cevapları ``replies`` sırasıyla döner."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.sent = []
+
+    def get(self, url, params=None, timeout=None):
+        self.sent.append(dict(params))
+        return FakeResponse(*self.replies.pop(0))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Sunucu saati yerelden SKEW_MS ileride; ``sync`` çağrıları sayılır."""
+    sync = bot.TimeSync()
+    calls = []
+    real_sync = sync.sync
+
+    def counting_sync(samples=3):
+        calls.append(samples)
+        return real_sync(samples)
+
+    def server_time(path, params, timeout=10):
+        assert path == "/fapi/v1/time"
+        return FakeResponse(200, {"serverTime": time.time() * 1000 + SKEW_MS})
+
+    monkeypatch.setattr(sync, "sync", counting_sync)
+    monkeypatch.setattr(bot, "_public_get", server_time)
+    monkeypatch.setattr(bot, "time_sync", sync)
+    monkeypatch.setattr(bot, "TEST_MODE", False)
+    return sync, calls
+
+
+def test_sync_measures_server_offset(clock):
+    sync, _calls = clock
+    assert sync.sync()
+    assert sync.offset_ms == pytest.approx(SKEW_MS, abs=50)
+    assert sync.timestamp() == pytest.approx(time.time() * 1000 + SKEW_MS, abs=100)
+    assert sync.stats()["syncs"] == 1
+
+
+def test_sync_failure_keeps_previous_offset(clock, monkeypatch):
+    sync, _calls = clock
+    sync.offset_ms = 123.0
+
+    def down(path, params, timeout=10):
+        raise ConnectionError("no route")
+
+    monkeypatch.setattr(bot, "_public_get", down)
+    assert sync.sync() is False
+    assert (sync.offset_ms, sync.failures) == (123.0, 1)
+
+
+def _call_signed(session):
+    account = bot.AccountContext("timesync", "key", "secret", session=session)
+    with bot.account_scope(account):
+        return bot._signed_request("GET", "/fapi/v2/positionRisk", {"symbol": "BTCUSDT"})
+
+
+def test_timestamp_reject_resyncs_and_retries_once(clock):
+    sync, calls = clock
+    session = FakeSession([TIMESTAMP_REJECT, (200, [])])
+    assert _call_signed(session).status_code == 200
+    assert calls == [1]
+    first, second = (params["timestamp"] for params in session.sent)
+    assert second - first == pytest.approx(SKEW_MS, abs=100)  # yeni imza düzeltilmiş saatle
+    assert sync.stats()["timestamp_rejects"] == 1
+
+
+def test_second_timestamp_reject_is_returned(clock):
+    _sync, calls = clock
+    session = FakeSession([TIMESTAMP_REJECT, TIMESTAMP_REJECT, (200, [])])
+    resp = _call_signed(session)
+    assert resp.status_code == 400 and resp.json()["code"] == -1021
+    assert len(session.sent) == 2
+    assert calls == [1]
+
+
+@pytest.mark.parametrize("replies, status, sends", [([TIMESTAMP_REJECT, (200, [])], 200, 2), ([TIMESTAMP_REJECT] * 3, 400, 2)])
+def test_async_signed_retries_timestamp_reject_once(clock, replies, status, sends):
+    pytest.importorskip("aiohttp")
+    _sync, calls = clock
+    client = bot.AsyncExchangeClient()
+    sent = []
+
+    async def fake_send(account, method, path, params, timeout=None):
+        sent.append(dict(params))
+        return replies.pop(0)
+
+    client._send = fake_send
+    account = bot.AccountContext("timesync", "key", "secret")
+    result_status, _data = asyncio.run(client.signed(account, "GET", "/fapi/v2/positionRisk", {"symbol": "BTCUSDT"}))
+    assert result_status == status
+    assert len(sent) == sends
+    assert calls == [1]
@@ -0,0 +1,42 @@
+"""TP merdiveni: asyncio backend'inde de batch ile yerleşir, küçültülen bacak deterministik id alır."""
+import time
+from decimal import Decimal
+
+import pytest
+
+import bot
+from conftest import make_state, open_paper_position
+
+LEGS = [
+    {"price": Decimal("110"), "qty": Decimal("0.5"), "roe": Decimal("200")},
+    {"price": Decimal("120"), "qty": Decimal("0.5"), "roe": Decimal("400")},
+]
+
+
+@pytest.fixture
+def async_backend(paper, monkeypatch):
+    pytest.importorskip("aiohttp")
+    monkeypatch.setattr(bot, "EXECUTION_BACKEND", "asyncio")
+    runtime = bot._async_runtime()
+    assert runtime is not None
+    return runtime
+
+
+def test_async_backend_places_ladder_in_one_batch(async_backend, paper):
+    open_paper_position(paper, "BTCUSDT", "LONG", "1")
+    ids = [bot._client_order_id("default|alert", f"tp{i}") for i in range(len(LEGS))]
+    book = async_backend.run_order(bot.async_client.place_tp_ladder("BTCUSDT", "LONG", LEGS, bot.PRIMARY_ACCOUNT, ids))
+    assert [leg["cid"] for leg in book] == ids
+    assert [leg["status"] for leg in book] == ["open", "open"]
+    assert bot.order_tracker.get(ids[0])["state"] == "acked"
+
+
+def test_resized_leg_gets_deterministic_client_id(paper):
+    open_paper_position(paper, "BTCUSDT", "LONG", "1")
+    book = bot.place_tp_ladder("BTCUSDT", "LONG", LEGS, ["fb-leg0", "fb-leg1"])
+    paper.set_price("BTCUSDT", 100, time.time())
+    bot.open_positions["BTCUSDT:LONG"] = make_state("BTCUSDT", "LONG", qty="0.7", tp=book)
+    bot._sync_tp_ladder("BTCUSDT:LONG")
+    legs = bot.open_positions["BTCUSDT:LONG"]["tp"]
+    assert legs[1]["cid"] == bot._client_order_id("fb-leg1", "resize|0.200")
+    assert legs[1]["qty"] == Decimal("0.2")
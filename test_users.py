@@ -0,0 +1,36 @@
+"""UserStore: varsayılan users.json da dosya kilidi altında yazılır."""
+from contextlib import contextmanager
+
+import bot
+
+
+def test_default_users_written_under_file_lock(tmp_path, monkeypatch):
+    path = tmp_path / "users.json"
+    held = []
+    writes = []
+    real_lock, real_write = bot._file_lock, bot._atomic_write_json
+
+    @contextmanager
+    def recording_lock(lock_path):
+        with real_lock(lock_path):
+            held.append(lock_path)
+            try:
+                yield
+            finally:
+                held.pop()
+
+    def recording_write(target, data):
+        writes.append(list(held))
+        real_write(target, data)
+
+    monkeypatch.setattr(bot, "_file_lock", recording_lock)
+    monkeypatch.setattr(bot, "_atomic_write_json", recording_write)
+    users = bot.UserStore(path).all()
+    assert [u["username"] for u in users] == ["admin"]
+    assert writes == [[path]]
+
+
+def test_mutate_on_missing_file_does_not_deadlock(tmp_path):
+    store = bot.UserStore(tmp_path / "users.json")
+    assert store.create({"username": "bob", "password": "x", "role": "user"})
+    assert {u["username"] for u in bot.UserStore(tmp_path / "users.json").all()} == {"admin", "bob"}
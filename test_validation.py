@@ -0,0 +1,40 @@
+"""Yerel ön-işlem filtreleri: PERCENT_PRICE yalnızca fiyatlı emirde, MIN_NOTIONAL entry'ye düşer."""
+from decimal import Decimal
+
+import pytest
+
+import bot
+
+PRECISION = {
+    **bot.fallback_precision(),
+    "stepSize": Decimal("0.001"),
+    "qty_decimals": 3,
+    "minNotional": Decimal("100"),
+    "multiplierUp": Decimal("1.05"),
+    "multiplierDown": Decimal("0.95"),
+}
+
+
+def test_market_entry_outside_band_is_not_rejected():
+    # Alarm entry'si mark'tan %20 uzak; market emri fiyat taşımadığı için geçer.
+    qty = bot.plan_quantity("BTCUSDT", Decimal("120"), 20, Decimal("10"), PRECISION, Decimal("100"))
+    assert qty == Decimal("1.666")
+
+
+def test_limit_price_outside_band_is_rejected():
+    with pytest.raises(ValueError, match="PERCENT_PRICE"):
+        bot.validate_order_quantity("BTCUSDT", Decimal("2"), Decimal("120"), PRECISION, Decimal("100"), "LIMIT")
+
+
+def test_min_notional_checked_against_reference_price():
+    with pytest.raises(ValueError, match="MIN_NOTIONAL"):
+        bot._market_order_payload("BTCUSDT", "BUY", Decimal("0.5"), "LONG", PRECISION, Decimal("100"))
+    payload = bot._market_order_payload("BTCUSDT", "BUY", Decimal("2"), "LONG", PRECISION, Decimal("100"))
+    assert payload["quantity"] == "2.000"
+
+
+def test_market_order_falls_back_to_entry_without_cached_mark(paper, monkeypatch):
+    monkeypatch.setitem(bot.PrecisionCache._cache, "NOMARKUSDT", PRECISION)
+    assert bot._reference_mark_price("NOMARKUSDT") is None
+    with pytest.raises(ValueError, match="MIN_NOTIONAL"):
+        bot.place_futures_market_order("NOMARKUSDT", "BUY", Decimal("0.5"), "LONG", 20, entry=Decimal("100"))
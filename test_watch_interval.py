@@ -0,0 +1,54 @@
+"""WATCH_ADAPTIVE: ENABLED bayrağı katı okunur; plan_watch_interval en yakın tetiğe göre aralık seçer."""
+from decimal import Decimal
+
+import pytest
+
+import bot
+from conftest import make_state
+
+SETTINGS = {**bot.WATCH_ADAPTIVE_DEFAULTS, "ENABLED": True}  # [0.5, 15] sn, SAMPLES=20
+
+
+def _state(**extra):
+    # entry 100, qty 1, 20x -> margin 5; sonraki trailing basamağı (+5 ROE) 100.25'te.
+    return make_state("BTCUSDT", "LONG", qty="1", **extra)
+
+
+@pytest.mark.parametrize("raw, expected", [("false", False), ("0", False), (0, False), ("true", True), (True, True)])
+def test_enabled_parsed_strictly(raw, expected):
+    assert bot.validate_config({"WATCH_ADAPTIVE": {"ENABLED": raw}})["WATCH_ADAPTIVE"]["ENABLED"] is expected
+
+
+def test_enabled_rejects_ambiguous_value():
+    with pytest.raises(ValueError, match="ENABLED"):
+        bot.validate_config({"WATCH_ADAPTIVE": {"ENABLED": "yes please"}})
+
+
+def test_disabled_returns_base():
+    assert bot.plan_watch_interval(_state(), Decimal("100"), 0.5, bot.WATCH_ADAPTIVE_DEFAULTS, 3.0) == (3.0, None)
+
+
+def test_interval_from_nearest_trigger():
+    state = _state(sl=Decimal("99"))
+    interval, distance = bot.plan_watch_interval(state, Decimal("100"), 0.5, SETTINGS, 3.0)
+    assert distance == pytest.approx(0.25)  # SL %1 uzakta, trailing basamağı %0.25
+    assert interval == pytest.approx(60 * (0.25 / 0.5) ** 2 / 20)
+
+
+def test_open_tp_leg_counts_as_trigger():
+    legs = [{"price": Decimal("100.1"), "status": "open"}, {"price": Decimal("100.05"), "status": "filled"}]
+    _interval, distance = bot.plan_watch_interval(_state(tp=legs), Decimal("100"), 0.5, SETTINGS, 3.0)
+    assert distance == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("vol_pct, expected", [(0.001, 15.0), (50.0, 0.5)])
+def test_interval_clamped_to_bounds(vol_pct, expected):
+    interval, _distance = bot.plan_watch_interval(_state(), Decimal("100"), vol_pct, SETTINGS, 3.0)
+    assert interval == expected
+
+
+@pytest.mark.parametrize("base, expected", [(3.0, 3.0), (60.0, 15.0), (0.1, 0.5)])
+def test_no_atr_falls_back_to_clamped_base(base, expected):
+    interval, distance = bot.plan_watch_interval(_state(), Decimal("100"), None, SETTINGS, base)
+    assert interval == expected
+    assert distance == pytest.approx(0.25)
@@ -7,7 +7,8 @@ data = {
     "entry": 0.863
 }
 
-response = requests.post(url, json=data)
-print("Status Code:", response.status_code)
-print("Response:", response.text)
+if __name__ == "__main__":
+    response = requests.post(url, json=data)
+    print("Status Code:", response.status_code)
+    print("Response:", response.text)
 